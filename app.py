@@ -1,9 +1,23 @@
-from flask import Flask, render_template, jsonify, request
+from flask import Flask, render_template, jsonify, request, stream_with_context
 from flask_cors import CORS
-from flask_socketio import SocketIO, emit
+from flask_socketio import SocketIO, emit, join_room, leave_room
 from modules.working_system import WorkingRideShareSystem
+from modules.worker_pool import PoolOverloadedError
+from modules.trip import TripStatus
+from modules.driver import DriverStatus
+from modules.admission import AdmissionController
+from modules.subscriptions import SubscriptionRegistry
+from modules.bulk_import import BulkImporter, IMPORT_KINDS
+from modules.journal import Journal
+from modules.storage import SQLiteStore
+from modules import wire, history
+from functools import wraps
+from collections import deque
+from datetime import datetime
 import time
 import threading
+import math
+import json
 import os
 
 app = Flask(__name__)
@@ -14,37 +28,249 @@ CORS(app)
 socketio = SocketIO(app, cors_allowed_origins="*", async_mode='threading')
 
 # Global system instance
-system = WorkingRideShareSystem()
+STARTED_AT = time.time()
+system = WorkingRideShareSystem(
+    workers=int(os.environ.get('TRIP_WORKERS', 4)),
+    queue_limit=int(os.environ.get('TRIP_QUEUE_LIMIT', 100)),
+    retain_finished=int(os.environ.get('RETAIN_FINISHED_TRIPS', 100))
+)
+
+# Set once persisted state is loaded and its trips have resumed; until then
+# the API answers 503 and sockets are refused
+READY = threading.Event()
+STARTUP_MS = None
+RECOVERY_ERROR = None
+
+# Set STORE_PATH to keep state in a SQLite database, written in the background,
+# or JOURNAL_DIR to journal every change and recover from it; not both, since
+# each restores the whole state on startup. Either belongs to a single app
+# process: run one process per path.
+STORE_PATH = os.environ.get('STORE_PATH')
+JOURNAL_DIR = os.environ.get('JOURNAL_DIR')
+if STORE_PATH and JOURNAL_DIR:
+    raise RuntimeError('Set STORE_PATH or JOURNAL_DIR, not both')
+
+def recover_state():
+    """Load persisted state, then open the API"""
+    global STARTUP_MS, RECOVERY_ERROR
+    try:
+        if STORE_PATH:
+            system.attach_store(SQLiteStore(
+                STORE_PATH,
+                batch_size=int(os.environ.get('STORE_BATCH_SIZE', 1000)),
+                flush_interval=float(os.environ.get('STORE_FLUSH_MS', 50)) / 1000
+            ))
+
+        if JOURNAL_DIR:
+            system.attach_journal(Journal(
+                JOURNAL_DIR,
+                snapshot_every=int(os.environ.get('JOURNAL_SNAPSHOT_EVERY', 10000)),
+                commit_delay=float(os.environ.get('JOURNAL_COMMIT_DELAY_MS', 2)) / 1000
+            ))
+    except Exception as e:
+        RECOVERY_ERROR = str(e)
+        print(f"✗ Recovery failed: {e}")
+        raise
+
+    scoped_cursor['version'] = system.changelog.version
+    # Snapshots are mapped and read lazily, so this stays small however large the state
+    STARTUP_MS = round((time.time() - STARTED_AT) * 1000, 1)
+    READY.set()
+
+def start_recovery():
+    """Recover in the background so the server can bind and answer health checks meanwhile"""
+    thread = threading.Thread(target=recover_state, name="recovery", daemon=True)
+    thread.start()
+
+# Sheds trip requests once too much work is in flight or p99 latency is too high
+admission = AdmissionController(
+    max_in_flight=int(os.environ.get('ADMISSION_MAX_IN_FLIGHT', 32)),
+    p99_threshold_ms=float(os.environ.get('ADMISSION_P99_MS', 500))
+)
+
+@app.before_request
+def require_ready():
+    """Answer API requests with 503 until recovery has finished"""
+    if READY.is_set() or not request.path.startswith('/api/'):
+        return None
+    response = jsonify({'success': False, 'error': 'Server is starting, please retry later', 'starting': True})
+    response.status_code = 503
+    response.headers['Retry-After'] = '1'
+    return response
+
+def admission_controlled(view):
+    """Reject the request with 503 and a Retry-After hint when overloaded"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        retry_after = admission.try_admit()
+        if retry_after is not None:
+            response = jsonify({
+                'success': False,
+                'error': 'Server is overloaded, please retry later',
+                'overloaded': True,
+                'retry_after': retry_after
+            })
+            response.status_code = 503
+            response.headers['Retry-After'] = str(int(math.ceil(retry_after)))
+            return response
+        
+        started_at = time.time()
+        try:
+            return view(*args, **kwargs)
+        finally:
+            admission.release(time.time() - started_at)
+    return wrapper
+
+# Last state version each connected client acknowledged (None = needs a snapshot)
+client_versions = {}
+client_versions_lock = threading.Lock()
+
+# Wire format per client; clients opt into MessagePack with set_format
+client_formats = {}
+
+# Clients that subscribed to zone/trip/driver rooms only get updates for those
+subscriptions = SubscriptionRegistry()
+scoped_cursor = {'version': system.changelog.version}
+
+def is_empty_delta(update):
+    """Check if a delta carries no changed or removed entities"""
+    if update['type'] != 'delta':
+        return False
+    data = update['data']
+    kinds = ('drivers', 'riders', 'trips')
+    return not any(data[kind] for kind in kinds) and not any(data['removed'][kind] for kind in kinds)
 
 def broadcast_system_update():
-    """Broadcast system update to all connected clients"""
+    """Send each client only what changed since the version it acknowledged"""
     try:
-        system_state = system.get_state()
-        socketio.emit('system_update', {
-            'type': 'full_update',
-            'data': system_state,
-            'timestamp': time.time()
-        })
-        print(f"✓ Broadcast system update")
+        # Clients acknowledging the same version share one delta
+        with client_versions_lock:
+            groups = {}
+            for sid, version in client_versions.items():
+                groups.setdefault(version, []).append(sid)
+        
+        for version, sids in groups.items():
+            update = system.get_delta(version)
+            if is_empty_delta(update):
+                continue
+            update['timestamp'] = time.time()
+            
+            # Encode once per format; binary payloads go out as MessagePack bytes
+            by_format = {}
+            for sid in sids:
+                by_format.setdefault(client_formats.get(sid, wire.JSON), []).append(sid)
+            for fmt, format_sids in by_format.items():
+                payload = update if fmt == wire.JSON else wire.encode(update, fmt)
+                socketio.emit('system_update', payload, to=format_sids)
+        
+        publish_scoped_updates()
+        publish_trip_notices()
     except Exception as e:
         print(f"✗ Error broadcasting update: {e}")
 
+def publish_scoped_updates():
+    """Send changed drivers and trips only to the rooms watching them"""
+    version = system.changelog.version
+    since = scoped_cursor['version']
+    scoped_cursor['version'] = version
+    if version == since or not subscriptions.has_subscribers():
+        return
+    
+    changes = system.changelog.changes_since(since)
+    if changes is None:
+        return  # too far behind; scoped clients can request a snapshot
+    
+    for room, data in subscriptions.route(changes, system).items():
+        socketio.emit('system_update', {
+            'type': 'scoped',
+            'room': room,
+            'version': version,
+            'data': data,
+            'timestamp': time.time()
+        }, to=room)
+
+# Writes only flag that an update is due; the broadcast thread folds a burst
+# of writes into one delta instead of broadcasting once per write
+update_pending = threading.Event()
+BROADCAST_INTERVAL = 2
+BROADCAST_COALESCE_SECONDS = float(os.environ.get('BROADCAST_COALESCE_SECONDS', 0.1))
+
+def schedule_broadcast():
+    """Ask the broadcast thread to push the next delta soon"""
+    update_pending.set()
+
+# Trip transitions waiting to go out as short trip_update notices; the trips
+# themselves reach clients in the next delta
+pending_transitions = deque(maxlen=10000)
+
+def queue_trip_transition(event):
+    """Note a trip transition for the broadcast thread; runs on the worker that made it"""
+    pending_transitions.append({
+        'trip_id': event.trip.id,
+        'status': event.status.value,
+        'previous_status': event.previous.value if event.previous else None,
+        'timestamp': event.timestamp
+    })
+    schedule_broadcast()
+
+system.events.subscribe(queue_trip_transition)
+
+def publish_trip_notices():
+    """Send the queued transition notices to whole-system clients and the rooms watching each trip"""
+    notices = []
+    while pending_transitions:
+        notices.append(pending_transitions.popleft())
+    with client_versions_lock:
+        sids = list(client_versions)
+    scoped = subscriptions.has_subscribers()
+    for notice in notices:
+        targets = list(sids)
+        if scoped:
+            trip = system.get_trip(notice['trip_id'])
+            if trip is not None:
+                targets += subscriptions.watching_trip(trip, system.city)
+        if targets:
+            # Clients in several of the rooms still get the notice once
+            socketio.emit('trip_update', notice, to=targets)
+
+def wait_until_durable():
+    """Block until writes so far are on disk, before a write is acknowledged"""
+    if system.journal is not None:
+        system.journal.wait_for()
+
+def mutation_response(since, **body):
+    """Affected entities and the new state version for a write
+    
+    Pass ?response=full to also get the whole system state back.
+    """
+    wait_until_durable()
+    changes = system.get_changes(since)
+    body['version'] = changes.pop('version')
+    body['changes'] = changes
+    if request.args.get('response') == 'full':
+        body['system'] = system.get_state()
+    return jsonify(body)
+
 # Start update broadcast thread
 def start_update_thread():
     """Thread to broadcast periodic updates"""
     def update_loop():
+        READY.wait()
         while True:
+            update_pending.wait(timeout=BROADCAST_INTERVAL)
+            if update_pending.is_set():
+                time.sleep(BROADCAST_COALESCE_SECONDS)  # let the rest of a burst land
+                update_pending.clear()
             try:
                 broadcast_system_update()
             except Exception as e:
                 print(f"Update thread error: {e}")
-            
-            time.sleep(2)  # Update every 2 seconds
     
     thread = threading.Thread(target=update_loop, daemon=True)
     thread.start()
 
 start_update_thread()
+start_recovery()
 
 @app.route('/')
 def index():
@@ -60,7 +286,8 @@ def init_system():
     try:
         print("\n=== API: Initializing system ===")
         system.initialize_sample_data()
-        broadcast_system_update()
+        schedule_broadcast()
+        wait_until_durable()
         return jsonify({
             'success': True,
             'message': 'System initialized successfully',
@@ -74,14 +301,31 @@ def init_system():
 def get_system_state():
     """Get current system state"""
     try:
-        return jsonify({
+        payload = {
             'success': True,
             'system': system.get_state()
-        })
+        }
+        fmt = wire.negotiate(request.headers.get('Accept'), request.args.get('format'))
+        if fmt == wire.JSON:
+            response = jsonify(payload)
+        else:
+            response = app.response_class(wire.encode(payload, fmt), mimetype=wire.MIMETYPES[fmt])
+        response.vary.add('Accept')
+        return response
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)})
 
+@app.route('/api/city', methods=['GET'])
+def get_city():
+    """Get the city graph, cached until it changes and revalidated by ETag"""
+    body, etag = system.city.get_payload()
+    response = app.response_class(body, mimetype='application/json')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
+
 @app.route('/api/trip/request', methods=['POST'])
+@admission_controlled
 def request_trip():
     """Request a new trip"""
     try:
@@ -93,41 +337,100 @@ def request_trip():
         print(f"\n=== API: Requesting trip ===")
         print(f"Rider: {rider_id}, Pickup: {pickup}, Dropoff: {dropoff}")
         
+        since = system.changelog.version
         trip = system.request_trip(rider_id, pickup, dropoff)
         
         if trip:
-            # Send immediate update
-            broadcast_system_update()
+            schedule_broadcast()
             
-            return jsonify({
-                'success': True,
-                'message': 'Trip requested successfully',
-                'trip': trip.to_dict(),
-                'system': system.get_state()
-            })
+            return mutation_response(
+                since,
+                success=True,
+                message='Trip requested successfully',
+                trip=trip.to_dict()
+            )
         else:
             return jsonify({
                 'success': False,
                 'error': 'Failed to create trip'
             })
+    except PoolOverloadedError as e:
+        print(f"✗ Rejecting trip request: {e}")
+        response = jsonify({'success': False, 'error': str(e), 'overloaded': True, 'retry_after': 1})
+        response.status_code = 503
+        response.headers['Retry-After'] = '1'
+        return response
     except Exception as e:
         print(f"✗ Error requesting trip: {e}")
         return jsonify({'success': False, 'error': str(e)})
 
+MAX_BATCH_SIZE = int(os.environ.get('MAX_BATCH_SIZE', 500))
+
+@app.route('/api/trip/request/batch', methods=['POST'])
+@admission_controlled
+def request_trips_batch():
+    """Request many trips in one call with a result per item"""
+    try:
+        data = request.get_json(silent=True)
+        items = data.get('requests') if isinstance(data, dict) else None
+        if not isinstance(items, list) or not items:
+            return bad_request('Body must be an object whose requests is a non-empty list')
+        if len(items) > MAX_BATCH_SIZE:
+            return bad_request(f'At most {MAX_BATCH_SIZE} requests per batch')
+        
+        # Malformed items fail on their own; the rest go to the system as one batch
+        results = [None] * len(items)
+        parsed = []
+        positions = []
+        for index, item in enumerate(items):
+            try:
+                parsed.append((int(item['rider_id']), int(item['pickup']), int(item['dropoff'])))
+                positions.append(index)
+            except (KeyError, TypeError, ValueError):
+                results[index] = {'index': index, 'success': False, 'error': 'rider_id, pickup and dropoff are required integers'}
+        
+        created = system.request_trips(parsed) if parsed else []
+        
+        for index, (trip, error) in zip(positions, created):
+            if trip:
+                results[index] = {'index': index, 'success': True, 'trip': trip.to_dict()}
+            else:
+                results[index] = {'index': index, 'success': False, 'error': error}
+        
+        accepted = sum(1 for result in results if result['success'])
+        if accepted:
+            schedule_broadcast()
+            wait_until_durable()
+        
+        return jsonify({
+            'success': accepted > 0,
+            'accepted': accepted,
+            'rejected': len(results) - accepted,
+            'results': results,
+            'version': system.changelog.version
+        })
+    except PoolOverloadedError as e:
+        print(f"✗ Rejecting trip batch: {e}")
+        response = jsonify({'success': False, 'error': str(e), 'overloaded': True, 'retry_after': 1})
+        response.status_code = 503
+        response.headers['Retry-After'] = '1'
+        return response
+    except Exception as e:
+        print(f"✗ Error requesting trip batch: {e}")
+        return jsonify({'success': False, 'error': str(e)})
+
 @app.route('/api/trip/<int:trip_id>/cancel', methods=['POST'])
 def cancel_trip(trip_id):
     """Cancel a trip"""
     try:
         print(f"\n=== API: Cancelling trip {trip_id} ===")
+        since = system.changelog.version
         success = system.cancel_trip(trip_id)
         
         if success:
-            broadcast_system_update()
+            schedule_broadcast()
         
-        return jsonify({
-            'success': success,
-            'system': system.get_state()
-        })
+        return mutation_response(since, success=success)
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)})
 
@@ -146,7 +449,8 @@ def add_driver():
             license_plate=data.get('license_plate', '')
         )
         
-        broadcast_system_update()
+        schedule_broadcast()
+        wait_until_durable()
         
         return jsonify({
             'success': True,
@@ -169,7 +473,8 @@ def add_rider():
             email=data.get('email', '')
         )
         
-        broadcast_system_update()
+        schedule_broadcast()
+        wait_until_durable()
         
         return jsonify({
             'success': True,
@@ -178,55 +483,302 @@ def add_rider():
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)})
 
+@app.route('/api/import/<kind>', methods=['POST'])
+def bulk_import(kind):
+    """Stream an NDJSON body of drivers, riders or trips into the system
+    
+    The body is read line by line and inserted in chunks; the response is
+    NDJSON too, one progress line per chunk and a final summary, e.g.
+    curl -T drivers.ndjson -H 'Content-Type: application/x-ndjson' .../api/import/drivers
+    """
+    if kind not in IMPORT_KINDS:
+        return bad_request(f'Unknown import kind: {kind}')
+    try:
+        chunk_size = int(request.args.get('chunk_size', 1000))
+    except ValueError as e:
+        return bad_request(e)
+    
+    importer = BulkImporter(system, chunk_size)
+    stream = request.stream
+    
+    def generate():
+        progress = None
+        for progress in importer.iter_progress(kind, stream):
+            print(f"✓ Imported {progress.imported} {kind} ({progress.failed} failed)")
+            schedule_broadcast()
+            yield json.dumps(progress.to_dict(include_errors=False)) + '\n'
+        wait_until_durable()
+        summary = progress.to_dict()
+        summary['done'] = True
+        yield json.dumps(summary) + '\n'
+    
+    return app.response_class(stream_with_context(generate()), mimetype='application/x-ndjson')
+
 @app.route('/api/analytics', methods=['GET'])
 def get_analytics():
     """Get system analytics"""
     try:
         return jsonify({
             'success': True,
-            'analytics': system.get_analytics()
+            'analytics': system.get_analytics(),
+            'rolling': system.rolling_metrics.snapshot()
+        })
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)})
+
+MAX_PAGE_SIZE = 500
+
+def parse_page_args(args):
+    """Cursor, limit and field projection shared by the list endpoints"""
+    cursor = args.get('cursor')
+    limit = int(args.get('limit', 50))
+    if limit < 1 or limit > MAX_PAGE_SIZE:
+        raise ValueError(f'limit must be between 1 and {MAX_PAGE_SIZE}')
+    fields = [f.strip() for f in args.get('fields', '').split(',') if f.strip()]
+    return {
+        'cursor': int(cursor) if cursor else None,
+        'limit': limit,
+        'fields': fields or None
+    }
+
+def parse_status(value, statuses):
+    """Map a status name (any case) to its enum member"""
+    if not value:
+        return None
+    try:
+        return statuses[value.upper()]
+    except KeyError:
+        raise ValueError(f'Unknown status: {value}')
+
+def parse_time(value):
+    """Accept epoch seconds or an ISO 8601 timestamp"""
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value).timestamp()
+
+def page_response(page):
+    return jsonify({
+        'success': True,
+        'items': page['items'],
+        'next_cursor': page['next_cursor']
+    })
+
+def bad_request(error):
+    response = jsonify({'success': False, 'error': str(error)})
+    response.status_code = 400
+    return response
+
+@app.route('/api/trips', methods=['GET'])
+def list_trips():
+    """Page through trips, newest first, filtered by status, zone, driver, rider and time"""
+    try:
+        args = request.args
+        filters = {
+            'status': parse_status(args.get('status'), TripStatus),
+            'zone': args.get('zone') or None,
+            'driver_id': int(args['driver_id']) if args.get('driver_id') else None,
+            'rider_id': int(args['rider_id']) if args.get('rider_id') else None,
+            'since': parse_time(args.get('since')),
+            'until': parse_time(args.get('until'))
+        }
+        page = system.list_trips(**parse_page_args(args), **filters)
+    except ValueError as e:
+        return bad_request(e)
+    return page_response(page)
+
+@app.route('/api/drivers', methods=['GET'])
+def list_drivers():
+    """Page through drivers by id, filtered by status and current zone"""
+    try:
+        args = request.args
+        page = system.list_drivers(
+            status=parse_status(args.get('status'), DriverStatus),
+            zone=args.get('zone') or None,
+            **parse_page_args(args)
+        )
+    except ValueError as e:
+        return bad_request(e)
+    return page_response(page)
+
+@app.route('/api/riders', methods=['GET'])
+def list_riders():
+    """Page through riders by id"""
+    try:
+        page = system.list_riders(**parse_page_args(request.args))
+    except ValueError as e:
+        return bad_request(e)
+    return page_response(page)
+
+@app.route('/api/analytics/history', methods=['GET'])
+def get_history_analytics():
+    """Group finished trips by zone pair, hour, driver or rider with distance, fare and wait stats"""
+    if not history.numpy_available():
+        response = jsonify({'success': False, 'error': 'Historical analytics require numpy'})
+        response.status_code = 501
+        return response
+    try:
+        args = request.args
+        metrics = [m.strip() for m in args.get('metrics', ','.join(history.METRICS)).split(',') if m.strip()]
+        percentiles = [float(p) for p in args.get('percentiles', '50,95').split(',') if p.strip()]
+        if any(p < 0 or p > 100 for p in percentiles):
+            raise ValueError('percentiles must be between 0 and 100')
+        result = system.query_history(
+            args.get('group_by', 'zone_pair'),
+            metrics=metrics,
+            percentiles=percentiles,
+            status=parse_status(args.get('status'), TripStatus),
+            since=parse_time(args.get('since')),
+            until=parse_time(args.get('until')),
+            order=args.get('order', 'key'),
+            limit=min(int(args.get('limit', 100)), MAX_PAGE_SIZE)
+        )
+    except ValueError as e:
+        return bad_request(e)
+    return jsonify({'success': True, 'history': result})
+
+@app.route('/api/system/workers', methods=['GET'])
+def get_worker_metrics():
+    """Get trip worker pool queue depth and latency metrics"""
+    try:
+        return jsonify({
+            'success': True,
+            'workers': system.worker_pool.get_metrics()
         })
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)})
 
+@app.route('/api/system/admission', methods=['GET'])
+def get_admission_metrics():
+    """Get admission control in-flight count, shed count and latency"""
+    return jsonify({
+        'success': True,
+        'admission': admission.get_metrics()
+    })
+
 @app.route('/api/rollback', methods=['POST'])
 def rollback():
     """Rollback last k operations"""
     try:
         data = request.json
         k = int(data.get('k', 1))
+        since = system.changelog.version
         success = system.rollback(k)
         
         if success:
-            broadcast_system_update()
+            schedule_broadcast()
         
-        return jsonify({
-            'success': success,
-            'system': system.get_state()
-        })
+        return mutation_response(since, success=success)
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)})
 
 # Health check endpoint for Render
 @app.route('/health')
 def health_check():
-    """Health check endpoint for Render"""
-    return jsonify({
-        'status': 'healthy',
+    """Health check endpoint for Render; 503 until startup has finished"""
+    ready = READY.is_set()
+    response = jsonify({
+        'status': 'healthy' if ready else 'failed' if RECOVERY_ERROR else 'starting',
+        'ready': ready,
+        'error': RECOVERY_ERROR,
+        'startup_ms': STARTUP_MS,
         'service': 'RideShare Dispatch',
         'timestamp': time.time()
     })
+    if not ready:
+        response.status_code = 503
+    return response
 
 # WebSocket event handlers
 @socketio.on('connect')
 def handle_connect():
+    if not READY.is_set():
+        raise ConnectionRefusedError('Server is starting')
     print("✓ Client connected")
+    with client_versions_lock:
+        client_versions[request.sid] = None
     emit('connected', {'message': 'Connected to RideShare', 'timestamp': time.time()})
-    broadcast_system_update()
+    
+    # New clients start from a full snapshot
+    update = system.get_delta(None)
+    update['timestamp'] = time.time()
+    emit('system_update', update)
 
 @socketio.on('disconnect')
 def handle_disconnect():
     print("✗ Client disconnected")
+    with client_versions_lock:
+        client_versions.pop(request.sid, None)
+        client_formats.pop(request.sid, None)
+    subscriptions.drop(request.sid)
+
+@socketio.on('set_format')
+def handle_set_format(data):
+    """Switch this client's system_update payloads between JSON and MessagePack"""
+    requested = data.get('format') if isinstance(data, dict) else None
+    fmt = wire.negotiate(requested=requested)
+    with client_versions_lock:
+        if fmt == wire.JSON:
+            client_formats.pop(request.sid, None)
+        else:
+            client_formats[request.sid] = fmt
+    emit('format', {'format': fmt, 'msgpack_available': wire.msgpack_available()})
+
+@socketio.on('subscribe')
+def handle_subscribe(data):
+    """Narrow this client's updates to a zone, trip or driver room"""
+    room = subscriptions.room_for(data)
+    if room is None:
+        emit('subscription_error', {'error': 'Subscribe with one of zone, trip_id or driver_id'})
+        return
+    
+    join_room(room)
+    subscriptions.add(request.sid, room)
+    # Scoped clients leave the whole-system delta stream
+    with client_versions_lock:
+        client_versions.pop(request.sid, None)
+    
+    emit('system_update', {
+        'type': 'scoped',
+        'room': room,
+        'version': system.changelog.version,
+        'data': subscriptions.snapshot(room, system),
+        'timestamp': time.time()
+    })
+
+@socketio.on('unsubscribe')
+def handle_unsubscribe(data):
+    """Stop watching a room; clients with no rooms left get whole-system updates again"""
+    room = subscriptions.room_for(data)
+    if room is None or not subscriptions.remove(request.sid, room):
+        return
+    
+    leave_room(room)
+    if not subscriptions.is_scoped(request.sid):
+        with client_versions_lock:
+            client_versions[request.sid] = None
+
+@socketio.on('ack')
+def handle_ack(data):
+    """Client applied everything up to data['version']"""
+    try:
+        version = int(data['version'])
+    except (TypeError, KeyError, ValueError):
+        return
+    with client_versions_lock:
+        if request.sid in client_versions:
+            client_versions[request.sid] = version
+
+@socketio.on('request_update')
+def handle_request_update(data=None):
+    """Send the requesting client what changed since its version, or a snapshot"""
+    since = data.get('since') if isinstance(data, dict) else None
+    update = system.get_delta(since)
+    update['timestamp'] = time.time()
+    fmt = client_formats.get(request.sid, wire.JSON)
+    emit('system_update', update if fmt == wire.JSON else wire.encode(update, fmt))
 
 # SIMPLE MAIN - NO GUNICORN, JUST PURE FLASK
 if __name__ == '__main__':
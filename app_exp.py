@@ -2,8 +2,11 @@ from flask import Flask, render_template, jsonify, request, session
 from flask_cors import CORS
 from flask_socketio import SocketIO, emit
 from modules.system import RideShareSystem
+from modules.worker_pool import PoolOverloadedError
+from collections import deque
 import json
 import time
+import os
 import threading
 
 app = Flask(__name__)
@@ -12,7 +15,10 @@ CORS(app)
 socketio = SocketIO(app, cors_allowed_origins="*", async_mode='threading')
 
 # Global system instance
-system = RideShareSystem()
+system = RideShareSystem(
+    workers=int(os.environ.get('TRIP_WORKERS', 4)),
+    queue_limit=int(os.environ.get('TRIP_QUEUE_LIMIT', 100))
+)
 
 def broadcast_system_update():
     """Broadcast system update to all connected clients"""
@@ -42,28 +48,52 @@ def broadcast_trip_update(trip_id, status, stage=None):
     except Exception as e:
         print(f"Error broadcasting trip update: {e}")
 
+# Trip transitions are queued by the worker that made them and broadcast by
+# the update thread, so no socket emit runs on a trip worker
+pending_transitions = deque(maxlen=10000)
+transition_pending = threading.Event()
+
+def on_trip_transition(event):
+    """Queue every trip state transition for the update thread"""
+    pending_transitions.append((event.trip.id, event.status.value))
+    transition_pending.set()
+
+system.events.subscribe(on_trip_transition)
+
+def send_trip_transitions():
+    """Broadcast the queued trip transitions"""
+    while pending_transitions:
+        trip_id, status = pending_transitions.popleft()
+        broadcast_trip_update(trip_id, status)
+
 # Start update broadcast thread
 def start_update_thread():
-    """Thread to broadcast periodic updates"""
+    """Thread to broadcast transitions as they happen and periodic updates"""
     def update_loop():
+        next_update_at = 0
         while True:
+            transition_pending.clear()
             try:
-                # Check for animation updates
-                active_animations = system.get_active_animations()
-                for animation in active_animations:
-                    broadcast_trip_update(
-                        animation['trip_id'],
-                        'animating',
-                        animation['stage']
-                    )
+                send_trip_transitions()
                 
-                # Broadcast full update every 3 seconds
-                broadcast_system_update()
+                if time.time() >= next_update_at:
+                    next_update_at = time.time() + 3  # Update every 3 seconds
+                    
+                    # Check for animation updates
+                    active_animations = system.get_active_animations()
+                    for animation in active_animations:
+                        broadcast_trip_update(
+                            animation['trip_id'],
+                            'animating',
+                            animation['stage']
+                        )
+                    
+                    broadcast_system_update()
                 
             except Exception as e:
                 print(f"Update thread error: {e}")
             
-            time.sleep(3)  # Update every 3 seconds
+            transition_pending.wait(max(0, next_update_at - time.time()))
     
     thread = threading.Thread(target=update_loop, daemon=True)
     thread.start()
@@ -103,6 +133,15 @@ def get_system_state():
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)})
 
+@app.route('/api/city', methods=['GET'])
+def get_city():
+    """Get the city graph, cached until it changes and revalidated by ETag"""
+    body, etag = system.city.get_payload()
+    response = app.response_class(body, mimetype='application/json')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
+
 @app.route('/api/trip/request', methods=['POST'])
 def request_trip():
     """Request a new trip"""
@@ -116,15 +155,15 @@ def request_trip():
         
         trip = system.request_trip(rider_id, pickup, dropoff)
         
-        # Broadcast initial trip creation
-        broadcast_trip_update(trip.id, trip.status.value)
-        
         return jsonify({
             'success': True,
             'message': 'Trip requested successfully',
             'trip': trip.to_dict(),
             'system': system.get_state()
         })
+    except PoolOverloadedError as e:
+        print(f"Rejecting trip request: {e}")
+        return jsonify({'success': False, 'error': str(e), 'overloaded': True}), 503
     except Exception as e:
         print(f"Error requesting trip: {e}")
         return jsonify({'success': False, 'error': str(e)})
@@ -148,7 +187,6 @@ def cancel_trip(trip_id):
         success = system.cancel_trip(trip_id)
         
         if success:
-            broadcast_trip_update(trip_id, 'CANCELLED')
             broadcast_system_update()
         
         return jsonify({
@@ -209,6 +247,17 @@ def get_analytics():
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)})
 
+@app.route('/api/system/workers', methods=['GET'])
+def get_worker_metrics():
+    """Get trip worker pool queue depth and latency metrics"""
+    try:
+        return jsonify({
+            'success': True,
+            'workers': system.worker_pool.get_metrics()
+        })
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)})
+
 @app.route('/api/rollback', methods=['POST'])
 def rollback():
     """Rollback last k operations"""
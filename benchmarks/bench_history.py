@@ -0,0 +1,78 @@
+"""Time historical analytics queries over a large synthetic trip archive
+
+Usage: python benchmarks/bench_history.py [--trips 10000000]
+"""
+import argparse
+import os
+import sys
+import time
+from array import array
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.archive import TripArchive, COLUMNS
+from modules.city import City
+from modules import history
+
+def build_city() -> City:
+    city = City()
+    for zone in range(5):
+        for i in range(3):
+            city.add_location(zone * 3 + i, 0, 0, f"Zone {zone}")
+    return city
+
+def build_archive(num_trips: int, num_drivers: int, num_riders: int) -> TripArchive:
+    """Archive filled column by column instead of trip by trip"""
+    rng = np.random.default_rng(42)
+    now = time.time()
+    created = now - rng.random(num_trips) * 30 * 86400
+    values = {
+        'id': np.arange(1, num_trips + 1),
+        'rider_id': rng.integers(101, 101 + num_riders, num_trips),
+        'driver_id': rng.integers(101, 101 + num_drivers, num_trips),
+        'pickup': rng.integers(0, 15, num_trips),
+        'dropoff': rng.integers(0, 15, num_trips),
+        'status': (rng.random(num_trips) < 0.1).astype(np.int8),
+        'distance': rng.uniform(5, 60, num_trips),
+        'created_at': created,
+        'assigned_at': created + rng.exponential(90, num_trips),
+        'started_at': created + 300,
+        'completed_at': created + 1500,
+        'cancelled_at': np.full(num_trips, np.nan)
+    }
+    values['fare'] = 2.5 + values['distance'] * 1.5
+
+    archive = TripArchive()
+    for name, code in COLUMNS.items():
+        column = array(code)
+        column.frombytes(values[name].astype(np.dtype(code)).tobytes())
+        archive.columns[name] = column
+    return archive
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--trips', type=int, default=10_000_000)
+    parser.add_argument('--drivers', type=int, default=10_000)
+    parser.add_argument('--riders', type=int, default=100_000)
+    args = parser.parse_args()
+
+    print(f"Building archive of {args.trips} trips")
+    archive = build_archive(args.trips, args.drivers, args.riders)
+    city = build_city()
+    print(f"Archive size {archive.nbytes() / 1e6:.1f} MB")
+
+    for group_by in history.GROUP_BY:
+        for metrics in (('fare',), history.METRICS):
+            names = history.columns_for(group_by, metrics)
+            start = time.perf_counter()
+            columns = history.load_columns(archive, (), names)
+            loaded = time.perf_counter()
+            result = history.query(columns, city, group_by, metrics=metrics)
+            done = time.perf_counter()
+            print(f"{group_by:10s} {','.join(metrics):20s} groups={result['groups']:7d} "
+                  f"load={(loaded - start) * 1000:7.1f} ms  query={(done - loaded) * 1000:7.1f} ms")
+
+if __name__ == '__main__':
+    main()
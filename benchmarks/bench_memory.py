@@ -0,0 +1,80 @@
+"""Measure memory held per million trips, drivers, riders and locations
+
+Usage: python benchmarks/bench_memory.py [--count 1000000]
+"""
+import argparse
+import os
+import sys
+import tracemalloc
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.archive import TripArchive
+from modules.city import Location
+from modules.driver import Driver
+from modules.rider import Rider
+from modules.trip import Trip, TripStatus
+
+def make_trips(count: int):
+    trips = []
+    for i in range(count):
+        trip = Trip(i, 101 + i % 1000, i % 15, (i + 1) % 15)
+        trip.driver_id = i % 500
+        trip.status = TripStatus.COMPLETED
+        trip.assigned_at = trip.started_at = trip.completed_at = datetime.now()
+        trip.distance = 12.5
+        trip.fare = 21.25
+        trips.append(trip)
+    return trips
+
+def make_drivers(count: int):
+    return [Driver(i, f"Driver {i}", i % 15) for i in range(count)]
+
+def make_riders(count: int):
+    riders = [Rider(i, f"Rider {i}", f"rider{i}@example.com") for i in range(count)]
+    for rider in riders:
+        rider.add_trip(rider.id)
+    return riders
+
+def make_locations(count: int):
+    return [Location(i, i % 100, i // 100, f"Zone {i % 5}") for i in range(count)]
+
+def make_archive(count: int):
+    archive = TripArchive()
+    trip = Trip(0, 101, 1, 2)
+    trip.status = TripStatus.COMPLETED
+    for i in range(count):
+        trip.id = i
+        archive.append(trip)
+    return archive
+
+def measure(build, count: int) -> int:
+    """Bytes still allocated by build(count) once it returns"""
+    tracemalloc.start()
+    built = build(count)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del built
+    return size
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--count', type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    scale = 1_000_000 / args.count
+    builders = (
+        ('Trip', make_trips),
+        ('Trip (archived)', make_archive),
+        ('Driver', make_drivers),
+        ('Rider', make_riders),
+        ('Location', make_locations)
+    )
+    print(f"{'entity':18s} {'MB per million':>15s} {'bytes each':>11s}")
+    for name, build in builders:
+        size = measure(build, args.count)
+        print(f"{name:18s} {size * scale / 1e6:15.1f} {size / args.count:11.1f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+"""Time startup from a mapped snapshot and the first access to lazily loaded state
+
+Usage: python benchmarks/bench_startup.py [--trips 5000000] [--dir /tmp/journal]
+"""
+import argparse
+import contextlib
+import os
+import random
+import sys
+import tempfile
+import time
+from array import array
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.archive import COLUMNS, NO_ROW
+from modules.driver import Driver
+from modules.journal import Journal, capture
+from modules.rider import Rider
+from modules.trip import TripStatus
+from modules.working_system import WorkingRideShareSystem
+
+def typed(values, code: str) -> array:
+    column = array(code)
+    column.frombytes(np.ascontiguousarray(values, dtype=np.dtype(code)).tobytes())
+    return column
+
+def grouped(ids, keys):
+    """Sorted id lists per key, built with one sort instead of a loop over trips"""
+    order = np.argsort(keys, kind='stable')
+    unique, starts = np.unique(keys[order], return_index=True)
+    return {int(key): typed(part, 'q') for key, part in zip(unique, np.split(ids[order], starts[1:]))}
+
+def build_system(num_trips: int, num_drivers: int, num_riders: int) -> WorkingRideShareSystem:
+    """A system whose archive and trip index are filled column by column"""
+    system = WorkingRideShareSystem()
+    for i in range(num_drivers):
+        driver = Driver(101 + i, f"Driver {i}", i % 15)
+        driver.listener = system._on_driver_change
+        system.drivers[driver.id] = driver
+        system.driver_index.update(driver)
+    for i in range(num_riders):
+        rider = Rider(101 + i, f"Rider {i}", f"rider{i}@example.com")
+        system.riders[rider.id] = rider
+        system.rider_ids.append(rider.id)
+
+    rng = np.random.default_rng(42)
+    ids = np.arange(1, num_trips + 1)
+    created = time.time() - 30 * 86400 + np.sort(rng.random(num_trips)) * 30 * 86400
+    values = {
+        'id': ids,
+        'rider_id': rng.integers(101, 101 + num_riders, num_trips),
+        'driver_id': rng.integers(101, 101 + num_drivers, num_trips),
+        'pickup': rng.integers(0, 15, num_trips),
+        'dropoff': rng.integers(0, 15, num_trips),
+        'status': (rng.random(num_trips) < 0.1).astype(np.int8),
+        'distance': rng.uniform(5, 60, num_trips),
+        'created_at': created,
+        'assigned_at': created + 90,
+        'started_at': created + 300,
+        'completed_at': created + 1500,
+        'cancelled_at': np.full(num_trips, np.nan)
+    }
+    values['fare'] = 2.5 + values['distance'] * 1.5
+
+    archive = system.archive
+    archive.columns = {name: typed(values[name], code) for name, code in COLUMNS.items()}
+    archive._row_of_trip = typed(np.concatenate([[NO_ROW], ids - 1]), 'q')
+    completed = values['status'] == 0
+    archive._counts = [int(completed.sum()), int((~completed).sum())]
+    archive._completed_distance = float(values['distance'][completed].sum())
+    archive._completed_fare = float(values['fare'][completed].sum())
+    system.trip_counters.add_archived(archive.totals())
+
+    index = system.trip_index
+    index.ids = typed(ids, 'q')
+    index.created = typed(created, 'd')
+    index.by_status[TripStatus.COMPLETED] = typed(ids[completed], 'q')
+    index.by_status[TripStatus.CANCELLED] = typed(ids[~completed], 'q')
+    index.by_driver = grouped(ids, values['driver_id'])
+    zone_of = np.arange(15) // 3
+    for zone in range(5):
+        touches = (zone_of[values['pickup']] == zone) | (zone_of[values['dropoff']] == zone)
+        index.by_zone[f"Zone {zone}"] = typed(ids[touches], 'q')
+
+    # Every trip is archived, so by_rider stays empty and riders' pages scan the archive
+    for rider_id, trip_ids in grouped(ids, values['rider_id']).items():
+        rider = system.riders[rider_id]
+        rider.trip_history.extend(trip_ids[-20:])
+        rider.trip_count = len(trip_ids)
+    system.next_trip_id = num_trips + 1
+    system.next_driver_id = 101 + num_drivers
+    system.next_rider_id = 101 + num_riders
+    return system
+
+def timed(label: str, action, repeat: int = 1):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        action()
+    elapsed = (time.perf_counter() - started) / repeat
+    print(f"{label:40s} {elapsed * 1000:10.3f} ms")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--trips', type=int, default=5_000_000)
+    parser.add_argument('--drivers', type=int, default=10_000)
+    parser.add_argument('--riders', type=int, default=500_000)
+    parser.add_argument('--dir', default=tempfile.mkdtemp())
+    args = parser.parse_args()
+
+    with contextlib.redirect_stdout(open(os.devnull, 'w')):
+        print(f"Building {args.trips} trips")
+        system = build_system(args.trips, args.drivers, args.riders)
+        journal = Journal(args.dir)
+        journal.start(lambda: capture(system, journal))
+        journal.snapshot()
+        journal.close()
+    size = os.path.getsize(os.path.join(args.dir, 'snapshot.bin'))
+    print(f"Snapshot of {args.trips} trips, {args.riders} riders: {size / 1e9:.2f} GB")
+    del system
+
+    recovered = WorkingRideShareSystem()
+    with contextlib.redirect_stdout(open(os.devnull, 'w')):
+        started = time.perf_counter()
+        recovered.attach_journal(Journal(args.dir))
+        elapsed = time.perf_counter() - started
+    print(f"{'startup (map snapshot, ready)':40s} {elapsed * 1000:10.3f} ms")
+
+    rng = random.Random(7)
+    timed('first access to a rider', lambda: recovered.riders[rng.randrange(101, 101 + args.riders)], 1000)
+    timed('first access to a driver', lambda: recovered.drivers[rng.randrange(101, 101 + args.drivers)], 1000)
+    timed('archived trip by id', lambda: recovered.get_trip(rng.randrange(1, args.trips)), 1000)
+    timed("rider's trips page", lambda: recovered.list_trips(rider_id=rng.randrange(101, 101 + args.riders)), 1000)
+    timed('newest trips page', lambda: recovered.list_trips(limit=50), 100)
+    timed('build every rider', lambda: len(list(recovered.riders.values())))
+
+if __name__ == '__main__':
+    main()
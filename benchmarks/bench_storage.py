@@ -0,0 +1,82 @@
+"""Compare write latency with in-memory and SQLite state
+
+Usage: python benchmarks/bench_storage.py [--trips 20000] [--path /tmp/bench.db]
+"""
+import argparse
+import contextlib
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.storage import SQLiteStore
+from modules.trip import Trip
+from modules.working_system import WorkingRideShareSystem
+
+def percentile(samples, fraction: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+def run_trips(system, num_trips: int, num_drivers: int, num_riders: int):
+    """Create and finish trips the way the system does, timing each one"""
+    drivers = [system.add_driver(f"Driver {i}", i % 15) for i in range(num_drivers)]
+    riders = [system.add_rider(f"Rider {i}", f"rider{i}@example.com") for i in range(num_riders)]
+
+    latencies = []
+    for i in range(num_trips):
+        started = time.perf_counter()
+        rider = riders[i % num_riders]
+        trip = Trip(system.next_trip_id, rider.id, i % 15, (i + 3) % 15)
+        system.next_trip_id += 1
+        system.trips[trip.id] = trip
+        rider.add_trip(trip.id)
+        system.changelog.record('riders', rider.id)
+        system.events.track(trip)
+        driver = drivers[i % num_drivers]
+        trip.assign_driver(driver.id, 20.0)
+        driver.assign_trip(trip.id)
+        trip.start()
+        trip.complete(12.5, 21.25)
+        driver.complete_trip(trip.dropoff)
+        latencies.append(time.perf_counter() - started)
+    return latencies
+
+def report(name: str, latencies, elapsed: float):
+    print(f"{name:8s} {len(latencies) / elapsed:9.0f} trips/s  "
+          f"p50={percentile(latencies, 0.5) * 1e6:7.1f} us  p99={percentile(latencies, 0.99) * 1e6:7.1f} us")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--trips', type=int, default=20_000)
+    parser.add_argument('--drivers', type=int, default=200)
+    parser.add_argument('--riders', type=int, default=2_000)
+    parser.add_argument('--path', default=os.path.join(tempfile.mkdtemp(), 'bench.db'))
+    args = parser.parse_args()
+
+    memory = WorkingRideShareSystem()
+    with contextlib.redirect_stdout(open(os.devnull, 'w')):
+        started = time.perf_counter()
+        latencies = run_trips(memory, args.trips, args.drivers, args.riders)
+        elapsed = time.perf_counter() - started
+    report('memory', latencies, elapsed)
+
+    store = SQLiteStore(args.path)
+    sqlite = WorkingRideShareSystem()
+    sqlite.attach_store(store)
+    with contextlib.redirect_stdout(open(os.devnull, 'w')):
+        started = time.perf_counter()
+        latencies = run_trips(sqlite, args.trips, args.drivers, args.riders)
+        elapsed = time.perf_counter() - started
+        drain_started = time.perf_counter()
+        store.flush(timeout=None)
+        drained = time.perf_counter() - drain_started
+    report('sqlite', latencies, elapsed)
+    print(f"sqlite   drained in {drained * 1000:.1f} ms after the last trip; "
+          f"{store.rows_written} rows in {store.flushes} transactions")
+
+    store.close()
+
+if __name__ == '__main__':
+    main()
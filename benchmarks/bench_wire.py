@@ -0,0 +1,88 @@
+"""Compare JSON and MessagePack encoding of a large system state
+
+Usage: python benchmarks/bench_wire.py [--drivers 10000] [--trips 100000]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.driver import Driver, DriverStatus
+from modules.rider import Rider
+from modules.trip import Trip, TripStatus
+from modules import wire
+
+def build_state(num_drivers: int, num_trips: int, num_riders: int) -> dict:
+    """Synthetic get_state()-shaped payload"""
+    rng = random.Random(42)
+    drivers = []
+    for i in range(num_drivers):
+        driver = Driver(1000 + i, f"Driver {i}", rng.randrange(15))
+        driver.vehicle = "Civic"
+        driver.license_plate = f"PLT{i:05d}"
+        if i % 3 == 0:
+            driver.status = DriverStatus.BUSY
+            driver.current_trip_id = i + 1
+        drivers.append(driver)
+
+    riders = [Rider(1000 + i, f"Rider {i}", f"rider{i}@email.com") for i in range(num_riders)]
+
+    trips = []
+    statuses = [TripStatus.COMPLETED, TripStatus.CANCELLED, TripStatus.ONGOING]
+    for i in range(num_trips):
+        trip = Trip(i + 1, 1000 + rng.randrange(num_riders), rng.randrange(15), rng.randrange(15))
+        trip.driver_id = 1000 + rng.randrange(num_drivers)
+        trip.status = statuses[i % len(statuses)]
+        trip.distance = round(rng.uniform(5, 60), 2)
+        trip.fare = round(2.5 + trip.distance * 1.5, 2)
+        trips.append(trip)
+
+    return {
+        'drivers': [d.to_dict() for d in drivers],
+        'riders': [r.to_dict() for r in riders],
+        'trips': [t.to_dict() for t in trips]
+    }
+
+def time_encode(payload: dict, fmt: str, repeat: int) -> tuple:
+    best = float('inf')
+    size = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        data = wire.encode(payload, fmt)
+        best = min(best, time.perf_counter() - start)
+        size = len(data)
+    return size, best
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--drivers', type=int, default=10000)
+    parser.add_argument('--trips', type=int, default=100000)
+    parser.add_argument('--riders', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"Building state: {args.drivers} drivers, {args.riders} riders, {args.trips} trips")
+    payload = build_state(args.drivers, args.trips, args.riders)
+
+    formats = [wire.JSON]
+    if wire.msgpack_available():
+        formats.append(wire.MSGPACK)
+    else:
+        print("msgpack is not installed; only JSON is measured")
+
+    results = {}
+    for fmt in formats:
+        size, seconds = time_encode(payload, fmt, args.repeat)
+        results[fmt] = (size, seconds)
+        print(f"{fmt:8s} size={size / 1e6:8.2f} MB  encode={seconds * 1000:8.1f} ms (best of {args.repeat})")
+
+    if wire.MSGPACK in results:
+        json_size, json_time = results[wire.JSON]
+        pack_size, pack_time = results[wire.MSGPACK]
+        print(f"msgpack/json size ratio {pack_size / json_size:.2f}, encode speedup {json_time / pack_time:.2f}x")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,286 @@
+"""Replay recorded requests or a synthetic arrival process against app.py
+
+Usage:
+    python benchmarks/load_test.py --rate 50 --duration 30 --concurrency 16
+    python benchmarks/load_test.py --url http://localhost:5000 --replay recorded.ndjson
+    python benchmarks/load_test.py --rate 100 --duration 10 --save recorded.ndjson
+
+Replay files are NDJSON, one request per line:
+    {"at": 0.25, "method": "POST", "path": "/api/trip/request", "json": {"rider_id": 101, "pickup": 1, "dropoff": 7}}
+"at" is seconds from the start of the run; lines without it are spread at --rate.
+"""
+import argparse
+import contextlib
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+class ClientTarget:
+    """Drives app.py in-process through Flask's test client"""
+
+    def __init__(self):
+        import app as server
+        self.app = server.app
+        self._local = threading.local()
+
+    def request(self, method: str, path: str, body=None):
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            client = self._local.client = self.app.test_client()
+        response = client.open(path, method=method, json=body)
+        return response.status_code, response.get_json(silent=True)
+
+class HttpTarget:
+    """Drives a running server over HTTP"""
+
+    def __init__(self, base_url: str, timeout: float = 30):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+
+    def request(self, method: str, path: str, body=None):
+        data = json.dumps(body).encode() if body is not None else None
+        req = urllib.request.Request(self.base_url + path, data=data, method=method)
+        if data is not None:
+            req.add_header('Content-Type', 'application/json')
+        try:
+            with urllib.request.urlopen(req, timeout=self.timeout) as response:
+                return response.status, json.loads(response.read() or b'null')
+        except urllib.error.HTTPError as e:
+            try:
+                return e.code, json.loads(e.read() or b'null')
+            except ValueError:
+                return e.code, None
+
+def endpoint_of(method: str, path: str) -> str:
+    """Group paths with ids and query strings under one endpoint name"""
+    path = re.sub(r'/\d+(?=/|$)', '/<id>', path.split('?', 1)[0])
+    return f"{method} {path}"
+
+def percentile(sorted_values, pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+def load_replay(path: str, rate: float):
+    """Requests from an NDJSON file, giving lines without "at" a fixed spacing"""
+    requests = []
+    with open(path) as f:
+        for number, line in enumerate(f):
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            record.setdefault('method', 'GET')
+            record.setdefault('at', number / rate)
+            requests.append(record)
+    requests.sort(key=lambda r: r['at'])
+    return requests
+
+def synthesize(target, rate: float, duration: float, cancel_ratio: float, read_ratio: float, seed: int):
+    """Poisson arrivals of trip requests, cancels of earlier trips and reads"""
+    rng = random.Random(seed)
+    _, city = target.request('GET', '/api/city')
+    locations = [loc['id'] for loc in city['city']['locations']] if city else list(range(15))
+    _, riders = target.request('GET', '/api/riders?limit=500&fields=id')
+    rider_ids = [r['id'] for r in riders['items']] if riders else []
+    if not rider_ids:
+        raise SystemExit('No riders to book trips for; run without --no-init')
+
+    requests = []
+    at = 0.0
+    booked = 0
+    while True:
+        at += rng.expovariate(rate)
+        if at >= duration:
+            break
+        roll = rng.random()
+        if roll < read_ratio:
+            path = rng.choice(['/api/system/state', '/api/analytics', '/api/trips?limit=50'])
+            requests.append({'at': at, 'method': 'GET', 'path': path})
+        elif roll < read_ratio + cancel_ratio and booked:
+            # Cancels name an earlier booking; its trip id comes from that booking's response
+            requests.append({'at': at, 'method': 'POST', 'path': '/api/trip/<booked>/cancel',
+                             'booked': rng.randrange(booked)})
+        else:
+            pickup, dropoff = rng.sample(locations, 2)
+            requests.append({'at': at, 'method': 'POST', 'path': '/api/trip/request', 'booking': booked,
+                             'json': {'rider_id': rng.choice(rider_ids), 'pickup': pickup, 'dropoff': dropoff}})
+            booked += 1
+    return requests
+
+class LoadRun:
+    """Open-loop run: requests start at their scheduled time whatever the backlog
+
+    Latency is measured from the scheduled start, so queueing behind a slow
+    server counts against it instead of silently lowering the offered rate.
+    """
+
+    def __init__(self, target, concurrency: int):
+        self.target = target
+        self.concurrency = concurrency
+        self.samples = {}
+        self.errors = {}
+        self.trip_ids = []
+        self._booked = {}
+        self._lock = threading.Lock()
+
+    def _send(self, record, scheduled: float):
+        path = record['path']
+        if 'booked' in record:
+            with self._lock:
+                booked = self._booked.get(record['booked'])
+            if booked is None:
+                return
+            path = path.replace('<booked>', str(booked))
+
+        try:
+            status, body = self.target.request(record['method'], path, record.get('json'))
+        except Exception:
+            status, body = 0, None
+        latency = time.perf_counter() - scheduled
+
+        endpoint = endpoint_of(record['method'], path)
+        failed = status >= 400 or status == 0 or (isinstance(body, dict) and body.get('success') is False)
+        with self._lock:
+            self.samples.setdefault(endpoint, []).append(latency)
+            if failed:
+                self.errors[endpoint] = self.errors.get(endpoint, 0) + 1
+            if endpoint == 'POST /api/trip/request':
+                trip = body.get('trip') if isinstance(body, dict) else None
+                if trip:
+                    self.trip_ids.append(trip['id'])
+                    if 'booking' in record:
+                        self._booked[record['booking']] = trip['id']
+
+    def run(self, requests):
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            for record in requests:
+                scheduled = started + record['at']
+                delay = scheduled - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                executor.submit(self._send, record, scheduled)
+        return time.perf_counter() - started
+
+def trip_outcomes(target, trip_ids):
+    """Dispatch success and cancellation rates over the trips booked in the run"""
+    if not trip_ids:
+        return {'booked': 0, 'dispatched': 0, 'cancelled': 0, 'dispatch_rate': 0.0, 'cancellation_rate': 0.0}
+
+    wanted = set(trip_ids)
+    seen = {}
+    cursor = None
+    while True:
+        query = "/api/trips?limit=500&fields=id,status,driver_id"
+        if cursor:
+            query += f"&cursor={cursor}"
+        _, page = target.request('GET', query)
+        if not page:
+            break
+        for trip in page['items']:
+            if trip['id'] in wanted:
+                seen[trip['id']] = trip
+        cursor = page['next_cursor']
+        if not cursor or cursor <= min(wanted):
+            break
+
+    dispatched = sum(1 for t in seen.values() if t['driver_id'] is not None)
+    cancelled = sum(1 for t in seen.values() if t['status'] == 'CANCELLED')
+    return {
+        'booked': len(wanted),
+        'dispatched': dispatched,
+        'cancelled': cancelled,
+        'dispatch_rate': round(dispatched / len(wanted), 4),
+        'cancellation_rate': round(cancelled / len(wanted), 4)
+    }
+
+def build_report(run: LoadRun, elapsed: float, outcomes) -> dict:
+    endpoints = {}
+    for endpoint, latencies in sorted(run.samples.items()):
+        latencies = sorted(latencies)
+        endpoints[endpoint] = {
+            'requests': len(latencies),
+            'errors': run.errors.get(endpoint, 0),
+            'throughput_per_s': round(len(latencies) / elapsed, 2),
+            'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+            'p95_ms': round(percentile(latencies, 95) * 1000, 2),
+            'p99_ms': round(percentile(latencies, 99) * 1000, 2)
+        }
+    total = sum(e['requests'] for e in endpoints.values())
+    return {
+        'elapsed_s': round(elapsed, 2),
+        'requests': total,
+        'throughput_per_s': round(total / elapsed, 2) if elapsed else 0.0,
+        'endpoints': endpoints,
+        'trips': outcomes
+    }
+
+def print_report(report: dict, out):
+    print(f"\n{report['requests']} requests in {report['elapsed_s']}s "
+          f"({report['throughput_per_s']} req/s)", file=out)
+    print(f"{'endpoint':40s} {'count':>7s} {'errors':>7s} {'req/s':>8s} {'p50 ms':>8s} {'p95 ms':>8s} {'p99 ms':>8s}", file=out)
+    for endpoint, stats in report['endpoints'].items():
+        print(f"{endpoint:40s} {stats['requests']:7d} {stats['errors']:7d} {stats['throughput_per_s']:8.1f} "
+              f"{stats['p50_ms']:8.1f} {stats['p95_ms']:8.1f} {stats['p99_ms']:8.1f}", file=out)
+    trips = report['trips']
+    print(f"trips booked={trips['booked']} dispatched={trips['dispatched']} ({trips['dispatch_rate']:.1%}) "
+          f"cancelled={trips['cancelled']} ({trips['cancellation_rate']:.1%})", file=out)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', help='Base URL of a running server; default drives app.py in-process')
+    parser.add_argument('--replay', help='NDJSON file of recorded requests')
+    parser.add_argument('--save', help='Write the generated request stream to this NDJSON file')
+    parser.add_argument('--rate', type=float, default=20, help='Arrivals per second')
+    parser.add_argument('--duration', type=float, default=10, help='Seconds of synthetic traffic')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--cancel-ratio', type=float, default=0.1)
+    parser.add_argument('--read-ratio', type=float, default=0.3)
+    parser.add_argument('--drain', type=float, default=2, help='Seconds to let dispatch settle before counting outcomes')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--no-init', action='store_true', help='Keep existing data instead of calling /api/init')
+    parser.add_argument('--json', help='Also write the report to this file')
+    parser.add_argument('--verbose', action='store_true', help="Show the app's own logging")
+    args = parser.parse_args()
+
+    out = sys.stdout
+    quiet = contextlib.nullcontext() if args.verbose or args.url else contextlib.redirect_stdout(open(os.devnull, 'w'))
+    with quiet:
+        target = HttpTarget(args.url) if args.url else ClientTarget()
+        if not args.no_init:
+            target.request('POST', '/api/init')
+
+        if args.replay:
+            requests = load_replay(args.replay, args.rate)
+        else:
+            requests = synthesize(target, args.rate, args.duration, args.cancel_ratio, args.read_ratio, args.seed)
+        if args.save:
+            with open(args.save, 'w') as f:
+                for record in requests:
+                    f.write(json.dumps(record) + '\n')
+        print(f"Sending {len(requests)} requests with concurrency {args.concurrency}", file=out)
+
+        run = LoadRun(target, args.concurrency)
+        elapsed = run.run(requests)
+        time.sleep(args.drain)
+        outcomes = trip_outcomes(target, run.trip_ids)
+
+    report = build_report(run, elapsed, outcomes)
+    print_report(report, out)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+from collections import deque
+from typing import Deque, Dict, Optional, Tuple
+import math
+import threading
+import time
+
+class AdmissionController:
+    """Admits or sheds work based on in-flight count and recent p99 latency
+
+    Latency samples expire after window_seconds. While shedding on latency
+    one probe request is admitted every probe_interval seconds; a probe
+    that finishes under the threshold drops the slow samples, so recovery
+    is noticed without waiting for the window to pass.
+    """
+
+    def __init__(self, max_in_flight: int = 32, p99_threshold_ms: float = 500,
+                 window_seconds: float = 10, max_samples: int = 1000, probe_interval: float = 1):
+        self.max_in_flight = max(1, max_in_flight)
+        self.p99_threshold_ms = p99_threshold_ms
+        self.window_seconds = window_seconds
+        self.probe_interval = probe_interval
+
+        self.in_flight = 0
+        self.admitted = 0
+        self.shed = 0
+        self.probes = 0
+        self._samples: Deque[Tuple[float, float]] = deque(maxlen=max_samples)
+        self._next_probe_at = 0.0
+        self._probe: Optional[int] = None  # thread handling the probe in flight
+        self._lock = threading.Lock()
+
+    def _expire(self, now: float):
+        """Drop latency samples older than the window"""
+        while self._samples and now - self._samples[0][0] > self.window_seconds:
+            self._samples.popleft()
+
+    def _percentile_ms(self, q: float) -> float:
+        if not self._samples:
+            return 0.0
+        ordered = sorted(latency for _, latency in self._samples)
+        index = min(len(ordered) - 1, max(0, math.ceil(q * len(ordered)) - 1))
+        return ordered[index] * 1000
+
+    def try_admit(self) -> Optional[float]:
+        """Admit one request; returns None if admitted, else seconds to wait before retrying"""
+        now = time.time()
+        with self._lock:
+            self._expire(now)
+            p99_ms = self._percentile_ms(0.99)
+
+            if self.in_flight >= self.max_in_flight:
+                return self._shed(now, p99_ms)
+            if p99_ms > self.p99_threshold_ms:
+                if self._probe is not None or now < self._next_probe_at:
+                    return self._shed(now, p99_ms)
+                self._probe = threading.get_ident()
+                self._next_probe_at = now + self.probe_interval
+                self.probes += 1
+
+            self.in_flight += 1
+            self.admitted += 1
+            return None
+
+    def _shed(self, now: float, p99_ms: float) -> float:
+        self.shed += 1
+        # Oldest sample leaves the window first; retry once it has
+        if self._samples:
+            retry_after = self.window_seconds - (now - self._samples[0][0])
+        else:
+            retry_after = p99_ms / 1000
+        return max(1.0, round(retry_after, 1))
+
+    def release(self, latency: float):
+        """Finish an admitted request that took latency seconds, on the thread that was admitted"""
+        with self._lock:
+            self.in_flight -= 1
+            if self._probe == threading.get_ident():
+                self._probe = None
+                if latency * 1000 <= self.p99_threshold_ms:
+                    self._samples.clear()
+            self._samples.append((time.time(), latency))
+
+    def get_metrics(self) -> Dict:
+        """In-flight count, shed counters and recent latency percentiles"""
+        with self._lock:
+            self._expire(time.time())
+            return {
+                'in_flight': self.in_flight,
+                'max_in_flight': self.max_in_flight,
+                'admitted': self.admitted,
+                'shed': self.shed,
+                'probes': self.probes,
+                'p50_ms': round(self._percentile_ms(0.50), 2),
+                'p99_ms': round(self._percentile_ms(0.99), 2),
+                'p99_threshold_ms': self.p99_threshold_ms,
+                'samples': len(self._samples)
+            }
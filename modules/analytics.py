@@ -0,0 +1,215 @@
+from typing import Dict, List, Optional, Sequence, Tuple
+import math
+import threading
+import time
+
+from .trip import TripStatus
+
+ACTIVE_STATUSES = (TripStatus.REQUESTED, TripStatus.ASSIGNED, TripStatus.ONGOING)
+
+class TripCounters:
+    """Trip counts per status and completed distance/fare, kept current from trip events
+
+    Every transition moves one trip from its previous status bucket to the new
+    one, so reads cost O(1) however many trips exist. Leaving COMPLETED (e.g.
+    when an operation is undone) subtracts the distance and fare the trip had
+    before the transition.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        with self.lock:
+            self.total = 0
+            self.by_status: Dict[TripStatus, int] = {status: 0 for status in TripStatus}
+            self.completed_distance = 0.0
+            self.completed_fare = 0.0
+
+    def on_transition(self, event):
+        """Move the trip from its previous status bucket to the new one"""
+        with self.lock:
+            if event.previous is None:
+                self.total += 1
+            else:
+                self.by_status[event.previous] -= 1
+                if event.previous == TripStatus.COMPLETED:
+                    before = {name: old for name, old, _ in event.changes}
+                    self._add_completed(before.get('distance', event.trip.distance),
+                                        before.get('fare', event.trip.fare), -1)
+
+            self.by_status[event.status] += 1
+            if event.status == TripStatus.COMPLETED:
+                self._add_completed(event.trip.distance, event.trip.fare, 1)
+
+    def remove(self, trip):
+        """Forget a trip that is being deleted outright"""
+        with self.lock:
+            self.total -= 1
+            self.by_status[trip.status] -= 1
+            if trip.status == TripStatus.COMPLETED:
+                self._add_completed(trip.distance, trip.fare, -1)
+
+    def add_archived(self, totals: Dict):
+        """Count trips held only in an archive, from TripArchive.totals()"""
+        with self.lock:
+            for status, count in totals['by_status'].items():
+                self.total += count
+                self.by_status[status] += count
+            self._add_completed(totals['completed_distance'], totals['completed_fare'], 1)
+
+    def _add_completed(self, distance: float, fare: float, sign: int):
+        self.completed_distance += sign * distance
+        self.completed_fare += sign * fare
+
+    def active(self) -> int:
+        return sum(self.by_status[status] for status in ACTIVE_STATUSES)
+
+    def snapshot(self) -> Dict:
+        """Consistent copy of the counters"""
+        with self.lock:
+            completed = self.by_status[TripStatus.COMPLETED]
+            return {
+                'total_trips': self.total,
+                'completed_trips': completed,
+                'cancelled_trips': self.by_status[TripStatus.CANCELLED],
+                'active_trips': self.active(),
+                'total_distance': round(self.completed_distance, 2),
+                'total_fare': round(self.completed_fare, 2),
+                'average_distance': round(self.completed_distance / completed, 2) if completed else 0,
+                'average_fare': round(self.completed_fare / completed, 2) if completed else 0
+            }
+
+# Log-spaced histogram bins for durations: bin i covers [LOW * GROWTH**i, LOW * GROWTH**(i+1))
+HISTOGRAM_LOW = 0.1
+HISTOGRAM_GROWTH = 1.25
+HISTOGRAM_BINS = 64
+
+def _bin_of(seconds: float) -> int:
+    if seconds <= HISTOGRAM_LOW:
+        return 0
+    return min(HISTOGRAM_BINS - 1, int(math.log(seconds / HISTOGRAM_LOW, HISTOGRAM_GROWTH)))
+
+def _bin_value(index: int) -> float:
+    """Geometric middle of a bin, within ~12% of any value in it"""
+    return HISTOGRAM_LOW * HISTOGRAM_GROWTH ** (index + 0.5)
+
+def histogram_percentile(histogram: Sequence[int], count: int, pct: float) -> Optional[float]:
+    if count == 0:
+        return None
+    rank = max(1, math.ceil(pct / 100 * count))
+    seen = 0
+    for index, n in enumerate(histogram):
+        seen += n
+        if seen >= rank:
+            return round(_bin_value(index), 2)
+    return round(_bin_value(HISTOGRAM_BINS - 1), 2)
+
+class RollingWindow:
+    """Counters and duration histograms over the last window_seconds
+
+    The window is a ring of fixed-width buckets; a bucket is zeroed and reused
+    once it falls out of the window, so memory never grows and recording is
+    O(1). Reads merge the live buckets.
+    """
+
+    def __init__(self, window_seconds: float, counters: Sequence[str], distributions: Sequence[str],
+                 buckets: int = 60):
+        self.window_seconds = window_seconds
+        self.buckets = buckets
+        self.span = window_seconds / buckets
+        self._ticks = [-1] * buckets
+        self._counts = {name: [0] * buckets for name in counters}
+        self._histograms = {name: [[0] * HISTOGRAM_BINS for _ in range(buckets)] for name in distributions}
+
+    def _slot(self, now: float) -> Optional[int]:
+        """Bucket for a timestamp, or None if it is older than the window"""
+        tick = int(now // self.span)
+        index = tick % self.buckets
+        if self._ticks[index] > tick:
+            return None
+        if self._ticks[index] != tick:
+            self._ticks[index] = tick
+            for counts in self._counts.values():
+                counts[index] = 0
+            for histograms in self._histograms.values():
+                histograms[index][:] = [0] * HISTOGRAM_BINS
+        return index
+
+    def add(self, name: str, now: float):
+        index = self._slot(now)
+        if index is not None:
+            self._counts[name][index] += 1
+
+    def observe(self, name: str, seconds: float, now: float):
+        index = self._slot(now)
+        if index is not None:
+            self._histograms[name][index][_bin_of(seconds)] += 1
+
+    def _live(self, now: float) -> List[int]:
+        oldest = int(now // self.span) - self.buckets
+        return [i for i, tick in enumerate(self._ticks) if tick > oldest]
+
+    def snapshot(self, now: float) -> Dict:
+        live = self._live(now)
+        minutes = self.window_seconds / 60
+        data = {'window_seconds': self.window_seconds}
+        for name, counts in self._counts.items():
+            data[f'{name}_per_minute'] = round(sum(counts[i] for i in live) / minutes, 2)
+        for name, histograms in self._histograms.items():
+            merged = [0] * HISTOGRAM_BINS
+            for i in live:
+                merged = [a + b for a, b in zip(merged, histograms[i])]
+            count = sum(merged)
+            data[name] = {
+                'count': count,
+                'p50_seconds': histogram_percentile(merged, count, 50),
+                'p95_seconds': histogram_percentile(merged, count, 95)
+            }
+        return data
+
+class RollingMetrics:
+    """Trips, completions and cancellations per minute plus rider wait and
+    pickup time percentiles over the last 1, 5 and 60 minutes, fed by trip events
+
+    Rider wait is created -> assigned; pickup time is assigned -> started.
+    """
+
+    WINDOWS: Tuple[Tuple[str, int], ...] = (('1m', 60), ('5m', 300), ('60m', 3600))
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        with self.lock:
+            self.windows = {
+                label: RollingWindow(seconds, ('trips', 'completed', 'cancellations'),
+                                     ('rider_wait', 'pickup_time'))
+                for label, seconds in self.WINDOWS
+            }
+
+    def on_transition(self, event):
+        # Undone operations are not new activity
+        if event.undo:
+            return
+        trip = event.trip
+        now = event.timestamp
+        with self.lock:
+            for window in self.windows.values():
+                if event.previous is None:
+                    window.add('trips', now)
+                elif event.status == TripStatus.ASSIGNED and trip.assigned_ts:
+                    window.observe('rider_wait', trip.assigned_ts - trip.created_ts, now)
+                elif event.status == TripStatus.ONGOING and trip.started_ts and trip.assigned_ts:
+                    window.observe('pickup_time', trip.started_ts - trip.assigned_ts, now)
+                elif event.status == TripStatus.COMPLETED:
+                    window.add('completed', now)
+                elif event.status == TripStatus.CANCELLED:
+                    window.add('cancellations', now)
+
+    def snapshot(self, now: Optional[float] = None) -> Dict:
+        now = time.time() if now is None else now
+        with self.lock:
+            return {label: window.snapshot(now) for label, window in self.windows.items()}
@@ -0,0 +1,209 @@
+from array import array
+from typing import Dict, Iterator, List, Optional
+import math
+import threading
+
+try:
+    import numpy as np
+except ImportError:  # optional; rider scans fall back to a Python loop
+    np = None
+
+from .snapshot import array_segments, copy_array
+from .trip import Trip, TripStatus
+
+# Finished statuses are stored as small integer codes
+STATUS_CODES = {TripStatus.COMPLETED: 0, TripStatus.CANCELLED: 1}
+STATUS_BY_CODE = {code: status for status, code in STATUS_CODES.items()}
+
+NO_DRIVER = -1
+NO_ROW = -1
+
+# Column name -> array typecode; timestamps are epoch seconds, NaN when unset
+COLUMNS = {
+    'id': 'q',
+    'rider_id': 'q',
+    'driver_id': 'q',
+    'pickup': 'l',
+    'dropoff': 'l',
+    'status': 'b',
+    'distance': 'd',
+    'fare': 'd',
+    'created_at': 'd',
+    'assigned_at': 'd',
+    'started_at': 'd',
+    'completed_at': 'd',
+    'cancelled_at': 'd'
+}
+
+TIMESTAMP_COLUMNS = ('created_at', 'assigned_at', 'started_at', 'completed_at', 'cancelled_at')
+# Trip slot holding each timestamp column as epoch seconds
+TIMESTAMP_SLOTS = {name: name[:-len('_at')] + '_ts' for name in TIMESTAMP_COLUMNS}
+
+def _epoch(value: Optional[float]) -> float:
+    return value if value is not None else math.nan
+
+def _optional(value: float) -> Optional[float]:
+    return None if math.isnan(value) else value
+
+class TripArchive:
+    """Append-only columnar store for completed and cancelled trips
+
+    Each field lives in its own typed array, about 100 bytes per trip in
+    total, instead of a Trip object per trip. Rows are looked up
+    through a dense trip id -> row array, since trip ids are allocated in
+    sequence. Trips read back from the archive are fresh Trip objects.
+    Loaded from a snapshot, the columns are MappedArrays over the file.
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.clear()
+
+    def clear(self):
+        with self.lock:
+            self.columns: Dict[str, array] = {name: array(code) for name, code in COLUMNS.items()}
+            self._row_of_trip = array('q')
+            self._removed = 0
+            # Running totals, so counters can be rebuilt without scanning the columns
+            self._counts = [0] * len(STATUS_CODES)
+            self._completed_distance = 0.0
+            self._completed_fare = 0.0
+
+    def __len__(self) -> int:
+        return len(self.columns['id']) - self._removed
+
+    def __contains__(self, trip_id: int) -> bool:
+        return self._row(trip_id) != NO_ROW
+
+    def _row(self, trip_id: int) -> int:
+        if 0 <= trip_id < len(self._row_of_trip):
+            return self._row_of_trip[trip_id]
+        return NO_ROW
+
+    def append(self, trip: Trip):
+        """Store a finished trip"""
+        if trip.status not in STATUS_CODES:
+            raise ValueError(f"Only finished trips can be archived, trip {trip.id} is {trip.status.value}")
+
+        with self.lock:
+            columns = self.columns
+            row = len(columns['id'])
+            columns['id'].append(trip.id)
+            columns['rider_id'].append(trip.rider_id)
+            columns['driver_id'].append(trip.driver_id if trip.driver_id is not None else NO_DRIVER)
+            columns['pickup'].append(trip.pickup)
+            columns['dropoff'].append(trip.dropoff)
+            columns['status'].append(STATUS_CODES[trip.status])
+            columns['distance'].append(trip.distance)
+            columns['fare'].append(trip.fare)
+            for name, slot in TIMESTAMP_SLOTS.items():
+                columns[name].append(_epoch(getattr(trip, slot)))
+
+            if trip.id >= len(self._row_of_trip):
+                self._row_of_trip.extend([NO_ROW] * (trip.id + 1 - len(self._row_of_trip)))
+            self._row_of_trip[trip.id] = row
+            self._add_totals(STATUS_CODES[trip.status], trip.distance, trip.fare, 1)
+
+    def _add_totals(self, code: int, distance: float, fare: float, sign: int):
+        self._counts[code] += sign
+        if code == STATUS_CODES[TripStatus.COMPLETED]:
+            self._completed_distance += sign * distance
+            self._completed_fare += sign * fare
+
+    def totals(self) -> Dict:
+        """Archived trips per status and completed distance and fare"""
+        with self.lock:
+            return {
+                'by_status': {STATUS_BY_CODE[code]: count for code, count in enumerate(self._counts)},
+                'completed_distance': self._completed_distance,
+                'completed_fare': self._completed_fare
+            }
+
+    def get(self, trip_id: int) -> Optional[Trip]:
+        """Rebuild the Trip for an archived id"""
+        with self.lock:
+            row = self._row(trip_id)
+            if row == NO_ROW:
+                return None
+            return self._materialize(row)
+
+    def _materialize(self, row: int) -> Trip:
+        columns = self.columns
+        trip = Trip(columns['id'][row], columns['rider_id'][row], columns['pickup'][row], columns['dropoff'][row])
+        driver_id = columns['driver_id'][row]
+        trip.driver_id = driver_id if driver_id != NO_DRIVER else None
+        trip.status = STATUS_BY_CODE[columns['status'][row]]
+        trip.distance = columns['distance'][row]
+        trip.fare = columns['fare'][row]
+        for name, slot in TIMESTAMP_SLOTS.items():
+            setattr(trip, slot, _optional(columns[name][row]))
+        return trip
+
+    def restore(self, trip_id: int) -> Optional[Trip]:
+        """Unlink an archived trip and return it, e.g. to undo its cancellation
+
+        The row's storage stays in place but is marked removed (status -1).
+        """
+        with self.lock:
+            row = self._row(trip_id)
+            if row == NO_ROW:
+                return None
+            trip = self._materialize(row)
+            self._row_of_trip[trip_id] = NO_ROW
+            self.columns['status'][row] = -1
+            self._removed += 1
+            self._add_totals(STATUS_CODES[trip.status], trip.distance, trip.fare, -1)
+            return trip
+
+    def rider_trip_ids(self, rider_id: int) -> List[int]:
+        """Ascending ids of a rider's archived trips, found by scanning the rider column"""
+        with self.lock:
+            rows = []
+            offset = 0
+            for segment in array_segments(self.columns['rider_id']):
+                if np is not None:
+                    matches = np.flatnonzero(np.frombuffer(segment, dtype=np.dtype(COLUMNS['rider_id'])) == rider_id)
+                    rows.extend((matches + offset).tolist())
+                else:
+                    rows.extend(offset + i for i, value in enumerate(segment) if value == rider_id)
+                offset += len(segment)
+            ids, statuses = self.columns['id'], self.columns['status']
+            return sorted(ids[row] for row in rows if statuses[row] >= 0)
+
+    def iter_trips(self) -> Iterator[Trip]:
+        """Every archived trip, oldest archived first"""
+        with self.lock:
+            rows = len(self.columns['id'])
+        for row in range(rows):
+            with self.lock:
+                if self.columns['status'][row] < 0:
+                    continue
+                trip = self._materialize(row)
+            yield trip
+
+    def dump(self) -> Dict:
+        """Copies of the column and lookup arrays, for a snapshot"""
+        with self.lock:
+            return {
+                'columns': {name: copy_array(column) for name, column in self.columns.items()},
+                'row_of_trip': copy_array(self._row_of_trip),
+                'removed': self._removed,
+                'counts': list(self._counts),
+                'completed_distance': self._completed_distance,
+                'completed_fare': self._completed_fare
+            }
+
+    def load(self, data: Dict):
+        """Replace the contents with a dump"""
+        with self.lock:
+            self.columns = {name: data['columns'][name] for name in COLUMNS}
+            self._row_of_trip = data['row_of_trip']
+            self._removed = data['removed']
+            self._counts = list(data['counts'])
+            self._completed_distance = data['completed_distance']
+            self._completed_fare = data['completed_fare']
+
+    def nbytes(self) -> int:
+        """Bytes held by the column and lookup arrays"""
+        arrays = list(self.columns.values()) + [self._row_of_trip]
+        return sum(a.itemsize * len(a) for a in arrays)
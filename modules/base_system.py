@@ -0,0 +1,509 @@
+from typing import Deque, Dict, List, Optional, Tuple
+from collections import deque
+import threading
+
+from .city import City
+from .driver import Driver, DriverStatus
+from .rider import Rider
+from .trip import Trip, TripStatus
+from .dispatch import DispatchEngine
+from .rollback import RollbackManager, OperationType, UndoEngine, TRANSITION_OPERATIONS
+from .events import TripEventBus, TripEvent
+from .changelog import ChangeLog
+from .analytics import ACTIVE_STATUSES, TripCounters, RollingMetrics
+from .archive import TripArchive
+from . import history
+from .indexes import TripIndex, DriverIndex, page_by_id, project
+from .journal import Journal, capture, recover
+from .storage import StateStore, load_state
+from .worker_pool import TripWorkerPool
+
+def _driver_record(driver: Driver) -> Dict:
+    """Journal fields for an added driver"""
+    return {
+        'driver_id': driver.id, 'name': driver.name, 'location': driver.location,
+        'vehicle': driver.vehicle, 'license_plate': driver.license_plate
+    }
+
+def _rider_record(rider: Rider) -> Dict:
+    """Journal fields for an added rider"""
+    return {'rider_id': rider.id, 'name': rider.name, 'email': rider.email}
+
+class BaseRideShareSystem:
+    """State, indexes, persistence and queries shared by the ride-share systems
+
+    Subclasses decide how trips are dispatched and how drivers move. They
+    provide _process_trips(trip_ids) to match waiting trips on a worker,
+    taking trip_lock around the changes it makes, _halt_trip(trip_id) to
+    stop a trip's driver movement and _resume_trip(trip) to restart it for
+    a trip put back in progress; the last two are called with trip_lock held.
+    """
+
+    def __init__(self, workers: int = 4, queue_limit: int = 100, retain_finished: int = 100):
+        self.city = City()
+        self.drivers: Dict[int, Driver] = {}
+        self.riders: Dict[int, Rider] = {}
+        self.trips: Dict[int, Trip] = {}
+        self.dispatch = DispatchEngine(self.city)
+        self.rollback_manager = RollbackManager()
+        self.undo_engine = UndoEngine(self)
+
+        # Held around every change to trips and drivers (worker steps, cancels,
+        # undos), so none of them sees another's change half done; workers
+        # take it only for their state changes, not for the whole task
+        self.trip_lock = threading.RLock()
+        self.worker_pool = TripWorkerPool(workers, queue_limit)
+
+        # Trip transitions are pushed to observers instead of being polled
+        self.events = TripEventBus()
+        self.events.subscribe(self._record_transition)
+
+        # Versioned record of changed entities for delta broadcasts
+        self.changelog = ChangeLog()
+        self.events.subscribe(self._log_trip_change)
+
+        # Finished trips move to a columnar archive once retain_finished newer
+        # ones have finished; the most recent stay live for rollback and display
+        self.archive = TripArchive()
+        self.finished_trips: Deque[int] = deque()
+        self.retain_finished = retain_finished
+
+        # Secondary indexes for paginated, filtered listing
+        self.trip_index = TripIndex(self.city, self.archive)
+        self.driver_index = DriverIndex()
+        self.rider_ids: List[int] = []
+        self.events.subscribe(self.trip_index.on_transition)
+
+        # Analytics counters updated per transition instead of recounted per read
+        self.trip_counters = TripCounters()
+        self.events.subscribe(self.trip_counters.on_transition)
+        self.rolling_metrics = RollingMetrics()
+        self.events.subscribe(self.rolling_metrics.on_transition)
+
+        # Archiving runs after the index and counters have seen the transition
+        self.events.subscribe(self._retire_finished)
+
+        # Optional write-ahead journal; see attach_journal
+        self.journal: Optional[Journal] = None
+
+        # State is kept only in memory unless a persistent store is attached
+        self.store: StateStore = StateStore()
+
+        self.next_driver_id = 101  # Start from 101 for consistency
+        self.next_rider_id = 101   # Start from 101 for consistency
+        self.next_trip_id = 1
+
+        # Initialize
+        self._initialize_city()
+
+    def _initialize_city(self):
+        """Initialize city with proper zone layout"""
+        self.city = City()
+
+        # Create 5 zones with 3 locations each
+        for zone in range(5):
+            for i in range(3):
+                loc_id = zone * 3 + i
+                x = zone * 180 + 50 + (i * 40)
+                y = 150 + (i % 2) * 80
+                self.city.add_location(loc_id, x, y, f"Zone {zone}")
+
+        # Connect locations
+        for zone in range(5):
+            base = zone * 3
+            self.city.add_road(base, base + 1, 10)
+            self.city.add_road(base + 1, base + 2, 10)
+            if zone < 4:
+                self.city.add_road(base + 2, (zone + 1) * 3, 15)
+
+        self.trip_index.city = self.city
+        self.dispatch.city = self.city
+
+    def _clear_state(self):
+        """Forget every driver, rider and trip, e.g. before loading the sample data"""
+        with self.trip_lock:
+            self.drivers.clear()
+            self.riders.clear()
+            self.trips.clear()
+            self.rollback_manager.clear()
+            if self.journal is not None:
+                self.journal.reset()
+            self.store.clear()
+            self.changelog.reset()
+            self.trip_index.clear()
+            self.driver_index.clear()
+            self.rider_ids.clear()
+            self.trip_counters.clear()
+            self.rolling_metrics.clear()
+            self.archive.clear()
+            self.finished_trips.clear()
+
+            self.next_driver_id = 101
+            self.next_rider_id = 101
+            self.next_trip_id = 1
+
+    def add_driver(self, name: str, location: int = 0, vehicle: str = "Car", license_plate: str = "") -> Driver:
+        """Add a new driver"""
+        with self.trip_lock:
+            driver = self._register_driver(name, location, vehicle, license_plate)
+            self._write_journal(OperationType.ADD_DRIVER, _driver_record(driver))
+
+            # Record for rollback
+            self.rollback_manager.add_operation(
+                OperationType.ADD_DRIVER,
+                {'driver_id': driver.id},
+                {'driver_id': driver.id}
+            )
+            return driver
+
+    def add_drivers(self, rows: List[Tuple[str, int, str, str]]) -> List[Driver]:
+        """Add (name, location, vehicle, license_plate) drivers as one journal record and one rollback operation"""
+        with self.trip_lock:
+            drivers = [self._register_driver(*row) for row in rows]
+            if drivers:
+                driver_ids = [driver.id for driver in drivers]
+                self._write_journal(OperationType.ADD_DRIVER, {'drivers': [_driver_record(d) for d in drivers]})
+                self.rollback_manager.add_operation(
+                    OperationType.ADD_DRIVER,
+                    {'driver_ids': driver_ids},
+                    {'driver_ids': driver_ids}
+                )
+            return drivers
+
+    def _register_driver(self, name: str, location: int, vehicle: str, license_plate: str) -> Driver:
+        """Create a driver and add it to the lookups; runs under the trip lock"""
+        driver_id = self.next_driver_id
+        self.next_driver_id += 1
+
+        driver = Driver(driver_id, name, location)
+        driver.vehicle = vehicle
+        driver.license_plate = license_plate
+        driver.status = DriverStatus.AVAILABLE  # Always available when added
+
+        self.drivers[driver_id] = driver
+        driver.listener = self._on_driver_change
+        self.changelog.record('drivers', driver_id)
+        self.driver_index.update(driver)
+        return driver
+
+    def add_rider(self, name: str, email: str = "") -> Rider:
+        """Add a new rider"""
+        with self.trip_lock:
+            rider = self._register_rider(name, email)
+            self._write_journal(OperationType.ADD_RIDER, _rider_record(rider))
+
+            # Record for rollback
+            self.rollback_manager.add_operation(
+                OperationType.ADD_RIDER,
+                {'rider_id': rider.id},
+                {'rider_id': rider.id}
+            )
+            return rider
+
+    def add_riders(self, rows: List[Tuple[str, str]]) -> List[Rider]:
+        """Add (name, email) riders as one journal record and one rollback operation"""
+        with self.trip_lock:
+            riders = [self._register_rider(*row) for row in rows]
+            if riders:
+                rider_ids = [rider.id for rider in riders]
+                self._write_journal(OperationType.ADD_RIDER, {'riders': [_rider_record(r) for r in riders]})
+                self.rollback_manager.add_operation(
+                    OperationType.ADD_RIDER,
+                    {'rider_ids': rider_ids},
+                    {'rider_ids': rider_ids}
+                )
+            return riders
+
+    def _register_rider(self, name: str, email: str) -> Rider:
+        """Create a rider and add it to the lookups; runs under the trip lock"""
+        rider_id = self.next_rider_id
+        self.next_rider_id += 1
+
+        rider = Rider(rider_id, name, email)
+        self.riders[rider_id] = rider
+        self.rider_ids.append(rider_id)
+        self.changelog.record('riders', rider_id)
+        return rider
+
+    def request_trips(self, requests: List[Tuple[int, int, int]]) -> List[Tuple[Optional[Trip], Optional[str]]]:
+        """Validate and create a batch of trips, then dispatch them together on one worker
+
+        Returns (trip, None) or (None, error) for each (rider_id, pickup, dropoff).
+        """
+        results = []
+        with self.worker_pool.slot() as slot:
+            trip_ids = []
+            with self.trip_lock:
+                for rider_id, pickup, dropoff in requests:
+                    error = self._validate_trip_request(rider_id, pickup, dropoff)
+                    if error:
+                        results.append((None, error))
+                        continue
+                    trip = self._register_trip(rider_id, pickup, dropoff)
+                    trip_ids.append(trip.id)
+                    results.append((trip, None))
+
+                # The whole batch is undone as one step
+                if trip_ids:
+                    self.rollback_manager.add_operation(
+                        OperationType.CREATE_TRIP,
+                        {'trip_ids': trip_ids},
+                        {'trip_ids': trip_ids}
+                    )
+
+            if trip_ids:
+                slot.submit(self._process_trips, trip_ids)
+
+        return results
+
+    def _validate_trip_request(self, rider_id: int, pickup: int, dropoff: int) -> Optional[str]:
+        """Reason a trip request cannot be accepted, or None if it is valid"""
+        if rider_id not in self.riders:
+            return f"Rider {rider_id} not found"
+        if pickup not in self.city.locations:
+            return f"Unknown pickup location {pickup}"
+        if dropoff not in self.city.locations:
+            return f"Unknown dropoff location {dropoff}"
+        if pickup == dropoff:
+            return "Pickup and dropoff cannot be the same"
+        return None
+
+    def _create_trip(self, rider_id: int, pickup: int, dropoff: int) -> Trip:
+        """Create a trip, add it to the rider's history and record it for rollback"""
+        with self.trip_lock:
+            trip = self._register_trip(rider_id, pickup, dropoff)
+
+            # Record for rollback
+            self.rollback_manager.add_operation(
+                OperationType.CREATE_TRIP,
+                {'trip_id': trip.id},
+                {'trip_id': trip.id}
+            )
+            return trip
+
+    def _register_trip(self, rider_id: int, pickup: int, dropoff: int) -> Trip:
+        """Create a trip and add it to the rider's history; runs under the trip lock"""
+        trip_id = self.next_trip_id
+        self.next_trip_id += 1
+
+        trip = Trip(trip_id, rider_id, pickup, dropoff)
+        self.trips[trip_id] = trip
+        self.events.track(trip)
+
+        # Add to rider's history
+        self.riders[rider_id].add_trip(trip_id)
+        self.changelog.record('riders', rider_id)
+        return trip
+
+    def _redispatch(self, trip_ids: List[int]):
+        """Match trips that are still waiting for a driver, e.g. after recovery"""
+        self.worker_pool.schedule(0, self._process_trips, trip_ids)
+
+    def _check_empty(self, source):
+        """Refuse to load persisted state on top of state the system already has
+
+        Loading assumes an empty system; loading twice would count trips
+        twice in the counters and indexes, and a journal replayed with a
+        store attached would write every replayed change back to the store.
+        """
+        if self.journal is not None or self.store.persistent:
+            raise RuntimeError(f"Cannot attach {source}: a journal or store is already attached")
+        if self.drivers or self.riders or self.trips or len(self.archive):
+            raise RuntimeError(f"Cannot attach {source} to a system that already has state")
+
+    def attach_journal(self, journal: Journal) -> int:
+        """Recover state from a journal, then write every change to it; returns records replayed"""
+        self._check_empty(f"journal {journal.directory}")
+        replayed = recover(self, journal)
+        self.journal = journal
+        self.events.subscribe(journal.on_transition)
+        journal.start(lambda: capture(self, journal))
+        return replayed
+
+    def attach_store(self, store: StateStore) -> int:
+        """Load state from a store, then keep every change written to it; returns entities loaded"""
+        self._check_empty(repr(store))
+        loaded = load_state(self, store)
+        self.store = store
+        self.changelog.subscribe(store.mark)
+        # Looked up at call time: loading a snapshot replaces the dicts
+        store.start({
+            'drivers': lambda driver_id: self.drivers.get(driver_id),
+            'riders': lambda rider_id: self.riders.get(rider_id),
+            'trips': self.get_trip
+        })
+        return loaded
+
+    def _write_journal(self, op_type: OperationType, data: Dict):
+        """Append a change to the journal, if one is attached"""
+        if self.journal is not None:
+            self.journal.append(op_type, data)
+
+    def _record_transition(self, event: TripEvent):
+        """Record a trip transition for rollback; its field changes are all an undo needs"""
+        operation = TRANSITION_OPERATIONS.get(event.status)
+        if operation is None or event.undo:
+            return
+
+        trip = event.trip
+        self.rollback_manager.add_operation(
+            operation,
+            {'trip_id': trip.id, 'driver_id': trip.driver_id, 'previous_status': event.previous.value},
+            {'trip_id': trip.id, 'changes': event.changes}
+        )
+
+    def _log_trip_change(self, event):
+        """Record a trip transition in the change log"""
+        self.changelog.record('trips', event.trip.id)
+
+    def _on_driver_change(self, driver: Driver):
+        """Record a driver change and refile it by status; moving drivers go in every delta"""
+        self.changelog.record('drivers', driver.id)
+        self.changelog.set_volatile('drivers', driver.id, driver.route is not None)
+        self.driver_index.update(driver)
+
+    def get_trip(self, trip_id: int) -> Optional[Trip]:
+        """A live trip, or a copy rebuilt from the archive"""
+        trip = self.trips.get(trip_id)
+        if trip is None:
+            trip = self.archive.get(trip_id)
+        return trip
+
+    def _retire_finished(self, event: TripEvent):
+        """Archive the oldest finished trips beyond the retained window"""
+        if event.status not in (TripStatus.COMPLETED, TripStatus.CANCELLED):
+            return
+
+        # Index lock first, as paging takes it before scanning the archive
+        with self.trip_index.lock, self.archive.lock:
+            self.finished_trips.append(event.trip.id)
+            while len(self.finished_trips) > self.retain_finished:
+                trip_id = self.finished_trips.popleft()
+                trip = self.trips.get(trip_id)
+                if trip is None or trip.is_active():
+                    continue
+                self.archive.append(trip)
+                self.trip_index.retire(trip)
+                del self.trips[trip_id]
+                self._halt_trip(trip_id)
+
+    def get_available_drivers(self) -> List[Driver]:
+        """Get list of available drivers"""
+        return [self.drivers[i] for i in self.driver_index.ids_with_status(DriverStatus.AVAILABLE) if i in self.drivers]
+
+    def get_active_trips(self, zone: Optional[str] = None) -> List[Trip]:
+        """Get list of active trips, optionally those starting or ending in a zone"""
+        ids = self.trip_index.ids_with_status(*ACTIVE_STATUSES, zone=zone)
+        return [self.trips[i] for i in ids if i in self.trips]
+
+    def get_analytics(self) -> Dict:
+        """Get system analytics"""
+        analytics = self.trip_counters.snapshot()
+
+        available_drivers = self.driver_index.count(DriverStatus.AVAILABLE)
+        total_drivers = len(self.drivers)
+        driver_utilization = (total_drivers - available_drivers) / total_drivers if total_drivers > 0 else 0
+
+        analytics.update({
+            'available_drivers': available_drivers,
+            'total_drivers': total_drivers,
+            'driver_utilization': round(driver_utilization, 2),
+            'total_riders': len(self.riders)
+        })
+        return analytics
+
+    def get_state(self) -> Dict:
+        """Get complete system state
+
+        Only live trips are included; archived ones are counted and can be
+        paged through list_trips.
+        """
+        return {
+            'version': self.changelog.version,
+            'city_version': self.city.version,
+            'drivers': [d.to_dict() for d in self.drivers.values()],
+            'riders': [r.to_dict() for r in self.riders.values()],
+            'trips': [t.to_dict() for t in list(self.trips.values())],
+            'archived_trips': len(self.archive),
+            'analytics': self.get_analytics()
+        }
+
+    def list_trips(self, cursor: Optional[int] = None, limit: int = 50,
+                   fields: Optional[List[str]] = None, **filters) -> Dict:
+        """Newest-first page of trips filtered by status, zone, driver, rider and time"""
+        page = self.trip_index.page(self.get_trip, cursor=cursor, limit=limit, **filters)
+        return {
+            'items': [project(t.to_dict(), fields) for t in page['items']],
+            'next_cursor': page['next_cursor']
+        }
+
+    def list_drivers(self, cursor: Optional[int] = None, limit: int = 50,
+                     fields: Optional[List[str]] = None, status: Optional[DriverStatus] = None,
+                     zone: Optional[str] = None) -> Dict:
+        """Page of drivers in id order, optionally by status and current zone"""
+        page = self.driver_index.page(
+            self.drivers, status=status, zone=zone,
+            zone_of=self.city.get_zone_of_location, cursor=cursor, limit=limit
+        )
+        return {
+            'items': [project(d.to_dict(), fields) for d in page['items']],
+            'next_cursor': page['next_cursor']
+        }
+
+    def list_riders(self, cursor: Optional[int] = None, limit: int = 50,
+                    fields: Optional[List[str]] = None) -> Dict:
+        """Page of riders in id order"""
+        page = page_by_id(self.riders, self.rider_ids, cursor=cursor, limit=limit)
+        return {
+            'items': [project(r.to_dict(), fields) for r in page['items']],
+            'next_cursor': page['next_cursor']
+        }
+
+    def _change_lookups(self) -> Dict:
+        """Entity lookups for the change log; archived trips still resolve, so they are not reported removed"""
+        return {
+            'drivers': self.drivers.get,
+            'riders': self.riders.get,
+            'trips': self.get_trip
+        }
+
+    def get_changes(self, since: int) -> Dict:
+        """Entities a write touched since a version, plus the new version
+
+        Moving drivers are left out unless the write itself changed them, so
+        the result stays proportional to the write, not to the fleet.
+        """
+        version = self.changelog.version
+        changes = self.changelog.collect(since, self._change_lookups(), include_volatile=False)
+        if changes is None:
+            changes = {'drivers': [], 'riders': [], 'trips': [], 'removed': {}}
+        changes['version'] = version
+        return changes
+
+    def query_history(self, group_by: str, **options) -> Dict:
+        """Vectorized aggregates over finished trips, archived and still live"""
+        names = history.columns_for(group_by, options.get('metrics', history.METRICS))
+        columns = history.load_columns(self.archive, list(self.trips.values()), names)
+        return history.query(columns, self.city, group_by, **options)
+
+    def get_delta(self, since: Optional[int] = None) -> Dict:
+        """Entities changed since a version, or a full snapshot if too far behind"""
+        version = self.changelog.version
+        delta = None
+        if since is not None:
+            delta = self.changelog.collect(since, self._change_lookups())
+
+        if delta is None:
+            state = self.get_state()
+            state['version'] = version
+            return {'type': 'full_update', 'version': version, 'data': state}
+
+        delta['city_version'] = self.city.version
+        delta['analytics'] = self.get_analytics()
+        return {'type': 'delta', 'since': since, 'version': version, 'data': delta}
+
+    def rollback(self, k: int = 1) -> bool:
+        """Rollback last k operations"""
+        with self.trip_lock:
+            rolled_back = self.rollback_manager.rollback(k, self.undo_engine.undo)
+        return len(rolled_back) > 0
@@ -0,0 +1,159 @@
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+import json
+import time
+
+from .worker_pool import PoolOverloadedError
+
+IMPORT_KINDS = ('drivers', 'riders', 'trips')
+
+class ImportProgress:
+    """Running totals for one import; only the first max_errors errors are kept"""
+
+    def __init__(self, kind: str, max_errors: int = 100):
+        self.kind = kind
+        self.max_errors = max_errors
+        self.lines = 0
+        self.imported = 0
+        self.failed = 0
+        self.chunks = 0
+        self.errors: List[Dict] = []
+        self.started_at = time.time()
+
+    def fail(self, line: int, error: str):
+        self.failed += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({'line': line, 'error': error})
+
+    def to_dict(self, include_errors: bool = True) -> Dict:
+        elapsed = time.time() - self.started_at
+        data = {
+            'kind': self.kind,
+            'lines': self.lines,
+            'imported': self.imported,
+            'failed': self.failed,
+            'chunks': self.chunks,
+            'elapsed_seconds': round(elapsed, 3),
+            'rate_per_second': round(self.imported / elapsed, 1) if elapsed > 0 else 0.0
+        }
+        if include_errors:
+            data['errors'] = list(self.errors)
+        return data
+
+def _parse_driver(record: Dict) -> Tuple:
+    name = record['name']
+    if not isinstance(name, str) or not name:
+        raise ValueError('name must be a non-empty string')
+    return (name, int(record.get('location', 0)), record.get('vehicle', 'Car'), record.get('license_plate', ''))
+
+def _parse_rider(record: Dict) -> Tuple:
+    name = record['name']
+    if not isinstance(name, str) or not name:
+        raise ValueError('name must be a non-empty string')
+    return (name, record.get('email', ''))
+
+def _parse_trip(record: Dict) -> Tuple:
+    return (int(record['rider_id']), int(record['pickup']), int(record['dropoff']))
+
+PARSERS = {
+    'drivers': _parse_driver,
+    'riders': _parse_rider,
+    'trips': _parse_trip
+}
+
+def iter_records(lines: Iterable[Union[bytes, str]], progress: ImportProgress) -> Iterator[Tuple[int, Dict]]:
+    """Decode NDJSON one line at a time, skipping blank lines and recording bad ones"""
+    for line in lines:
+        progress.lines += 1
+        if isinstance(line, bytes):
+            line = line.decode('utf-8', errors='replace')
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            progress.fail(progress.lines, f'Invalid JSON: {e}')
+            continue
+        if not isinstance(record, dict):
+            progress.fail(progress.lines, 'Each line must be a JSON object')
+            continue
+        yield progress.lines, record
+
+class BulkImporter:
+    """Streams NDJSON drivers, riders or trips into a system in fixed-size chunks
+
+    Only one chunk of parsed rows is held at a time, so memory stays constant
+    however long the input is. Each chunk is added under one lock
+    acquisition and recorded as one rollback operation; drivers and riders
+    are also journaled as one record per chunk. Trips go through the
+    system's batch request path and are dispatched like any other booking.
+    """
+
+    def __init__(self, system, chunk_size: int = 1000):
+        self.system = system
+        self.chunk_size = max(1, chunk_size)
+
+    def run(self, kind: str, lines: Iterable[Union[bytes, str]],
+            on_progress: Optional[Callable[[ImportProgress], None]] = None) -> ImportProgress:
+        """Import every line, calling on_progress after each chunk"""
+        for progress in self.iter_progress(kind, lines):
+            if on_progress is not None:
+                on_progress(progress)
+        return progress
+
+    def iter_progress(self, kind: str, lines: Iterable[Union[bytes, str]]) -> Iterator[ImportProgress]:
+        """Import lazily, yielding the running progress after each chunk"""
+        if kind not in PARSERS:
+            raise ValueError(f'Unknown import kind: {kind}')
+        parse = PARSERS[kind]
+        progress = ImportProgress(kind)
+
+        chunk: List[Tuple[int, Tuple]] = []
+        reported_lines = None  # lines read when progress was last yielded
+        for line_number, record in iter_records(lines, progress):
+            try:
+                chunk.append((line_number, parse(record)))
+            except (KeyError, TypeError, ValueError) as e:
+                progress.fail(line_number, f'Invalid {kind[:-1]}: {e}')
+                continue
+            if len(chunk) >= self.chunk_size:
+                self._insert(kind, chunk, progress)
+                chunk = []
+                reported_lines = progress.lines
+                yield progress
+
+        if chunk:
+            self._insert(kind, chunk, progress)
+        # Always report at least once, but not the last full chunk twice
+        if progress.lines != reported_lines:
+            yield progress
+
+    def _insert(self, kind: str, chunk: List[Tuple[int, Tuple]], progress: ImportProgress):
+        """Add one chunk in a single call, so it takes the lock once and is one rollback step"""
+        progress.chunks += 1
+        if kind == 'drivers':
+            locations = self.system.city.locations
+            rows = []
+            for line_number, row in chunk:
+                if row[1] not in locations:
+                    progress.fail(line_number, f'Invalid driver: unknown location {row[1]}')
+                    continue
+                rows.append(row)
+            progress.imported += len(self.system.add_drivers(rows))
+        elif kind == 'riders':
+            progress.imported += len(self.system.add_riders([row for _, row in chunk]))
+        else:
+            results = self._request_trips([row for _, row in chunk])
+            for (line_number, _), (trip, error) in zip(chunk, results):
+                if trip:
+                    progress.imported += 1
+                else:
+                    progress.fail(line_number, error)
+
+    def _request_trips(self, rows: List[Tuple]) -> List:
+        """Submit a chunk of trips, waiting for queue room instead of failing"""
+        while True:
+            try:
+                return self.system.request_trips(rows)
+            except PoolOverloadedError:
+                time.sleep(0.05)
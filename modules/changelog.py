@@ -0,0 +1,101 @@
+from collections import deque
+from typing import Callable, Deque, Dict, List, Mapping, Optional, Set, Tuple
+import threading
+
+ENTITY_KINDS = ('drivers', 'riders', 'trips')
+
+class ChangeLog:
+    """Monotonically versioned log of which drivers, riders and trips changed
+
+    Only entity ids are kept, and only for the last max_entries changes.
+    Clients further behind than that (or from before a reset) get a full
+    snapshot instead of a delta.
+    """
+
+    def __init__(self, max_entries: int = 10000):
+        self.version = 0
+        self._entries: Deque[Tuple[int, str, int]] = deque(maxlen=max_entries)
+        self._floor = 0  # oldest version a delta can start from
+        self._volatile: Dict[str, Set[int]] = {kind: set() for kind in ENTITY_KINDS}
+        self._listeners: List[Callable[[str, int], None]] = []
+        self._lock = threading.Lock()
+
+    def subscribe(self, callback: Callable[[str, int], None]):
+        """Call callback with (kind, entity_id) on every recorded change"""
+        with self._lock:
+            # Copied rather than appended to, so record can iterate it unlocked
+            self._listeners = self._listeners + [callback]
+
+    def record(self, kind: str, entity_id: int) -> int:
+        """Note that an entity changed; returns the new version"""
+        with self._lock:
+            self.version += 1
+            if len(self._entries) == self._entries.maxlen:
+                self._floor = self._entries[0][0]
+            self._entries.append((self.version, kind, entity_id))
+            version = self.version
+            listeners = self._listeners
+        for callback in listeners:
+            callback(kind, entity_id)
+        return version
+
+    def set_volatile(self, kind: str, entity_id: int, volatile: bool):
+        """Mark an entity whose serialized form changes with time (e.g. a moving driver)
+
+        Volatile entities are included in every delta until unmarked.
+        """
+        with self._lock:
+            if volatile:
+                self._volatile[kind].add(entity_id)
+            else:
+                self._volatile[kind].discard(entity_id)
+
+    def reset(self):
+        """Forget all changes so every client falls back to a full snapshot"""
+        with self._lock:
+            self.version += 1
+            self._floor = self.version
+            self._entries.clear()
+            for ids in self._volatile.values():
+                ids.clear()
+
+    def changes_since(self, version: int, include_volatile: bool = True) -> Optional[Dict[str, Set[int]]]:
+        """Ids changed after version per kind, or None if a full snapshot is needed"""
+        with self._lock:
+            if version < self._floor or version > self.version:
+                return None
+
+            if include_volatile:
+                changes: Dict[str, Set[int]] = {kind: set(ids) for kind, ids in self._volatile.items()}
+            else:
+                changes = {kind: set() for kind in ENTITY_KINDS}
+            # Entries are in version order; walk back from the newest
+            for entry_version, kind, entity_id in reversed(self._entries):
+                if entry_version <= version:
+                    break
+                changes[kind].add(entity_id)
+            return changes
+
+    def collect(self, version: int, lookups: Mapping[str, Callable[[int], Optional[object]]],
+                include_volatile: bool = True) -> Optional[Dict[str, List[Dict]]]:
+        """Serialized entities changed since version, or None if too far behind
+
+        lookups gives, per kind, a function returning an entity by id or None
+        once it is gone; ids it returns None for are listed as removed.
+        """
+        changes = self.changes_since(version, include_volatile)
+        if changes is None:
+            return None
+
+        delta = {'removed': {}}
+        for kind in ENTITY_KINDS:
+            lookup = lookups[kind]
+            delta[kind] = []
+            delta['removed'][kind] = []
+            for entity_id in sorted(changes[kind]):
+                entity = lookup(entity_id)
+                if entity is not None:
+                    delta[kind].append(entity.to_dict())
+                else:
+                    delta['removed'][kind].append(entity_id)
+        return delta
@@ -1,7 +1,11 @@
 import heapq
+import hashlib
+import json
 from typing import List, Dict, Optional, Tuple
 
 class Location:
+    __slots__ = ('id', 'x', 'y', 'zone')
+
     def __init__(self, id: int, x: int, y: int, zone: str):
         self.id = id
         self.x = x
@@ -22,17 +26,23 @@ class City:
         self.roads: Dict[Tuple[int, int], float] = {}
         self.zones: Dict[str, List[int]] = {}
         
+        # Bumped on every graph change; invalidates the cached payload
+        self.version = 0
+        self._payload: Optional[Tuple[int, bytes, str]] = None
+        
     def add_location(self, id: int, x: int, y: int, zone: str):
         """Add a location to the city"""
         self.locations[id] = Location(id, x, y, zone)
         if zone not in self.zones:
             self.zones[zone] = []
         self.zones[zone].append(id)
+        self.version += 1
         
     def add_road(self, loc1_id: int, loc2_id: int, distance: float):
         """Add a road between two locations"""
         key = (min(loc1_id, loc2_id), max(loc1_id, loc2_id))
         self.roads[key] = distance
+        self.version += 1
         
     def get_shortest_path(self, start: int, end: int) -> Tuple[List[int], float]:
         """Find shortest path using Dijkstra's algorithm"""
@@ -81,6 +91,30 @@ class City:
         
         return path, distances[end]
     
+    def get_distances_from(self, start: int) -> Dict[int, float]:
+        """Shortest distance from start to every reachable location"""
+        if start not in self.locations:
+            return {}
+        
+        adj = {loc_id: [] for loc_id in self.locations}
+        for (a, b), dist in self.roads.items():
+            adj[a].append((b, dist))
+            adj[b].append((a, dist))
+        
+        distances = {start: 0}
+        pq = [(0, start)]
+        while pq:
+            current_dist, current = heapq.heappop(pq)
+            if current_dist > distances[current]:
+                continue
+            for neighbor, weight in adj[current]:
+                dist = current_dist + weight
+                if dist < distances.get(neighbor, float('inf')):
+                    distances[neighbor] = dist
+                    heapq.heappush(pq, (dist, neighbor))
+        
+        return distances
+    
     def get_zone_of_location(self, loc_id: int) -> Optional[str]:
         """Get zone of a location"""
         if loc_id in self.locations:
@@ -105,4 +139,18 @@ class City:
                 {'from': a, 'to': b, 'distance': dist}
                 for (a, b), dist in self.roads.items()
             ]
-        }
\ No newline at end of file
+        }
+    
+    def get_payload(self) -> Tuple[bytes, str]:
+        """JSON-encoded city and its ETag, serialized once per graph version"""
+        cached = self._payload
+        if cached is None or cached[0] != self.version:
+            version = self.version
+            body = json.dumps(
+                {'version': version, 'city': self.to_dict()},
+                separators=(',', ':')
+            ).encode('utf-8')
+            etag = f"city-{version}-{hashlib.sha1(body).hexdigest()[:16]}"
+            cached = (version, body, etag)
+            self._payload = cached
+        return cached[1], cached[2]
\ No newline at end of file
@@ -33,6 +33,43 @@ class DispatchEngine:
                 
         return nearest
     
+    def match_batch(self, trips: List[Trip], drivers: List[Driver]) -> List[Tuple[Trip, Optional[Driver]]]:
+        """Greedily give each trip, in order, the nearest driver not yet taken
+        
+        Road distances are computed once per distinct pickup location rather
+        than once per trip and driver.
+        """
+        remaining = [d for d in drivers if d.is_available()]
+        distances_by_pickup = {}
+        matches = []
+        
+        for trip in trips:
+            if not remaining:
+                matches.append((trip, None))
+                continue
+            
+            if trip.pickup not in distances_by_pickup:
+                distances_by_pickup[trip.pickup] = self.city.get_distances_from(trip.pickup)
+            distances = distances_by_pickup[trip.pickup]
+            pickup_zone = self.city.get_zone_of_location(trip.pickup)
+            
+            nearest = None
+            min_distance = float('inf')
+            for driver in remaining:
+                distance = distances.get(driver.location, float('inf'))
+                driver_zone = self.city.get_zone_of_location(driver.location)
+                if driver_zone and pickup_zone and driver_zone != pickup_zone:
+                    distance *= self.zone_crossing_penalty
+                if distance < min_distance:
+                    min_distance = distance
+                    nearest = driver
+            
+            if nearest is not None:
+                remaining.remove(nearest)
+            matches.append((trip, nearest))
+        
+        return matches
+    
     def calculate_fare(self, distance: float, is_cross_zone: bool = False) -> float:
         """Calculate fare based on distance"""
         base_fare = 2.5
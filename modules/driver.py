@@ -1,21 +1,92 @@
 from enum import Enum
 from typing import Optional
+import time
+
+from .route import Route
 
 class DriverStatus(Enum):
     AVAILABLE = "AVAILABLE"
     BUSY = "BUSY"
     OFFLINE = "OFFLINE"
 
+# Statuses are stored as their index in this tuple
+DRIVER_STATUSES = tuple(DriverStatus)
+DRIVER_STATUS_CODES = {status: code for code, status in enumerate(DRIVER_STATUSES)}
+
 class Driver:
+    __slots__ = (
+        'id', 'name', '_location', 'vehicle', 'license_plate', 'status_code',
+        'current_trip_id', 'route', 'departed_at', 'listener'
+    )
+
     def __init__(self, id: int, name: str, location: int = 0):
         self.id = id
         self.name = name
-        self.location = location
+        self._location = location
         self.vehicle = "Car"
         self.license_plate = ""
         self.status = DriverStatus.AVAILABLE  # Use DriverStatus directly
         self.current_trip_id: Optional[int] = None
-        
+
+        # Set while the driver is moving; position is derived from these on read
+        self.route: Optional[Route] = None
+        self.departed_at: Optional[float] = None
+        self.listener = None  # called with the driver whenever it changes
+
+    @property
+    def status(self) -> DriverStatus:
+        return DRIVER_STATUSES[self.status_code]
+
+    @status.setter
+    def status(self, value: DriverStatus):
+        self.status_code = DRIVER_STATUS_CODES[value]
+
+    def _changed(self):
+        """Notify the listener that status, trip or movement changed"""
+        if self.listener is not None:
+            self.listener(self)
+
+    @property
+    def location(self) -> int:
+        """Current location, computed lazily from the route while moving"""
+        if self.route is not None:
+            return self.route.location_at(self.elapsed())
+        return self._location
+
+    @location.setter
+    def location(self, value: int):
+        self._location = value
+        self.route = None
+        self.departed_at = None
+        self._changed()
+
+    def depart(self, route: Route, departed_at: Optional[float] = None):
+        """Start moving along a route"""
+        self._location = route.origin
+        self.route = route
+        self.departed_at = time.time() if departed_at is None else departed_at
+        self._changed()
+
+    def _freeze_position(self):
+        """Stop moving, keeping the location reached along the route so far"""
+        reached = self.location  # derived from the route while it is set
+        self.location = reached  # the setter clears the route
+
+    def arrive(self):
+        """Finish the current route at its destination"""
+        if self.route is not None:
+            self.location = self.route.destination
+
+    def elapsed(self) -> float:
+        """Seconds since departure on the current route"""
+        if self.departed_at is None:
+            return 0.0
+        return time.time() - self.departed_at
+
+    def is_moving(self) -> bool:
+        """Check if driver is travelling along a route"""
+        return self.route is not None and not self.route.is_finished_at(self.elapsed())
+
     def assign_trip(self, trip_id: int):
         """Assign a trip to this driver - DEBUG VERSION"""
         print(f"\n=== DEBUG: Driver.assign_trip({trip_id}) called ===")
@@ -23,29 +94,31 @@ class Driver:
         print(f"Driver name: {self.name}")
         print(f"Current driver status: {self.status}")
         print(f"Is available? {self.is_available()}")
-    
+
         self.current_trip_id = trip_id
         self.status = DriverStatus.BUSY
-    
+        self._changed()
+
         print(f"✓ Trip assigned to driver!")
         print(f"New driver status: {self.status}")
         print(f"Current trip ID: {self.current_trip_id}")
-        
+
     def complete_trip(self, new_location: int):
         """Complete current trip"""
         self.current_trip_id = None
         self.status = DriverStatus.AVAILABLE
         self.location = new_location
-        
+
     def cancel_trip(self):
         """Cancel current trip"""
         self.current_trip_id = None
         self.status = DriverStatus.AVAILABLE
-        
+        self._freeze_position()
+
     def is_available(self) -> bool:
         """Check if driver is available"""
         return self.status == DriverStatus.AVAILABLE
-        
+
     def to_dict(self):
         """Convert to dictionary"""
         return {
@@ -57,4 +130,4 @@ class Driver:
             'status': self.status.value,  # Use .value to get string
             'current_trip_id': self.current_trip_id,
             'available': self.is_available()
-        }
\ No newline at end of file
+        }
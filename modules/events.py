@@ -0,0 +1,47 @@
+from collections import namedtuple
+from typing import Callable, List, Tuple
+import threading
+import time
+
+# A single trip state transition; previous is None when the trip is created.
+# changes holds (field, old, new) for every field the transition set, and undo
+# is set when the transition puts back an earlier status
+TripEvent = namedtuple('TripEvent', ['trip', 'previous', 'status', 'timestamp', 'changes', 'undo'],
+                       defaults=((), False))
+
+class TripEventBus:
+    """Publishes trip state transitions to observers"""
+
+    def __init__(self):
+        self._observers: List[Callable[[TripEvent], None]] = []
+        self.lock = threading.RLock()
+
+    def subscribe(self, callback: Callable[[TripEvent], None]) -> Callable[[TripEvent], None]:
+        """Call callback with a TripEvent on every transition"""
+        with self.lock:
+            self._observers.append(callback)
+        return callback
+
+    def unsubscribe(self, callback: Callable[[TripEvent], None]):
+        """Stop calling callback"""
+        with self.lock:
+            if callback in self._observers:
+                self._observers.remove(callback)
+
+    def track(self, trip):
+        """Attach the bus to a newly created trip and announce it"""
+        trip.events = self
+        self.publish(trip, None)
+
+    def publish(self, trip, previous, changes: Tuple = (), undo: bool = False):
+        """Notify observers that trip moved from previous to its current status"""
+        event = TripEvent(trip, previous, trip.status, time.time(), changes, undo)
+
+        with self.lock:
+            observers = list(self._observers)
+
+        for callback in observers:
+            try:
+                callback(event)
+            except Exception as e:
+                print(f"✗ Error in trip event observer: {e}")
@@ -0,0 +1,239 @@
+from typing import Dict, List, Optional, Sequence
+import time
+
+try:
+    import numpy as np
+except ImportError:  # optional; only historical queries need it
+    np = None
+
+from .archive import COLUMNS, STATUS_CODES, TIMESTAMP_SLOTS, NO_DRIVER
+from .snapshot import array_segments
+from .trip import TripStatus
+
+GROUP_BY = ('zone_pair', 'hour', 'driver', 'rider')
+METRICS = ('distance', 'fare', 'wait')
+
+# Dense integer keys up to this range are grouped with bincount instead of unique
+DENSE_KEY_RANGE = 1 << 24
+
+def numpy_available() -> bool:
+    return np is not None
+
+GROUP_COLUMNS = {
+    'zone_pair': ('pickup', 'dropoff'),
+    'hour': ('created_at',),
+    'driver': ('driver_id',),
+    'rider': ('rider_id',)
+}
+METRIC_COLUMNS = {
+    'distance': ('distance',),
+    'fare': ('fare',),
+    'wait': ('created_at', 'assigned_at')
+}
+
+def columns_for(group_by: str, metrics: Sequence[str]) -> List[str]:
+    """Archive columns a query reads; status and created_at are always needed for filtering"""
+    names = {'status', 'created_at'}
+    names.update(GROUP_COLUMNS.get(group_by, ()))
+    for metric in metrics:
+        names.update(METRIC_COLUMNS.get(metric, ()))
+    return [name for name in COLUMNS if name in names]
+
+def load_columns(archive, extra_trips: Sequence = (), names: Optional[Sequence[str]] = None) -> Dict[str, 'np.ndarray']:
+    """Copy archive columns into NumPy arrays, appending any extra finished trips
+
+    The copy is a memcpy per column segment taken under the archive lock, so
+    appends are only held up for that long.
+    """
+    if np is None:
+        raise RuntimeError("Historical analytics require the numpy package")
+
+    names = list(COLUMNS) if names is None else names
+    with archive.lock:
+        columns = {
+            name: np.concatenate([
+                np.frombuffer(segment, dtype=np.dtype(COLUMNS[name]))
+                for segment in array_segments(archive.columns[name])
+            ])
+            for name in names
+        }
+
+    extra = [t for t in extra_trips if t.status in STATUS_CODES]
+    if extra:
+        rows = {
+            'id': [t.id for t in extra],
+            'rider_id': [t.rider_id for t in extra],
+            'driver_id': [t.driver_id if t.driver_id is not None else NO_DRIVER for t in extra],
+            'pickup': [t.pickup for t in extra],
+            'dropoff': [t.dropoff for t in extra],
+            'status': [STATUS_CODES[t.status] for t in extra],
+            'distance': [t.distance for t in extra],
+            'fare': [t.fare for t in extra]
+        }
+        for name, slot in TIMESTAMP_SLOTS.items():
+            rows[name] = [getattr(t, slot) if getattr(t, slot) is not None else np.nan for t in extra]
+        for name in names:
+            extra_values = np.array(rows[name], dtype=np.dtype(COLUMNS[name]))
+            columns[name] = np.concatenate([columns[name], extra_values])
+
+    # Rows unlinked from the archive are marked with status -1
+    keep = columns['status'] >= 0
+    if not keep.all():
+        columns = {name: values[keep] for name, values in columns.items()}
+    return columns
+
+def _zone_codes(city):
+    """Location id -> zone number lookup table, and zone names"""
+    names = sorted(city.zones)
+    table = np.full(max(city.locations, default=0) + 1, -1, dtype=np.int64)
+    for code, name in enumerate(names):
+        table[city.zones[name]] = code
+    return table, names
+
+def _zone_of(table, locations):
+    """Zone number per location id; -1 (unknown) for ids the city no longer knows"""
+    zones = np.full(len(locations), -1, dtype=np.int64)
+    known = (locations >= 0) & (locations < len(table))
+    zones[known] = table[locations[known]]
+    return zones
+
+def _group_keys(columns, group_by: str, city):
+    """Integer group key per row and a function naming a key"""
+    if group_by == 'driver':
+        return columns['driver_id'], lambda key: {'driver_id': int(key) if key != NO_DRIVER else None}
+    if group_by == 'rider':
+        return columns['rider_id'], lambda key: {'rider_id': int(key)}
+    if group_by == 'hour':
+        # Hour of day in the server's local time, like Trip.created_at
+        offset = time.localtime().tm_gmtoff
+        hours = ((columns['created_at'] + offset) // 3600).astype(np.int64) % 24
+        return hours, lambda key: {'hour': int(key)}
+
+    table, names = _zone_codes(city)
+    pickup = _zone_of(table, columns['pickup'])
+    dropoff = _zone_of(table, columns['dropoff'])
+    zones = len(names) + 1  # code -1 (unknown) shifts to 0
+    keys = (pickup + 1) * zones + (dropoff + 1)
+
+    def describe(key):
+        pickup_code, dropoff_code = divmod(int(key), zones)
+        return {
+            'pickup_zone': names[pickup_code - 1] if pickup_code else None,
+            'dropoff_zone': names[dropoff_code - 1] if dropoff_code else None
+        }
+    return keys, describe
+
+def _group_index(keys):
+    """Dense group number per row, the key of each group, and the group count"""
+    if len(keys) == 0:
+        return keys, keys, 0
+    low, high = keys.min(), keys.max()
+    if high - low < DENSE_KEY_RANGE:
+        return keys - low, np.arange(low, high + 1), int(high - low + 1)
+    group_keys, inverse = np.unique(keys, return_inverse=True)
+    return inverse, group_keys, len(group_keys)
+
+def _summarize(values, groups, num_groups: int, percentiles: Sequence[float]):
+    """Count, sum, mean and percentiles of values per group, NaNs ignored
+
+    Percentiles come from one sort of group * span + value, which orders rows
+    by group and then by value without an argsort.
+    """
+    valid = ~np.isnan(values)
+    if not valid.all():
+        values = values[valid]
+        groups = groups[valid]
+
+    counts = np.bincount(groups, minlength=num_groups)
+    sums = np.bincount(groups, weights=values, minlength=num_groups)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        means = sums / counts
+
+    result = {'count': counts, 'sum': sums, 'mean': means}
+    if not percentiles:
+        return result
+    if len(values) == 0:
+        for pct in percentiles:
+            result[f'p{pct:g}'] = np.full(num_groups, np.nan)
+        return result
+
+    low = values.min()
+    span = values.max() - low + 1.0
+    ordered = groups.astype(np.float64)
+    ordered *= span
+    ordered += values
+    ordered -= low
+    ordered.sort()
+
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    index = np.nonzero(counts)[0]
+    for pct in percentiles:
+        rank = starts[index] + np.round(pct / 100 * (counts[index] - 1)).astype(np.int64)
+        picked = np.full(num_groups, np.nan)
+        picked[index] = ordered[rank] - index * span + low
+        result[f'p{pct:g}'] = picked
+    return result
+
+def _round(value) -> Optional[float]:
+    value = float(value)
+    return None if value != value else round(value, 2)
+
+def query(columns, city, group_by: str, metrics: Sequence[str] = METRICS,
+          percentiles: Sequence[float] = (50, 95), status: Optional[TripStatus] = None,
+          since: Optional[float] = None, until: Optional[float] = None,
+          order: str = 'key', limit: int = 100) -> Dict:
+    """Group finished trips and aggregate distance, fare and rider wait per group
+
+    Wait is created -> assigned in seconds; trips never assigned have no wait.
+    order is 'key' or 'count' (largest groups first).
+    """
+    if group_by not in GROUP_BY:
+        raise ValueError(f"group_by must be one of {', '.join(GROUP_BY)}")
+    for metric in metrics:
+        if metric not in METRICS:
+            raise ValueError(f"Unknown metric: {metric}")
+
+    conditions = []
+    if status is not None:
+        if status not in STATUS_CODES:
+            raise ValueError("Only COMPLETED and CANCELLED trips are historical")
+        conditions.append(columns['status'] == STATUS_CODES[status])
+    if since is not None:
+        conditions.append(columns['created_at'] >= since)
+    if until is not None:
+        conditions.append(columns['created_at'] <= until)
+    if conditions:
+        mask = np.logical_and.reduce(conditions)
+        columns = {name: values[mask] for name, values in columns.items()}
+
+    keys, describe = _group_keys(columns, group_by, city)
+    groups, group_keys, num_groups = _group_index(keys)
+
+    sources = {
+        'distance': lambda: columns['distance'],
+        'fare': lambda: columns['fare'],
+        'wait': lambda: columns['assigned_at'] - columns['created_at']
+    }
+    summaries = {metric: _summarize(sources[metric](), groups, num_groups, percentiles) for metric in metrics}
+    counts = np.bincount(groups, minlength=num_groups) if num_groups else np.zeros(0, dtype=np.int64)
+
+    present = np.nonzero(counts)[0]
+    if order == 'count':
+        present = present[np.argsort(-counts[present], kind='stable')]
+    present = present[:limit]
+
+    rows: List[Dict] = []
+    for group in present:
+        row = describe(group_keys[group])
+        row['trips'] = int(counts[group])
+        for metric, summary in summaries.items():
+            row[metric] = {name: (int(values[group]) if name == 'count' else _round(values[group]))
+                           for name, values in summary.items()}
+        rows.append(row)
+
+    return {
+        'group_by': group_by,
+        'trips': int(len(columns['status'])),
+        'groups': int(len(np.nonzero(counts)[0])),
+        'rows': rows
+    }
@@ -0,0 +1,316 @@
+from array import array
+from bisect import bisect_left, bisect_right, insort
+from heapq import merge
+from typing import Callable, Dict, Iterator, List, Optional, Sequence
+import threading
+
+from .snapshot import LazyDict, MappedArray, copy_array, peek_items
+from .trip import TripStatus
+
+def _ids() -> array:
+    """Sorted id list stored as a typed array, 8 bytes per id"""
+    return array('q')
+
+def _discard(ids: List[int], entity_id: int):
+    """Remove an id from a sorted list if present"""
+    position = bisect_left(ids, entity_id)
+    if position < len(ids) and ids[position] == entity_id:
+        del ids[position]
+
+def _contains(ids: List[int], entity_id: int) -> bool:
+    position = bisect_left(ids, entity_id)
+    return position < len(ids) and ids[position] == entity_id
+
+def _insert(ids: List[int], entity_id: int) -> bool:
+    """Add an id to a sorted list unless present; True if it was added"""
+    position = bisect_left(ids, entity_id)
+    if position < len(ids) and ids[position] == entity_id:
+        return False
+    ids.insert(position, entity_id)
+    return True
+
+def _walk_down(ids: List[int], below: Optional[int]) -> Iterator[int]:
+    """Ids in descending order, starting below a cursor"""
+    position = len(ids) if below is None else bisect_left(ids, below)
+    for i in range(position - 1, -1, -1):
+        yield ids[i]
+
+def _walk_up(ids: List[int], above: Optional[int]) -> Iterator[int]:
+    """Ids in ascending order, starting above a cursor"""
+    position = 0 if above is None else bisect_right(ids, above)
+    for i in range(position, len(ids)):
+        yield ids[i]
+
+def project(data: Dict, fields: Optional[List[str]]) -> Dict:
+    """Keep only the requested fields of a serialized entity"""
+    if not fields:
+        return data
+    return {field: data[field] for field in fields if field in data}
+
+class TripIndex:
+    """Sorted trip id lists by status, driver, rider and zone
+
+    Trip ids are allocated in creation order, so the id order is also the
+    creation-time order; a time range maps to an id range by bisection.
+    The lists are typed arrays so archived trips cost a few bytes each here:
+    8 bytes per list a trip is in. by_rider only holds live trips; a
+    rider's archived trips are found by scanning the archive's rider
+    column, so it stays bounded by the live trips. Lists loaded from a
+    snapshot stay in the mapped file until first used.
+    """
+
+    def __init__(self, city, archive=None):
+        self.city = city
+        self.archive = archive
+        self.lock = threading.RLock()
+        self.clear()
+
+    def clear(self):
+        with self.lock:
+            self.ids = _ids()
+            self.created = array('d')
+            self.by_status: Dict[TripStatus, array] = {status: _ids() for status in TripStatus}
+            self.by_driver: Dict[int, array] = {}
+            self.by_rider: Dict[int, array] = {}
+            self.by_zone: Dict[str, array] = {}
+
+    def on_transition(self, event):
+        """Keep the indexes in step with a trip event"""
+        trip = event.trip
+        with self.lock:
+            if event.previous is None:
+                self._add(trip)
+            else:
+                _discard(self.by_status[event.previous], trip.id)
+            _insert(self.by_status[event.status], trip.id)
+
+            if trip.driver_id is not None:
+                _insert(self.by_driver.setdefault(trip.driver_id, _ids()), trip.id)
+
+    def _add(self, trip):
+        if _insert(self.ids, trip.id):
+            self.created.insert(bisect_left(self.ids, trip.id), trip.created_ts)
+        _insert(self.by_rider.setdefault(trip.rider_id, _ids()), trip.id)
+        for zone in self._zones(trip):
+            _insert(self.by_zone.setdefault(zone, _ids()), trip.id)
+
+    def retire(self, trip):
+        """Drop an archived trip from by_rider; the archive's rider column covers it from now on"""
+        with self.lock:
+            _discard(self.by_rider.get(trip.rider_id, _ids()), trip.id)
+
+    def refile(self, trip):
+        """File a trip under exactly its current status and driver, e.g. after loading a snapshot"""
+        with self.lock:
+            self._add(trip)
+            for status, ids in self.by_status.items():
+                if status != trip.status:
+                    _discard(ids, trip.id)
+            _insert(self.by_status[trip.status], trip.id)
+            if trip.driver_id is not None:
+                _insert(self.by_driver.setdefault(trip.driver_id, _ids()), trip.id)
+
+    def dump(self) -> Dict:
+        """Copies of the id lists, for a snapshot"""
+        with self.lock:
+            return {
+                'ids': copy_array(self.ids),
+                'created': copy_array(self.created),
+                'by_status': {status.value: copy_array(ids) for status, ids in self.by_status.items()},
+                'by_driver': {key: copy_array(ids) for key, ids in peek_items(self.by_driver)},
+                'by_rider': {key: copy_array(ids) for key, ids in peek_items(self.by_rider)},
+                'by_zone': {key: copy_array(ids) for key, ids in self.by_zone.items()}
+            }
+
+    def load(self, data: Dict):
+        """Replace the id lists with ones from a snapshot, which may be mapped or lazily built"""
+        with self.lock:
+            self.ids = data['ids']
+            self.created = data['created']
+            self.by_status = {status: data['by_status'].get(status.value, _ids()) for status in TripStatus}
+            self.by_driver = data['by_driver']
+            self.by_rider = data['by_rider']
+            self.by_zone = data['by_zone']
+
+    def remove(self, trip):
+        """Forget a trip that is being deleted outright"""
+        with self.lock:
+            position = bisect_left(self.ids, trip.id)
+            if position < len(self.ids) and self.ids[position] == trip.id:
+                del self.ids[position]
+                del self.created[position]
+            _discard(self.by_status[trip.status], trip.id)
+            _discard(self.by_rider.get(trip.rider_id, _ids()), trip.id)
+            for zone in self._zones(trip):
+                _discard(self.by_zone.get(zone, _ids()), trip.id)
+            if trip.driver_id is not None:
+                _discard(self.by_driver.get(trip.driver_id, _ids()), trip.id)
+
+    def ids_with_status(self, *statuses: TripStatus, zone: Optional[str] = None) -> List[int]:
+        """Ascending ids of trips in any of the statuses, optionally touching a zone"""
+        with self.lock:
+            ids = list(merge(*(self.by_status[status] for status in statuses)))
+            if zone is not None:
+                zone_ids = self.by_zone.get(zone, _ids())
+                ids = [trip_id for trip_id in ids if _contains(zone_ids, trip_id)]
+        return ids
+
+    def _rider_ids(self, rider_id: int) -> Sequence[int]:
+        """Ascending ids of a rider's live and archived trips"""
+        live = self.by_rider.get(rider_id, _ids())
+        if self.archive is None:
+            return live
+        return list(merge(live, self.archive.rider_trip_ids(rider_id)))
+
+    def _zones(self, trip) -> List[str]:
+        zones = []
+        for location in (trip.pickup, trip.dropoff):
+            zone = self.city.get_zone_of_location(location)
+            if zone and zone not in zones:
+                zones.append(zone)
+        return zones
+
+    def page(self, get_trip: Callable[[int], Optional[object]], status: Optional[TripStatus] = None, zone: Optional[str] = None,
+             driver_id: Optional[int] = None, rider_id: Optional[int] = None,
+             since: Optional[float] = None, until: Optional[float] = None,
+             cursor: Optional[int] = None, limit: int = 50) -> Dict:
+        """Newest-first page of trips matching every filter
+
+        Walks the smallest matching id list from the cursor and checks the
+        remaining filters per trip until the page is full.
+        """
+        with self.lock:
+            candidates = [self.ids]
+            if status is not None:
+                candidates.append(self.by_status[status])
+            if zone is not None:
+                candidates.append(self.by_zone.get(zone, _ids()))
+            if driver_id is not None:
+                candidates.append(self.by_driver.get(driver_id, _ids()))
+            if rider_id is not None:
+                candidates.append(self._rider_ids(rider_id))
+            ids = min(candidates, key=len)
+
+            # Time range -> id range
+            lowest = None
+            upper = cursor
+            if since is not None:
+                position = bisect_left(self.created, since)
+                lowest = self.ids[position] if position < len(self.ids) else None
+                if lowest is None:
+                    return {'items': [], 'next_cursor': None}
+            if until is not None:
+                position = bisect_right(self.created, until)
+                bound = self.ids[position] if position < len(self.ids) else None
+                if bound is not None and (upper is None or bound < upper):
+                    upper = bound
+
+            items = []
+            next_cursor = None
+            for trip_id in _walk_down(ids, upper):
+                if lowest is not None and trip_id < lowest:
+                    break
+                trip = get_trip(trip_id)
+                if trip is None:
+                    continue
+                if status is not None and trip.status != status:
+                    continue
+                if driver_id is not None and trip.driver_id != driver_id:
+                    continue
+                if rider_id is not None and trip.rider_id != rider_id:
+                    continue
+                if zone is not None and zone not in self._zones(trip):
+                    continue
+                if len(items) == limit:
+                    next_cursor = items[-1].id
+                    break
+                items.append(trip)
+
+        return {'items': items, 'next_cursor': next_cursor}
+
+class DriverIndex:
+    """Sorted driver ids, overall and by status"""
+
+    def __init__(self):
+        self.ids: List[int] = []
+        self.by_status: Dict[object, List[int]] = {}
+        self._status_of: Dict[int, object] = {}
+        self.lock = threading.RLock()
+
+    def clear(self):
+        with self.lock:
+            self.ids.clear()
+            self.by_status.clear()
+            self._status_of.clear()
+
+    def update(self, driver):
+        """Add a driver or refile it under its current status"""
+        with self.lock:
+            previous = self._status_of.get(driver.id)
+            if previous is None:
+                insort(self.ids, driver.id)
+            elif previous == driver.status:
+                return
+            else:
+                _discard(self.by_status[previous], driver.id)
+            insort(self.by_status.setdefault(driver.status, []), driver.id)
+            self._status_of[driver.id] = driver.status
+
+    def load(self, ids: Sequence[int], status):
+        """Start from sorted driver ids all in one status, e.g. mapped from a snapshot"""
+        with self.lock:
+            self.ids = MappedArray(ids)
+            self.by_status = {status: MappedArray(ids)}
+            self._status_of = LazyDict(ids, lambda row: status)
+
+    def remove(self, driver_id: int):
+        with self.lock:
+            previous = self._status_of.pop(driver_id, None)
+            if previous is not None:
+                _discard(self.ids, driver_id)
+                _discard(self.by_status[previous], driver_id)
+
+    def ids_with_status(self, status) -> List[int]:
+        with self.lock:
+            return list(self.by_status.get(status, ()))
+
+    def count(self, status=None) -> int:
+        """Number of drivers, or of drivers in a status"""
+        with self.lock:
+            if status is None:
+                return len(self.ids)
+            return len(self.by_status.get(status, ()))
+
+    def page(self, drivers: Dict, status=None, zone_of: Optional[Callable[[int], Optional[str]]] = None,
+             zone: Optional[str] = None, cursor: Optional[int] = None, limit: int = 50) -> Dict:
+        """Page of drivers in id order; zone is checked on the driver's current location"""
+        with self.lock:
+            ids = self.ids if status is None else self.by_status.get(status, [])
+            items = []
+            next_cursor = None
+            for driver_id in _walk_up(ids, cursor):
+                driver = drivers.get(driver_id)
+                if driver is None:
+                    continue
+                if zone is not None and zone_of(driver.location) != zone:
+                    continue
+                if len(items) == limit:
+                    next_cursor = items[-1].id
+                    break
+                items.append(driver)
+
+        return {'items': items, 'next_cursor': next_cursor}
+
+def page_by_id(entities: Dict, ids: List[int], cursor: Optional[int] = None, limit: int = 50) -> Dict:
+    """Page of entities in id order from a sorted id list"""
+    items = []
+    next_cursor = None
+    for entity_id in _walk_up(ids, cursor):
+        entity = entities.get(entity_id)
+        if entity is None:
+            continue
+        if len(items) == limit:
+            next_cursor = items[-1].id
+            break
+        items.append(entity)
+    return {'items': items, 'next_cursor': next_cursor}
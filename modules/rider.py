@@ -1,15 +1,30 @@
-from typing import List
+from collections import deque
+from typing import Deque
+
+# Trip ids kept on the rider itself. Older trips are paged through the trip
+# index, which lists a rider's live trips and scans the archive for the rest.
+RECENT_TRIPS = 20
 
 class Rider:
+    __slots__ = ('id', 'name', 'email', 'trip_history', 'trip_count')
+
     def __init__(self, id: int, name: str, email: str = ""):
         self.id = id
         self.name = name
         self.email = email
-        self.trip_history: List[int] = []
+        self.trip_history: Deque[int] = deque(maxlen=RECENT_TRIPS)
+        self.trip_count = 0
         
     def add_trip(self, trip_id: int):
         """Add trip to rider's history"""
         self.trip_history.append(trip_id)
+        self.trip_count += 1
+        
+    def remove_trip(self, trip_id: int):
+        """Forget a trip, e.g. when its creation is undone"""
+        if trip_id in self.trip_history:
+            self.trip_history.remove(trip_id)
+        self.trip_count -= 1
         
     def to_dict(self):
         """Convert to dictionary"""
@@ -17,5 +32,5 @@ class Rider:
             'id': self.id,
             'name': self.name,
             'email': self.email,
-            'trip_count': len(self.trip_history)
-        }
\ No newline at end of file
+            'trip_count': self.trip_count
+        }
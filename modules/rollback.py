@@ -1,5 +1,9 @@
-from typing import List, Dict, Any
+from typing import Any, Callable, Deque, Dict, List, Optional
+from collections import deque
 from enum import Enum
+import threading
+
+from .trip import TripStatus
 
 class OperationType(Enum):
     ADD_DRIVER = "ADD_DRIVER"
@@ -10,6 +14,14 @@ class OperationType(Enum):
     COMPLETE_TRIP = "COMPLETE_TRIP"
     CANCEL_TRIP = "CANCEL_TRIP"
 
+# Operation recorded for a trip transition into each status
+TRANSITION_OPERATIONS = {
+    TripStatus.ASSIGNED: OperationType.ASSIGN_DRIVER,
+    TripStatus.ONGOING: OperationType.START_TRIP,
+    TripStatus.COMPLETED: OperationType.COMPLETE_TRIP,
+    TripStatus.CANCELLED: OperationType.CANCEL_TRIP
+}
+
 class Operation:
     def __init__(self, op_type: OperationType, data: Dict[str, Any]):
         self.type = op_type
@@ -18,37 +30,231 @@ class Operation:
 
 class RollbackManager:
     def __init__(self, max_history: int = 50):
-        self.history: List[Operation] = []
+        # A bounded deque drops the oldest operation in O(1)
+        self.history: Deque[Operation] = deque(maxlen=max_history)
         self.max_history = max_history
-        
+        self.lock = threading.RLock()
+
     def add_operation(self, op_type: OperationType, data: Dict[str, Any], reverse_data: Dict[str, Any] = None):
         """Add an operation to history"""
         operation = Operation(op_type, data)
         if reverse_data:
             operation.reverse_data = reverse_data
-        self.history.append(operation)
-        
-        # Keep history within limit
-        if len(self.history) > self.max_history:
-            self.history.pop(0)
-    
-    def rollback(self, k: int = 1) -> List[Dict[str, Any]]:
-        """Rollback last k operations"""
-        if k <= 0 or k > len(self.history):
-            return []
-            
+        with self.lock:
+            self.history.append(operation)
+
+    def rollback(self, k: int = 1, undo: Optional[Callable[[Operation], None]] = None) -> List[Dict[str, Any]]:
+        """Rollback last k operations, newest first, calling undo on each
+
+        Stops at the first operation undo fails on and keeps it in history.
+        """
         rolled_back = []
-        for _ in range(k):
-            if self.history:
+        with self.lock:
+            if k <= 0 or k > len(self.history):
+                return []
+
+            for _ in range(k):
                 operation = self.history.pop()
+                if undo is not None:
+                    try:
+                        undo(operation)
+                    except Exception as e:
+                        print(f"✗ Could not undo {operation.type.value}: {e}")
+                        self.history.append(operation)
+                        break
                 rolled_back.append({
                     'type': operation.type.value,
                     'data': operation.data,
                     'reverse_data': operation.reverse_data
                 })
-                
+
         return rolled_back
-    
+
     def clear(self):
         """Clear history"""
-        self.history.clear()
\ No newline at end of file
+        with self.lock:
+            self.history.clear()
+
+def _entity_ids(data: Dict, kind: str) -> List[int]:
+    """Ids an add or create operation covers: one (kind_id) or a batch (kind_ids)"""
+    if f'{kind}_ids' in data:
+        return list(data[f'{kind}_ids'])
+    return [data[f'{kind}_id']]
+
+def _undo_record(data: Dict, kind: str) -> Dict:
+    """Journal record undoing an add or create, in the same shape as the operation"""
+    key = f'{kind}_ids' if f'{kind}_ids' in data else f'{kind}_id'
+    return {key: data[key], 'undo': True}
+
+class UndoEngine:
+    """Applies the inverse of each recorded operation to a ride-share system
+
+    Trip transitions are recorded with their (field, old, new) changes and
+    put back with Trip.revert, which restores the old values and publishes a
+    transition like any other, so indexes, counters, the change log and the
+    journal follow; removals are written to the journal with _write_journal.
+    An undo that would need a driver who has since taken another trip
+    raises, which stops the rollback with that operation still in history.
+    The system provides _halt_trip(trip_id) to stop a trip's driver movement,
+    _resume_trip(trip) to restart it for a trip put back in progress and
+    _process_trips(trip_ids) to dispatch a trip put back to waiting.
+    """
+
+    def __init__(self, system):
+        self.system = system
+        self._inverses = {
+            OperationType.ADD_DRIVER: self._remove_driver,
+            OperationType.ADD_RIDER: self._remove_rider,
+            OperationType.CREATE_TRIP: self._remove_trip,
+            OperationType.ASSIGN_DRIVER: self._unassign,
+            OperationType.START_TRIP: self._unstart,
+            OperationType.COMPLETE_TRIP: self._uncomplete,
+            OperationType.CANCEL_TRIP: self._uncancel
+        }
+
+    def undo(self, operation: Operation):
+        self._inverses[operation.type](operation.reverse_data or operation.data)
+
+    def live_trip(self, trip_id: int):
+        """The live trip, moving it back out of the archive if it was retired"""
+        system = self.system
+        trip = system.trips.get(trip_id)
+        if trip is None:
+            with system.trip_index.lock:
+                trip = system.archive.restore(trip_id)
+                if trip is None:
+                    raise ValueError(f"Trip {trip_id} no longer exists")
+                trip.events = system.events
+                system.trips[trip_id] = trip
+                system.trip_index.refile(trip)
+        return trip
+
+    def _claim_driver(self, trip):
+        """The trip's driver, checked free to take it back before an undo puts it back in progress"""
+        driver = self.system.drivers.get(trip.driver_id)
+        if driver is None:
+            raise ValueError(f"Driver {trip.driver_id} of trip {trip.id} no longer exists")
+        if driver.current_trip_id != trip.id and not driver.is_available():
+            raise ValueError(f"Driver {driver.id} has moved on to trip {driver.current_trip_id}")
+        return driver
+
+    def _release_driver(self, trip):
+        driver = self.system.drivers.get(trip.driver_id)
+        if driver is not None and driver.current_trip_id == trip.id:
+            driver.cancel_trip()
+
+    def _remove_driver(self, data: Dict):
+        system = self.system
+        drivers = [system.drivers[i] for i in _entity_ids(data, 'driver') if i in system.drivers]
+        # Checked for the whole batch first, so a batch is undone entirely or not at all
+        for driver in drivers:
+            if driver.current_trip_id is not None:
+                raise ValueError(f"Driver {driver.id} is on trip {driver.current_trip_id}")
+        for driver in drivers:
+            del system.drivers[driver.id]
+            driver.listener = None
+            system.driver_index.remove(driver.id)
+            system.changelog.set_volatile('drivers', driver.id, False)
+            system.changelog.record('drivers', driver.id)
+        if drivers:
+            system._write_journal(OperationType.ADD_DRIVER, _undo_record(data, 'driver'))
+
+    def _remove_rider(self, data: Dict):
+        system = self.system
+        removed = False
+        # Newest first: undone riders are normally at the end of rider_ids
+        for rider_id in reversed(_entity_ids(data, 'rider')):
+            rider = system.riders.pop(rider_id, None)
+            if rider is None:
+                continue
+            if system.rider_ids and system.rider_ids[-1] == rider.id:
+                system.rider_ids.pop()
+            elif rider.id in system.rider_ids:
+                system.rider_ids.remove(rider.id)
+            system.changelog.record('riders', rider.id)
+            removed = True
+        if removed:
+            system._write_journal(OperationType.ADD_RIDER, _undo_record(data, 'rider'))
+
+    def _remove_trip(self, data: Dict):
+        system = self.system
+        removed = False
+        for trip_id in reversed(_entity_ids(data, 'trip')):
+            if trip_id not in system.trips and trip_id not in system.archive:
+                continue
+            trip = self.live_trip(trip_id)
+            system._halt_trip(trip_id)
+            self._release_driver(trip)
+            del system.trips[trip_id]
+            system.trip_counters.remove(trip)
+            system.trip_index.remove(trip)
+            rider = system.riders.get(trip.rider_id)
+            if rider is not None:
+                rider.remove_trip(trip_id)
+                system.changelog.record('riders', rider.id)
+            system.changelog.record('trips', trip_id)
+            removed = True
+        if removed:
+            system._write_journal(OperationType.CREATE_TRIP, _undo_record(data, 'trip'))
+
+    def _transitioned_trip(self, data: Dict):
+        """The trip a transition was recorded for, if it is still in the status it moved to
+
+        An archived trip is only read here; live_trip moves it back once the
+        undo is known to go ahead.
+        """
+        trip = self.system.get_trip(data['trip_id'])
+        if trip is None:
+            raise ValueError(f"Trip {data['trip_id']} no longer exists")
+        _, _, status = data['changes'][0]
+        return trip if trip.status == status else None
+
+    def _unassign(self, data: Dict):
+        trip = self._transitioned_trip(data)
+        if trip is None:
+            return
+        self._requeue(trip, data['changes'])
+
+    def _requeue(self, trip, changes):
+        """Put a trip back to waiting for a driver and dispatch it again, as a new request is
+
+        The queue slot is claimed first, so a full queue fails the undo
+        before anything changes.
+        """
+        with self.system.worker_pool.slot() as slot:
+            self.system._halt_trip(trip.id)
+            self._release_driver(trip)
+            trip.revert(changes)
+            slot.submit(self.system._process_trips, [trip.id])
+
+    def _unstart(self, data: Dict):
+        trip = self._transitioned_trip(data)
+        if trip is None:
+            return
+        self.system._halt_trip(trip.id)
+        trip.revert(data['changes'])
+        self.system._resume_trip(trip)
+
+    def _uncomplete(self, data: Dict):
+        trip = self._transitioned_trip(data)
+        if trip is None:
+            return
+        driver = self._claim_driver(trip)
+        trip = self.live_trip(trip.id)
+        trip.revert(data['changes'])
+        driver.assign_trip(trip.id)
+        self.system._resume_trip(trip)
+
+    def _uncancel(self, data: Dict):
+        trip = self._transitioned_trip(data)
+        if trip is None:
+            return
+        _, previous, _ = data['changes'][0]
+        if previous != TripStatus.ASSIGNED:
+            self._requeue(self.live_trip(trip.id), data['changes'])
+            return
+        driver = self._claim_driver(trip)
+        trip = self.live_trip(trip.id)
+        trip.revert(data['changes'])
+        driver.assign_trip(trip.id)
+        self.system._resume_trip(trip)
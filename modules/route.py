@@ -0,0 +1,48 @@
+from typing import List
+
+class Route:
+    """A path through the city travelled at a fixed pace, one location per hop"""
+
+    def __init__(self, path: List[int], seconds_per_hop: float = 1.0):
+        self.path = path
+        self.seconds_per_hop = seconds_per_hop
+
+    @property
+    def origin(self) -> int:
+        return self.path[0]
+
+    @property
+    def destination(self) -> int:
+        return self.path[-1]
+
+    @property
+    def hops(self) -> int:
+        return max(0, len(self.path) - 1)
+
+    @property
+    def duration(self) -> float:
+        """Seconds from departure until the destination is reached"""
+        return self.hops * self.seconds_per_hop
+
+    def index_at(self, elapsed: float) -> int:
+        """Index into path of the last location reached after elapsed seconds"""
+        if elapsed <= 0 or self.seconds_per_hop <= 0:
+            return 0 if elapsed <= 0 else self.hops
+        return min(self.hops, int(elapsed / self.seconds_per_hop))
+
+    def location_at(self, elapsed: float) -> int:
+        """Location reached after elapsed seconds"""
+        return self.path[self.index_at(elapsed)]
+
+    def progress_at(self, elapsed: float) -> int:
+        """Percentage of the route covered after elapsed seconds"""
+        if self.duration <= 0:
+            return 100
+        return max(0, min(100, int((elapsed / self.duration) * 100)))
+
+    def eta_at(self, elapsed: float) -> float:
+        """Seconds remaining until the destination is reached"""
+        return max(0.0, self.duration - elapsed)
+
+    def is_finished_at(self, elapsed: float) -> bool:
+        return elapsed >= self.duration
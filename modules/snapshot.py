@@ -0,0 +1,389 @@
+from array import array
+from bisect import bisect_left
+from typing import Callable, Dict, Iterator, Mapping, Optional, Sequence, Tuple
+import json
+import mmap
+import os
+import struct
+import threading
+
+MAGIC = b'RSSNAP01'
+HEADER = struct.Struct('<8sQ')  # magic, length of the JSON header that follows
+ALIGNMENT = 8
+
+def array_segments(values) -> Tuple:
+    """The contiguous buffers holding a typed array's items, in order"""
+    if isinstance(values, MappedArray):
+        return values.segments()
+    return (values,)
+
+def _raw(segment) -> memoryview:
+    return memoryview(segment).cast('B')
+
+def copy_array(values) -> array:
+    """An in-memory copy of a typed or mapped array"""
+    copy = array(values.typecode)
+    for segment in array_segments(values):
+        copy.frombytes(_raw(segment))
+    return copy
+
+class MappedArray:
+    """Typed array whose leading items live in a mapped snapshot
+
+    Reads and in-place writes go straight to the mapping (mapped copy on
+    write, so the file never changes) and appends go to an in-memory
+    array. Inserting or deleting inside the mapped part copies it into
+    memory first.
+    """
+    __slots__ = ('typecode', 'itemsize', '_base', '_split', '_tail')
+
+    def __init__(self, base: memoryview):
+        self.typecode = base.format
+        self.itemsize = base.itemsize
+        self._base = base
+        self._split = len(base)
+        self._tail = array(self.typecode)
+
+    def __len__(self) -> int:
+        return self._split + len(self._tail)
+
+    def __getitem__(self, index: int):
+        if index < 0:
+            index += len(self)
+        if index < self._split:
+            return self._base[index]
+        return self._tail[index - self._split]
+
+    def __setitem__(self, index: int, value):
+        if index < 0:
+            index += len(self)
+        if index < self._split:
+            self._base[index] = value
+        else:
+            self._tail[index - self._split] = value
+
+    def __delitem__(self, index: int):
+        if index < 0:
+            index += len(self)
+        if index < self._split:
+            self._thaw()
+        del self._tail[index - self._split]
+
+    def __iter__(self) -> Iterator:
+        yield from self._base
+        yield from self._tail
+
+    def __contains__(self, value) -> bool:
+        return value in self._base or value in self._tail
+
+    def _thaw(self):
+        """Copy the mapped part into memory"""
+        if self._split:
+            self._tail = copy_array(self)
+            self._base = self._base[:0]
+            self._split = 0
+
+    def insert(self, index: int, value):
+        if index < self._split:
+            self._thaw()
+        self._tail.insert(index - self._split, value)
+
+    def append(self, value):
+        self._tail.append(value)
+
+    def extend(self, values):
+        self._tail.extend(values)
+
+    def pop(self, index: int = -1):
+        if index < 0:
+            index += len(self)
+        if index < self._split:
+            self._thaw()
+        return self._tail.pop(index - self._split)
+
+    def remove(self, value):
+        self._thaw()
+        self._tail.remove(value)
+
+    def clear(self):
+        self._base = self._base[:0]
+        self._split = 0
+        self._tail = array(self.typecode)
+
+    def segments(self) -> Tuple:
+        return (self._base, self._tail)
+
+class LazyDict(dict):
+    """Dict whose entries from a mapped snapshot are built on first access
+
+    keys is the snapshot's sorted key column and build(row) makes the value
+    for a row. Lookups fall back to the snapshot; iterating the whole dict
+    builds every entry first, while peek_items builds the ones not yet
+    accessed without keeping them.
+    """
+
+    def __init__(self, keys: Sequence, build: Callable[[int], object]):
+        super().__init__()
+        self._keys = keys
+        self._build = build
+        self._removed = set()  # snapshot keys deleted since loading
+        self._unloaded = len(keys)
+        self._lock = threading.RLock()
+
+    def _row(self, key) -> int:
+        """Snapshot row of a key not yet built or deleted, or -1"""
+        if not self._unloaded or key in self._removed or dict.__contains__(self, key):
+            return -1
+        try:
+            row = bisect_left(self._keys, key)
+        except TypeError:
+            return -1
+        if row < len(self._keys) and self._keys[row] == key:
+            return row
+        return -1
+
+    def __missing__(self, key):
+        with self._lock:
+            if dict.__contains__(self, key):
+                return dict.__getitem__(self, key)
+            row = self._row(key)
+            if row < 0:
+                raise KeyError(key)
+            value = self._build(row)
+            dict.__setitem__(self, key, value)
+            self._unloaded -= 1
+            return value
+
+    def __contains__(self, key) -> bool:
+        return dict.__contains__(self, key) or self._row(key) >= 0
+
+    def __len__(self) -> int:
+        return dict.__len__(self) + self._unloaded
+
+    def __setitem__(self, key, value):
+        with self._lock:
+            if self._row(key) >= 0:
+                self._unloaded -= 1
+            dict.__setitem__(self, key, value)
+
+    def __delitem__(self, key):
+        with self._lock:
+            self[key]
+            dict.__delitem__(self, key)
+            if self._keys_contain(key):
+                self._removed.add(key)
+
+    def _keys_contain(self, key) -> bool:
+        row = bisect_left(self._keys, key)
+        return row < len(self._keys) and self._keys[row] == key
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def pop(self, key, *default):
+        with self._lock:
+            if key not in self:
+                if default:
+                    return default[0]
+                raise KeyError(key)
+            value = self[key]
+            del self[key]
+            return value
+
+    def setdefault(self, key, default=None):
+        with self._lock:
+            if key not in self:
+                self[key] = default
+            return self[key]
+
+    def update(self, *args, **kwargs):
+        for key, value in dict(*args, **kwargs).items():
+            self[key] = value
+
+    def clear(self):
+        with self._lock:
+            dict.clear(self)
+            self._keys = ()
+            self._removed = set()
+            self._unloaded = 0
+
+    def _load_all(self):
+        if self._unloaded:
+            with self._lock:
+                for row, key in enumerate(self._keys):
+                    if key not in self._removed and not dict.__contains__(self, key):
+                        dict.__setitem__(self, key, self._build(row))
+                self._unloaded = 0
+
+    def __iter__(self):
+        self._load_all()
+        return dict.__iter__(self)
+
+    def keys(self):
+        self._load_all()
+        return dict.keys(self)
+
+    def values(self):
+        self._load_all()
+        return dict.values(self)
+
+    def items(self):
+        self._load_all()
+        return dict.items(self)
+
+    def copy(self) -> Dict:
+        self._load_all()
+        return dict(dict.items(self))
+
+    def peek_items(self, extract: Optional[Callable] = None) -> Iterator[Tuple]:
+        """Every (key, value), building entries not yet accessed without keeping them
+
+        Entries already built are read, through extract if given, when this
+        is called; the rest have not changed since loading and are built as
+        the result is iterated.
+        """
+        with self._lock:
+            built = dict(dict.items(self))
+            removed = set(self._removed)
+            keys = self._keys
+        if extract is not None:
+            built = {key: extract(value) for key, value in built.items()}
+
+        def items():
+            for row, key in enumerate(keys):
+                if key in removed:
+                    continue
+                if key in built:
+                    yield key, built.pop(key)
+                else:
+                    value = self._build(row)
+                    yield key, (extract(value) if extract is not None else value)
+            yield from built.items()
+        return items()
+
+def peek_items(mapping: Mapping, extract: Optional[Callable] = None) -> Iterator[Tuple]:
+    """A mapping's items without building lazily loaded entries into it
+
+    Values in memory are read, through extract if given, when this is called.
+    """
+    if isinstance(mapping, LazyDict):
+        return mapping.peek_items(extract)
+    if extract is None:
+        return iter(list(mapping.items()))
+    return iter([(key, extract(value)) for key, value in list(mapping.items())])
+
+def encode_strings(values) -> Tuple[array, array]:
+    """End offsets (after a leading 0) and the UTF-8 bytes of a list of strings"""
+    offsets = array('q', [0])
+    data = bytearray()
+    for value in values:
+        data += value.encode('utf-8')
+        offsets.append(len(data))
+    encoded = array('B')
+    encoded.frombytes(bytes(data))
+    return offsets, encoded
+
+def encode_table(lists: Mapping) -> Tuple[array, array, array]:
+    """Sorted keys, end offsets and concatenated values of a mapping of id lists"""
+    keys = array('q', sorted(lists))
+    offsets = array('q', [0])
+    values = array('q')
+    for key in keys:
+        items = lists[key]
+        if isinstance(items, (array, MappedArray)):
+            for segment in array_segments(items):
+                values.frombytes(_raw(segment))
+        else:
+            values.extend(items)
+        offsets.append(len(values))
+    return keys, offsets, values
+
+class MappedStrings:
+    """Strings decoded from a mapped snapshot on access"""
+    __slots__ = ('_offsets', '_data')
+
+    def __init__(self, offsets: memoryview, data: memoryview):
+        self._offsets = offsets
+        self._data = data
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, index: int) -> str:
+        return self._data[self._offsets[index]:self._offsets[index + 1]].tobytes().decode('utf-8')
+
+def write_snapshot(path: str, sections: Dict[str, object], meta: Dict):
+    """Write typed arrays as raw, aligned sections after a JSON header, and fsync
+
+    sections maps names to typed or mapped arrays; meta is anything else
+    small enough for JSON.
+    """
+    table = {}
+    offset = 0
+    for name, values in sections.items():
+        offset += -offset % ALIGNMENT
+        table[name] = [values.typecode, offset, len(values)]
+        offset += len(values) * values.itemsize
+    header = json.dumps({'sections': table, 'meta': meta}).encode('utf-8')
+    start = HEADER.size + len(header)
+    start += -start % ALIGNMENT
+
+    with open(path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, len(header)))
+        f.write(header)
+        f.write(b'\0' * (start - HEADER.size - len(header)))
+        position = 0
+        for name, values in sections.items():
+            _, offset, _ = table[name]
+            f.write(b'\0' * (offset - position))
+            for segment in array_segments(values):
+                f.write(_raw(segment))
+            position = offset + len(values) * values.itemsize
+        f.flush()
+        os.fsync(f.fileno())
+
+class MappedSnapshot:
+    """A snapshot file mapped into memory; only its JSON header is read up front"""
+
+    def __init__(self, path: str):
+        with open(path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+        magic, length = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a snapshot")
+        header = json.loads(self._map[HEADER.size:HEADER.size + length].decode('utf-8'))
+        self.meta: Dict = header['meta']
+        self._sections: Dict = header['sections']
+        self._start = HEADER.size + length + (-(HEADER.size + length) % ALIGNMENT)
+        self._view = memoryview(self._map)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._sections
+
+    def array(self, name: str) -> memoryview:
+        """A section as a typed view into the mapping"""
+        typecode, offset, count = self._sections[name]
+        start = self._start + offset
+        return self._view[start:start + count * array(typecode).itemsize].cast(typecode)
+
+    def mapped(self, name: str) -> MappedArray:
+        return MappedArray(self.array(name))
+
+    def strings(self, name: str) -> MappedStrings:
+        return MappedStrings(self.array(f'{name}.offsets'), self.array(f'{name}.data'))
+
+    def table(self, name: str) -> LazyDict:
+        """Id lists by key, each mapped on first access"""
+        offsets = self.array(f'{name}.offsets')
+        values = self.array(f'{name}.values')
+        return LazyDict(self.array(f'{name}.keys'),
+                        lambda row: MappedArray(values[offsets[row]:offsets[row + 1]]))
+
+def add_strings(sections: Dict, name: str, values):
+    sections[f'{name}.offsets'], sections[f'{name}.data'] = encode_strings(values)
+
+def add_table(sections: Dict, name: str, lists: Mapping):
+    sections[f'{name}.keys'], sections[f'{name}.offsets'], sections[f'{name}.values'] = encode_table(lists)
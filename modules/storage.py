@@ -0,0 +1,338 @@
+from typing import Callable, Dict, Iterator, Optional
+import sqlite3
+import threading
+import time
+
+from .changelog import ENTITY_KINDS
+from .driver import Driver
+from .events import TripEvent
+from .journal import resume
+from .rider import Rider
+from .trip import Trip, TripStatus
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS drivers (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    location INTEGER NOT NULL,
+    vehicle TEXT NOT NULL,
+    license_plate TEXT NOT NULL,
+    status TEXT NOT NULL,
+    current_trip_id INTEGER
+);
+CREATE TABLE IF NOT EXISTS riders (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    email TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS trips (
+    id INTEGER PRIMARY KEY,
+    rider_id INTEGER NOT NULL,
+    driver_id INTEGER,
+    pickup INTEGER NOT NULL,
+    dropoff INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    distance REAL NOT NULL,
+    fare REAL NOT NULL,
+    created_ts REAL NOT NULL,
+    assigned_ts REAL,
+    started_ts REAL,
+    completed_ts REAL,
+    cancelled_ts REAL
+);
+"""
+
+COLUMNS = {
+    'drivers': ('id', 'name', 'location', 'vehicle', 'license_plate', 'status', 'current_trip_id'),
+    'riders': ('id', 'name', 'email'),
+    'trips': ('id', 'rider_id', 'driver_id', 'pickup', 'dropoff', 'status', 'distance', 'fare',
+              'created_ts', 'assigned_ts', 'started_ts', 'completed_ts', 'cancelled_ts')
+}
+
+UPSERTS = {
+    kind: f"INSERT OR REPLACE INTO {kind} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+    for kind, columns in COLUMNS.items()
+}
+DELETES = {kind: f"DELETE FROM {kind} WHERE id = ?" for kind in ENTITY_KINDS}
+SELECTS = {kind: f"SELECT {', '.join(columns)} FROM {kind} ORDER BY id" for kind, columns in COLUMNS.items()}
+
+def _driver_row(driver: Driver):
+    return (driver.id, driver.name, driver.location, driver.vehicle, driver.license_plate,
+            driver.status.value, driver.current_trip_id)
+
+def _rider_row(rider: Rider):
+    return (rider.id, rider.name, rider.email)
+
+def _trip_row(trip: Trip):
+    return (trip.id, trip.rider_id, trip.driver_id, trip.pickup, trip.dropoff, trip.status.value,
+            trip.distance, trip.fare, trip.created_ts, trip.assigned_ts, trip.started_ts,
+            trip.completed_ts, trip.cancelled_ts)
+
+ROWS = {'drivers': _driver_row, 'riders': _rider_row, 'trips': _trip_row}
+
+def _trip_from_row(row) -> Trip:
+    trip_id, rider_id, driver_id, pickup, dropoff, status = row[:6]
+    trip = Trip(trip_id, rider_id, pickup, dropoff)
+    trip.driver_id = driver_id
+    trip.status = TripStatus(status)
+    (trip.distance, trip.fare, trip.created_ts, trip.assigned_ts, trip.started_ts,
+     trip.completed_ts, trip.cancelled_ts) = row[6:]
+    return trip
+
+class StateStore:
+    """Where drivers, riders and trips are kept besides the system's dicts
+
+    This base store keeps nothing, so state lives only in memory; that is
+    the default. A persistent store is told the kind and id of every change
+    through mark and hands its contents back through the load_* methods.
+    """
+
+    persistent = False
+
+    def start(self, lookups: Dict[str, Callable[[int], Optional[object]]]):
+        """Begin writing; lookups gives the current entity (or None) for each kind and id"""
+
+    def mark(self, kind: str, entity_id: int):
+        """Note that an entity changed"""
+
+    def flush(self, timeout: Optional[float] = 5) -> bool:
+        """Block until every marked change is written"""
+        return True
+
+    def clear(self):
+        """Forget everything stored, e.g. when the sample data is reloaded"""
+
+    def close(self):
+        """Write what is pending and stop"""
+
+    def load_drivers(self) -> Iterator[Driver]:
+        return iter(())
+
+    def load_riders(self) -> Iterator[Rider]:
+        return iter(())
+
+    def load_trips(self) -> Iterator[Trip]:
+        """Stored trips in id order"""
+        return iter(())
+
+class SQLiteStore(StateStore):
+    """Drivers, riders and trips in a SQLite database in WAL mode
+
+    Nothing is written on the request path: mark only notes which entity
+    changed. A background writer wakes every flush_interval (or once
+    batch_size changes are waiting), reads the current state of each
+    entity marked since its last pass and writes them all in one
+    transaction, so an entity changed many times in between is written
+    once.
+
+    The database is a write-behind copy for one process: ids are allocated
+    and every read is served from that process's memory, and the file is
+    only read back on startup. Several app processes must not share a path.
+    """
+
+    persistent = True
+
+    def __init__(self, path: str, batch_size: int = 1000, flush_interval: float = 0.05):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
+        self.condition = threading.Condition()
+        self._dirty = {kind: set() for kind in ENTITY_KINDS}
+        self._marked = 0  # marks so far
+        self._taken = 0  # marks handed to the writer
+        self._written = 0  # marks covered by a commit
+        self._flush_requested = False
+        self._closed = False
+        self.flushes = 0
+        self.rows_written = 0
+
+        self._lookups: Optional[Dict[str, Callable[[int], Optional[object]]]] = None
+        self._writer: Optional[threading.Thread] = None
+        self._write_lock = threading.Lock()
+        self._local = threading.local()
+        self._connection = self._connect()
+        self._connection.executescript(SCHEMA)
+
+    def __repr__(self) -> str:
+        return f"SQLiteStore({self.path!r})"
+
+    def _connect(self) -> sqlite3.Connection:
+        # Transactions are begun explicitly; synchronous=NORMAL is crash safe in WAL mode
+        connection = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        return connection
+
+    def _reader(self) -> sqlite3.Connection:
+        """This thread's read connection, so readers never wait on the writer's"""
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = self._local.connection = self._connect()
+        return connection
+
+    # Writing
+
+    def start(self, lookups: Dict[str, Callable[[int], Optional[object]]]):
+        self._lookups = lookups
+        if self._writer is None:
+            self._writer = threading.Thread(target=self._run, name="store-writer", daemon=True)
+            self._writer.start()
+
+    def mark(self, kind: str, entity_id: int):
+        with self.condition:
+            self._dirty[kind].add(entity_id)
+            self._marked += 1
+            if self._marked - self._taken >= self.batch_size:
+                self.condition.notify_all()
+
+    def flush(self, timeout: Optional[float] = 5) -> bool:
+        with self.condition:
+            if self._writer is None:
+                return self._written >= self._marked
+            target = self._marked
+            self._flush_requested = True
+            self.condition.notify_all()
+            return self.condition.wait_for(lambda: self._written >= target, timeout)
+
+    def _run(self):
+        while True:
+            with self.condition:
+                self.condition.wait_for(
+                    lambda: self._closed or self._flush_requested or self._marked - self._taken >= self.batch_size,
+                    self.flush_interval
+                )
+                dirty, self._dirty = self._dirty, {kind: set() for kind in ENTITY_KINDS}
+                marked = self._taken = self._marked
+                self._flush_requested = False
+                closed = self._closed
+
+            try:
+                if any(dirty.values()):
+                    self._write(dirty)
+            except sqlite3.Error as e:
+                print(f"✗ Store write failed: {e}")
+                with self.condition:
+                    for kind, ids in dirty.items():
+                        self._dirty[kind] |= ids
+                if closed:
+                    return
+                time.sleep(self.flush_interval)
+                continue
+
+            with self.condition:
+                self._written = max(self._written, marked)
+                self.condition.notify_all()
+            if closed:
+                return
+
+    def _write(self, dirty: Dict[str, set]):
+        """Upsert the current state of each dirty entity and delete the ones that are gone"""
+        rows = {kind: [] for kind in ENTITY_KINDS}
+        removed = {kind: [] for kind in ENTITY_KINDS}
+        for kind, ids in dirty.items():
+            lookup = self._lookups[kind]
+            to_row = ROWS[kind]
+            for entity_id in ids:
+                entity = lookup(entity_id)
+                if entity is None:
+                    removed[kind].append((entity_id,))
+                else:
+                    rows[kind].append(to_row(entity))
+
+        with self._write_lock:
+            connection = self._connection
+            connection.execute("BEGIN")
+            try:
+                for kind in ENTITY_KINDS:
+                    if rows[kind]:
+                        connection.executemany(UPSERTS[kind], rows[kind])
+                    if removed[kind]:
+                        connection.executemany(DELETES[kind], removed[kind])
+                connection.execute("COMMIT")
+            except sqlite3.Error:
+                connection.execute("ROLLBACK")
+                raise
+        self.flushes += 1
+        self.rows_written += sum(len(r) for r in rows.values()) + sum(len(r) for r in removed.values())
+
+    def clear(self):
+        # A batch the writer already took is still safe to write: it reads
+        # the entities as they are now and deletes the ones that are gone
+        with self.condition:
+            self._dirty = {kind: set() for kind in ENTITY_KINDS}
+            self._taken = self._written = self._marked
+            self.condition.notify_all()
+        with self._write_lock:
+            connection = self._connection
+            connection.execute("BEGIN")
+            for kind in ENTITY_KINDS:
+                connection.execute(f"DELETE FROM {kind}")
+            connection.execute("COMMIT")
+
+    def close(self):
+        with self.condition:
+            self._closed = True
+            self.condition.notify_all()
+        if self._writer is not None:
+            self._writer.join()
+        with self._write_lock:
+            self._connection.close()
+
+    # Reading
+
+    def load_drivers(self) -> Iterator[Driver]:
+        for id, name, location, vehicle, license_plate, _, _ in self._reader().execute(SELECTS['drivers']):
+            driver = Driver(id, name, location)
+            driver.vehicle = vehicle
+            driver.license_plate = license_plate
+            yield driver
+
+    def load_riders(self) -> Iterator[Rider]:
+        for id, name, email in self._reader().execute(SELECTS['riders']):
+            yield Rider(id, name, email)
+
+    def load_trips(self) -> Iterator[Trip]:
+        for row in self._reader().execute(SELECTS['trips']):
+            yield _trip_from_row(row)
+
+def load_state(system, store: StateStore) -> int:
+    """Fill an empty system from a store; returns the entities loaded
+
+    Trips go through the indexes, counters and archive as they are loaded,
+    then resume like trips recovered from a journal.
+    """
+    started = time.time()
+    loaded = 0
+    for driver in store.load_drivers():
+        system.drivers[driver.id] = driver
+        driver.listener = system._on_driver_change
+        system.driver_index.update(driver)
+        system.next_driver_id = max(system.next_driver_id, driver.id + 1)
+        loaded += 1
+
+    for rider in store.load_riders():
+        system.riders[rider.id] = rider
+        system.rider_ids.append(rider.id)
+        system.next_rider_id = max(system.next_rider_id, rider.id + 1)
+        loaded += 1
+
+    for trip in store.load_trips():
+        trip.events = system.events
+        system.trips[trip.id] = trip
+        rider = system.riders.get(trip.rider_id)
+        if rider is not None:
+            rider.add_trip(trip.id)
+        event = TripEvent(trip, None, trip.status, time.time())
+        system.trip_index.on_transition(event)
+        system.trip_counters.on_transition(event)
+        system._retire_finished(event)
+        system.next_trip_id = max(system.next_trip_id, trip.id + 1)
+        loaded += 1
+
+    if loaded:
+        resume(system)
+        print(f"✓ Loaded {len(system.drivers)} drivers, {len(system.riders)} riders and "
+              f"{len(system.trips) + len(system.archive)} trips from {store!r} "
+              f"in {time.time() - started:.2f}s")
+    return loaded
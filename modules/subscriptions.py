@@ -0,0 +1,149 @@
+from typing import Dict, List, Optional, Set
+import threading
+
+class SubscriptionRegistry:
+    """Tracks which clients watch which zone, trip and driver rooms
+
+    Room names are 'zone:<name>', 'trip:<id>' and 'driver:<id>'. Changes are
+    only serialized for rooms that currently have subscribers.
+    """
+
+    def __init__(self):
+        self._rooms_by_sid: Dict[str, Set[str]] = {}
+        self._members: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def room_for(channel: Dict) -> Optional[str]:
+        """Room name for a subscription request, or None if it is not valid"""
+        if not isinstance(channel, dict):
+            return None
+        if channel.get('zone'):
+            return f"zone:{channel['zone']}"
+        try:
+            if channel.get('trip_id') is not None:
+                return f"trip:{int(channel['trip_id'])}"
+            if channel.get('driver_id') is not None:
+                return f"driver:{int(channel['driver_id'])}"
+        except (TypeError, ValueError):
+            return None
+        return None
+
+    def add(self, sid: str, room: str) -> bool:
+        """Subscribe sid to room; returns False if it already was"""
+        with self._lock:
+            rooms = self._rooms_by_sid.setdefault(sid, set())
+            if room in rooms:
+                return False
+            rooms.add(room)
+            self._members[room] = self._members.get(room, 0) + 1
+            return True
+
+    def remove(self, sid: str, room: str) -> bool:
+        """Unsubscribe sid from room; returns False if it was not subscribed"""
+        with self._lock:
+            rooms = self._rooms_by_sid.get(sid)
+            if not rooms or room not in rooms:
+                return False
+            rooms.discard(room)
+            if not rooms:
+                del self._rooms_by_sid[sid]
+            self._release(room)
+            return True
+
+    def drop(self, sid: str) -> Set[str]:
+        """Forget every subscription of a disconnected client"""
+        with self._lock:
+            rooms = self._rooms_by_sid.pop(sid, set())
+            for room in rooms:
+                self._release(room)
+            return rooms
+
+    def _release(self, room: str):
+        count = self._members.get(room, 0) - 1
+        if count > 0:
+            self._members[room] = count
+        else:
+            self._members.pop(room, None)
+
+    def is_scoped(self, sid: str) -> bool:
+        """Check if a client has narrowed its updates to specific rooms"""
+        return sid in self._rooms_by_sid
+
+    def has_subscribers(self) -> bool:
+        return bool(self._members)
+
+    def _trip_rooms(self, trip, city) -> List[str]:
+        rooms = [f"trip:{trip.id}"]
+        if trip.driver_id is not None:
+            rooms.append(f"driver:{trip.driver_id}")
+        for location in (trip.pickup, trip.dropoff):
+            zone = city.get_zone_of_location(location)
+            if zone and f"zone:{zone}" not in rooms:
+                rooms.append(f"zone:{zone}")
+        return rooms
+
+    def _driver_rooms(self, driver, city) -> List[str]:
+        rooms = [f"driver:{driver.id}"]
+        if driver.current_trip_id is not None:
+            rooms.append(f"trip:{driver.current_trip_id}")
+        zone = city.get_zone_of_location(driver.location)
+        if zone:
+            rooms.append(f"zone:{zone}")
+        return rooms
+
+    def watching_trip(self, trip, city) -> List[str]:
+        """Subscribed rooms interested in a trip: its own, its driver's and its zones'"""
+        with self._lock:
+            members = set(self._members)
+        return [room for room in self._trip_rooms(trip, city) if room in members]
+
+    def route(self, changes: Dict[str, Set[int]], system) -> Dict[str, Dict[str, List[Dict]]]:
+        """Group changed drivers and trips by the subscribed rooms interested in them"""
+        with self._lock:
+            members = dict(self._members)
+
+        updates: Dict[str, Dict[str, List[Dict]]] = {}
+        sources = (
+            ('trips', system.trips, self._trip_rooms),
+            ('drivers', system.drivers, self._driver_rooms)
+        )
+        for kind, entities, rooms_of in sources:
+            for entity_id in changes.get(kind, ()):
+                entity = entities.get(entity_id)
+                if entity is None:
+                    continue
+                rooms = [room for room in rooms_of(entity, system.city) if room in members]
+                if not rooms:
+                    continue  # nobody is watching, skip serialization
+                data = entity.to_dict()
+                for room in rooms:
+                    updates.setdefault(room, {'drivers': [], 'trips': []})[kind].append(data)
+        return updates
+
+    def snapshot(self, room: str, system) -> Dict[str, List[Dict]]:
+        """Current drivers and trips belonging to a room, sent on subscribe"""
+        kind, _, key = room.partition(':')
+        drivers, trips = [], []
+
+        if kind == 'trip':
+            trip = system.trips.get(int(key))
+            if trip:
+                trips.append(trip)
+                if trip.driver_id in system.drivers:
+                    drivers.append(system.drivers[trip.driver_id])
+        elif kind == 'driver':
+            driver = system.drivers.get(int(key))
+            if driver:
+                drivers.append(driver)
+                if driver.current_trip_id in system.trips:
+                    trips.append(system.trips[driver.current_trip_id])
+        elif kind == 'zone':
+            zone_of = system.city.get_zone_of_location
+            drivers = [d for d in system.drivers.values() if zone_of(d.location) == key]
+            trips = system.get_active_trips(zone=key)
+
+        return {
+            'drivers': [d.to_dict() for d in drivers],
+            'trips': [t.to_dict() for t in trips]
+        }
@@ -1,29 +1,60 @@
-from typing import Dict, List, Optional, Tuple
-from datetime import datetime
-import copy
-import time
-import threading
-import math
+from typing import Dict, List, Optional
 
-from .city import City
-from .driver import Driver, DriverStatus
-from .rider import Rider
+from .base_system import BaseRideShareSystem
+from .driver import Driver
 from .trip import Trip, TripStatus
-from .dispatch import DispatchEngine
-from .rollback import RollbackManager, OperationType
+from .route import Route
+from .worker_pool import ScheduledTask
 
 class TripAnimation:
-    """Handles animation and progression of a single trip"""
+    """Handles animation and progression of a single trip
+
+    The driver only stores its route and departure time; position, progress
+    and ETA are derived from the clock whenever they are read, so the only
+    wakeups are one scheduled task per leg at arrival.
+    """
     
     def __init__(self, system, trip_id: int):
         self.system = system
         self.trip_id = trip_id
-        self.current_path_index = 0
         self.path: List[int] = []
         self.animation_speed = 1  # locations per second
         self.is_animating = False
         self.current_stage = "requested"
-        
+        self._timer: Optional[ScheduledTask] = None
+        
+    def _get_driver(self) -> Optional[Driver]:
+        """Driver assigned to this animation's trip"""
+        trip = self.system.trips.get(self.trip_id)
+        if not trip or not trip.driver_id:
+            return None
+        return self.system.drivers.get(trip.driver_id)
+    
+    def _schedule(self, delay: float, callback):
+        """Wake up once after delay seconds on the system's worker pool
+        
+        The callback runs holding the system's trip lock, unless the
+        animation was stopped or rescheduled meanwhile.
+        """
+        def wake():
+            with self.system.trip_lock:
+                if self._timer is not task:
+                    return
+                self._timer = None
+                callback()
+        
+        with self.system.trip_lock:
+            task = self.system.worker_pool.schedule(delay, wake)
+            self._timer = task
+    
+    @property
+    def current_path_index(self) -> int:
+        """Number of path locations reached so far on the current leg"""
+        driver = self._get_driver()
+        if driver and driver.route is not None:
+            return driver.route.index_at(driver.elapsed()) + 1
+        return len(self.path)
+    
     def start_animation(self):
         """Start the trip animation"""
         if self.trip_id not in self.system.trips:
@@ -54,7 +85,17 @@ class TripAnimation:
                 self.animate_to_dropoff()
     
     def animate_to_pickup(self):
-        """Animate driver moving to pickup location"""
+        """Send driver along the path to pickup and wake up on arrival"""
+        driver = self._get_driver()
+        if not self.is_animating or not driver:
+            return
+        
+        route = Route(self.path, 1.0 / self.animation_speed)
+        driver.depart(route)
+        self._schedule(route.duration, self.reach_pickup)
+    
+    def reach_pickup(self):
+        """Driver arrived at pickup - start the trip"""
         if not self.is_animating or self.trip_id not in self.system.trips:
             return
             
@@ -62,26 +103,12 @@ class TripAnimation:
         if trip.status != TripStatus.ASSIGNED or not trip.driver_id:
             return
         
-        if self.current_path_index < len(self.path):
-            next_location = self.path[self.current_path_index]
-            driver = self.system.drivers[trip.driver_id]
-            
-            # Update driver location
-            driver.location = next_location
-            self.current_path_index += 1
-            
-            # Schedule next movement if not at destination
-            if self.current_path_index < len(self.path):
-                threading.Timer(1.0 / self.animation_speed, self.animate_to_pickup).start()
-            else:
-                # Reached pickup - start the trip
-                trip.start()
-                self.current_stage = "pickup_reached"
-                
-                # Wait 2 seconds then start dropoff animation
-                threading.Timer(2.0, self.start_dropoff_animation).start()
-        else:
-            self.is_animating = False
+        self.system.drivers[trip.driver_id].arrive()
+        trip.start()
+        self.current_stage = "pickup_reached"
+        
+        # Wait 2 seconds then start dropoff animation
+        self._schedule(2.0, self.start_dropoff_animation)
     
     def start_dropoff_animation(self):
         """Start animation to dropoff"""
@@ -92,14 +119,23 @@ class TripAnimation:
         if trip.status == TripStatus.ONGOING:
             self.current_stage = "to_dropoff"
             self.path, distance = self.system.city.get_shortest_path(trip.pickup, trip.dropoff)
-            self.current_path_index = 0
             
             if self.path:
                 self.is_animating = True
                 self.animate_to_dropoff()
     
     def animate_to_dropoff(self):
-        """Animate driver moving to dropoff location"""
+        """Send driver along the path to dropoff and wake up on arrival"""
+        driver = self._get_driver()
+        if not self.is_animating or not driver:
+            return
+        
+        route = Route(self.path, 1.0 / self.animation_speed)
+        driver.depart(route)
+        self._schedule(route.duration, self.reach_dropoff)
+    
+    def reach_dropoff(self):
+        """Driver arrived at dropoff - complete the trip"""
         if not self.is_animating or self.trip_id not in self.system.trips:
             return
             
@@ -107,22 +143,30 @@ class TripAnimation:
         if trip.status != TripStatus.ONGOING or not trip.driver_id:
             return
         
-        if self.current_path_index < len(self.path):
-            next_location = self.path[self.current_path_index]
-            driver = self.system.drivers[trip.driver_id]
-            
-            # Update driver location
-            driver.location = next_location
-            self.current_path_index += 1
-            
-            # Schedule next movement if not at destination
-            if self.current_path_index < len(self.path):
-                threading.Timer(1.0 / self.animation_speed, self.animate_to_dropoff).start()
-            else:
-                # Reached dropoff - complete the trip
-                self.complete_trip()
-        else:
-            self.is_animating = False
+        self.complete_trip()
+    
+    def get_progress(self) -> Dict:
+        """Progress of the current leg, computed from the driver's route"""
+        progress = {
+            'progress_percentage': 0,
+            'current_location': None,
+            'next_location': None,
+            'eta': None
+        }
+        
+        driver = self._get_driver()
+        route = driver.route if driver else None
+        if not self.is_animating or route is None:
+            return progress
+        
+        elapsed = driver.elapsed()
+        index = route.index_at(elapsed)
+        progress['progress_percentage'] = route.progress_at(elapsed)
+        progress['current_location'] = route.path[index]
+        if index + 1 < len(route.path):
+            progress['next_location'] = route.path[index + 1]
+        progress['eta'] = f"{route.eta_at(elapsed):.1f}s"
+        return progress
     
     def complete_trip(self):
         """Complete the trip with distance and fare calculation"""
@@ -170,55 +214,21 @@ class TripAnimation:
     def stop(self):
         """Stop animation"""
         self.is_animating = False
+        if self._timer:
+            self._timer.cancel()
+            self._timer = None
 
-class RideShareSystem:
-    def __init__(self):
-        self.city = City()
-        self.drivers: Dict[int, Driver] = {}
-        self.riders: Dict[int, Rider] = {}
-        self.trips: Dict[int, Trip] = {}
-        self.dispatch = DispatchEngine(self.city)
-        self.rollback_manager = RollbackManager()
+class RideShareSystem(BaseRideShareSystem):
+    def __init__(self, workers: int = 4, queue_limit: int = 100, retain_finished: int = 100):
         self.trip_animations: Dict[int, TripAnimation] = {}
+        super().__init__(workers, queue_limit, retain_finished)
         
-        self.next_driver_id = 101  # Start from 101 for consistency
-        self.next_rider_id = 101   # Start from 101 for consistency
-        self.next_trip_id = 1
-        
-        # Initialize
-        self._initialize_city()
-        
-    def _initialize_city(self):
-        """Initialize city with proper zone layout"""
-        self.city = City()
-        
-        # Create 5 zones with 3 locations each
-        for zone in range(5):
-            for i in range(3):
-                loc_id = zone * 3 + i
-                x = zone * 180 + 50 + (i * 40)
-                y = 150 + (i % 2) * 80
-                self.city.add_location(loc_id, x, y, f"Zone {zone}")
-        
-        # Connect locations
-        for zone in range(5):
-            base = zone * 3
-            self.city.add_road(base, base + 1, 10)
-            self.city.add_road(base + 1, base + 2, 10)
-            if zone < 4:
-                self.city.add_road(base + 2, (zone + 1) * 3, 15)
-    
     def initialize_sample_data(self):
         """Initialize system with sample data"""
-        # Clear data
-        self.drivers.clear()
-        self.riders.clear()
-        self.trips.clear()
-        self.trip_animations.clear()
-        
-        self.next_driver_id = 101
-        self.next_rider_id = 101
-        self.next_trip_id = 1
+        with self.trip_lock:
+            for trip_id in list(self.trip_animations):
+                self._halt_trip(trip_id)
+        self._clear_state()
         
         # Add sample drivers in different zones
         drivers_data = [
@@ -244,44 +254,6 @@ class RideShareSystem:
         for name, email in riders_data:
             self.add_rider(name, email)
     
-    def add_driver(self, name: str, location: int = 0, vehicle: str = "Car", license_plate: str = "") -> Driver:
-        """Add a new driver"""
-        driver_id = self.next_driver_id
-        self.next_driver_id += 1
-        
-        driver = Driver(driver_id, name, location)
-        driver.vehicle = vehicle
-        driver.license_plate = license_plate
-        driver.status = DriverStatus.AVAILABLE
-        
-        self.drivers[driver_id] = driver
-        
-        # Record for rollback
-        self.rollback_manager.add_operation(
-            OperationType.ADD_DRIVER,
-            {'driver_id': driver_id},
-            {'driver_id': driver_id}
-        )
-        
-        return driver
-    
-    def add_rider(self, name: str, email: str = "") -> Rider:
-        """Add a new rider"""
-        rider_id = self.next_rider_id
-        self.next_rider_id += 1
-        
-        rider = Rider(rider_id, name, email)
-        self.riders[rider_id] = rider
-        
-        # Record for rollback
-        self.rollback_manager.add_operation(
-            OperationType.ADD_RIDER,
-            {'rider_id': rider_id},
-            {'rider_id': rider_id}
-        )
-        
-        return rider
-    
     def request_trip(self, rider_id: int, pickup: int, dropoff: int) -> Optional[Trip]:
         """Request a new trip - starts asynchronous processing"""
         if rider_id not in self.riders:
@@ -290,173 +262,155 @@ class RideShareSystem:
         if pickup == dropoff:
             raise ValueError("Pickup and dropoff cannot be the same")
         
-        # Create trip
-        trip_id = self.next_trip_id
-        self.next_trip_id += 1
-        
-        trip = Trip(trip_id, rider_id, pickup, dropoff)
-        self.trips[trip_id] = trip
-        
-        # Add to rider's history
-        self.riders[rider_id].add_trip(trip_id)
-        
-        # Record for rollback
-        self.rollback_manager.add_operation(
-            OperationType.CREATE_TRIP,
-            {'trip_id': trip_id},
-            {'trip_id': trip_id}
-        )
-        
-        # Start asynchronous trip processing
-        threading.Thread(target=self._process_trip_async, args=(trip_id,), daemon=True).start()
+        # Claim a worker queue slot first so overload rejects before any state changes
+        with self.worker_pool.slot() as slot:
+            trip = self._create_trip(rider_id, pickup, dropoff)
+            
+            # Start asynchronous trip processing
+            slot.submit(self._process_trip_async, trip.id)
         
         return trip
     
+    def _process_trips(self, trip_ids: List[int]):
+        """Match a batch of trips to the nearest free drivers in one pass
+        
+        Matching runs without the trip lock; a driver another worker took
+        in the meantime sends the trip round for another pass.
+        """
+        trips = [
+            self.trips[trip_id] for trip_id in trip_ids
+            if trip_id in self.trips and self.trips[trip_id].status == TripStatus.REQUESTED
+        ]
+        matches = self.dispatch.match_batch(trips, self.get_available_drivers())
+        
+        taken = []
+        with self.trip_lock:
+            for trip, driver in matches:
+                if trip.status != TripStatus.REQUESTED:
+                    continue
+                if driver is not None and not driver.is_available():
+                    taken.append(trip.id)
+                    continue
+                if driver is None or not trip.assign_driver(driver.id, self._estimate_fare(trip)):
+                    self.worker_pool.schedule(5, self._cancel_unassigned_trip, trip.id)
+                    continue
+                driver.assign_trip(trip.id)
+                self._start_animation(trip.id)
+        if taken:
+            self._redispatch(taken)
+    
     def _process_trip_async(self, trip_id: int):
         """Asynchronously process a trip through all stages - DEBUG VERSION"""
         print(f"\n=== DEBUG: Starting async processing for trip {trip_id} ===")
     
-    try:
-        trip = self.trips[trip_id]
-        
-        # Stage 1: Find and assign driver
-        print(f"Stage 1: Assigning driver to trip {trip_id}")
-        driver_assigned = self._assign_driver_to_trip(trip_id)
+        try:
+            trip = self.trips[trip_id]
         
-        if driver_assigned:
-            print(f"✓ Driver assigned successfully!")
-            print(f"Trip status after assignment: {trip.status}")
-            print(f"Driver ID: {trip.driver_id}")
-            
-            # Check if driver exists
-            if trip.driver_id in self.drivers:
-                driver = self.drivers[trip.driver_id]
-                print(f"Driver {driver.name} status: {driver.status}")
-            
-            # Stage 2: Start animation to pickup
-            print(f"\nStage 2: Starting animation for trip {trip_id}")
-            if trip.status == TripStatus.ASSIGNED:
-                animation = TripAnimation(self, trip_id)
-                self.trip_animations[trip_id] = animation
-                print("Starting animation...")
-                animation.start_animation()
-                
-                # Monitor trip progress
-                print("Starting progress monitoring...")
-                self._monitor_trip_progress(trip_id)
+            # Stage 1: Find and assign driver, then start animation to pickup
+            print(f"Stage 1: Assigning driver to trip {trip_id}")
+            with self.trip_lock:
+                driver_assigned = self._assign_driver_to_trip(trip_id)
+                if driver_assigned and trip.status == TripStatus.ASSIGNED:
+                    self._start_animation(trip_id)
+        
+            if driver_assigned:
+                print(f"✓ Driver assigned successfully!")
+                print(f"Trip status after assignment: {trip.status}")
+                print(f"Driver ID: {trip.driver_id}")
+                print(f"\nStage 2: Started animation for trip {trip_id}")
             else:
-                print(f"✗ Trip is not in ASSIGNED state: {trip.status}")
-        else:
-            print(f"✗ Failed to assign driver to trip {trip_id}")
-            # No driver available, cancel after timeout
-            print("Waiting 5 seconds then cancelling trip...")
-            time.sleep(5)
-            if trip.status == TripStatus.REQUESTED:
-                print("Cancelling trip due to no drivers...")
+                print(f"✗ Failed to assign driver to trip {trip_id}")
+                # No driver available, cancel after timeout
+                print("Cancelling trip in 5 seconds...")
+                self.worker_pool.schedule(5, self._cancel_unassigned_trip, trip_id)
+    
+        except Exception as e:
+            print(f"✗ ERROR processing trip {trip_id}: {str(e)}")
+            import traceback
+            traceback.print_exc()
+
+    def _cancel_unassigned_trip(self, trip_id: int):
+        """Cancel a trip that is still waiting for a driver"""
+        with self.trip_lock:
+            trip = self.trips.get(trip_id)
+            if trip and trip.status == TripStatus.REQUESTED:
+                print(f"Cancelling trip {trip_id} due to no drivers...")
                 trip.cancel()
                 print(f"Trip status after cancellation: {trip.status}")
-    
-    except Exception as e:
-        print(f"✗ ERROR processing trip {trip_id}: {str(e)}")
-        import traceback
-        traceback.print_exc()
 
     def _assign_driver_to_trip(self, trip_id: int) -> bool:
-        """Assign nearest driver to trip - DEBUG VERSION"""
+        """Assign nearest driver to trip - DEBUG VERSION; called with the trip lock held"""
         trip = self.trips[trip_id]
     
         print(f"\n=== DEBUG: Assigning driver to trip {trip_id} ===")
         print(f"Trip pickup: {trip.pickup}, dropoff: {trip.dropoff}")
         print(f"Trip status: {trip.status}")
     
-    if trip.status != TripStatus.REQUESTED:
-        print(f"ERROR: Trip is not in REQUESTED state: {trip.status}")
-        return False
+        if trip.status != TripStatus.REQUESTED:
+            print(f"ERROR: Trip is not in REQUESTED state: {trip.status}")
+            return False
     
-    # Find available drivers
-    available_drivers = []
-    for driver_id, driver in self.drivers.items():
-        print(f"Driver {driver_id} ({driver.name}): location={driver.location}, status={driver.status}, available={driver.is_available()}")
-        if driver.is_available():
-            available_drivers.append(driver)
+        # Find available drivers
+        available_drivers = []
+        for driver_id, driver in self.drivers.items():
+            print(f"Driver {driver_id} ({driver.name}): location={driver.location}, status={driver.status}, available={driver.is_available()}")
+            if driver.is_available():
+                available_drivers.append(driver)
     
-    print(f"Total available drivers: {len(available_drivers)}")
+        print(f"Total available drivers: {len(available_drivers)}")
     
-    if not available_drivers:
-        print("ERROR: No available drivers!")
-        return False
+        if not available_drivers:
+            print("ERROR: No available drivers!")
+            return False
     
-    # Find nearest driver
-    print(f"\nFinding nearest driver to pickup location {trip.pickup}...")
-    driver = self.dispatch.find_nearest_driver(trip.pickup, available_drivers)
+        # Find nearest driver
+        print(f"\nFinding nearest driver to pickup location {trip.pickup}...")
+        driver = self.dispatch.find_nearest_driver(trip.pickup, available_drivers)
     
-    if driver:
-        print(f"Found driver: {driver.name} (ID: {driver.id}) at location {driver.location}")
-        
-        # Assign driver
-        print(f"Attempting to assign driver {driver.id} to trip {trip_id}...")
-        success = trip.assign_driver(driver.id)
-        print(f"Trip.assign_driver() returned: {success}")
-        
-        if success:
-            print(f"Calling driver.assign_trip({trip_id})...")
-            driver.assign_trip(trip_id)
-            print(f"Driver status after assignment: {driver.status}")
-            print(f"Trip status after assignment: {trip.status}")
-            
-            # Calculate estimated fare
-            distance = self.dispatch.calculate_trip_distance(trip.pickup, trip.dropoff)
-            pickup_zone = self.city.get_zone_of_location(trip.pickup)
-            dropoff_zone = self.city.get_zone_of_location(trip.dropoff)
-            is_cross_zone = pickup_zone != dropoff_zone if pickup_zone and dropoff_zone else False
-            trip.fare = self.dispatch.calculate_fare(distance, is_cross_zone)
-            print(f"Calculated fare: ${trip.fare:.2f}")
-            
-            # Record for rollback
-            self.rollback_manager.add_operation(
-                OperationType.ASSIGN_DRIVER,
-                {
-                    'trip_id': trip_id,
-                    'driver_id': driver.id,
-                    'previous_status': TripStatus.REQUESTED.value
-                },
-                {
-                    'trip_id': trip_id,
-                    'driver_id': driver.id
-                }
-            )
+        if driver:
+            print(f"Found driver: {driver.name} (ID: {driver.id}) at location {driver.location}")
+        
+            # Assign driver
+            print(f"Attempting to assign driver {driver.id} to trip {trip_id}...")
+            success = trip.assign_driver(driver.id, self._estimate_fare(trip))
+            print(f"Trip.assign_driver() returned: {success}")
+        
+            if success:
+                print(f"Calling driver.assign_trip({trip_id})...")
+                driver.assign_trip(trip_id)
+                print(f"Driver status after assignment: {driver.status}")
+                print(f"Trip status after assignment: {trip.status}")
+                print(f"Calculated fare: ${trip.fare:.2f}")
             
-            print(f"✓ SUCCESS: Driver {driver.name} assigned to trip {trip_id}")
-            return True
+                print(f"✓ SUCCESS: Driver {driver.name} assigned to trip {trip_id}")
+                return True
+            else:
+                print(f"✗ FAILED: Could not assign driver to trip")
         else:
-            print(f"✗ FAILED: Could not assign driver to trip")
-    else:
-        print("✗ FAILED: No driver found (find_nearest_driver returned None)")
+            print("✗ FAILED: No driver found (find_nearest_driver returned None)")
     
-    return False
+        return False
 
-    def _monitor_trip_progress(self, trip_id: int):
-        """Monitor trip progress and update state"""
-        max_wait_time = 120  # 2 minutes max
-        start_time = time.time()
-        
-        while time.time() - start_time < max_wait_time:
-            if trip_id not in self.trips:
-                break
-            
-            trip = self.trips[trip_id]
-            
-            if trip.status == TripStatus.COMPLETED or trip.status == TripStatus.CANCELLED:
-                break
-            
-            time.sleep(0.5)
+    def _estimate_fare(self, trip: Trip) -> float:
+        """Estimated fare from the road distance and zone crossing, set when a driver is assigned"""
+        distance = self.dispatch.calculate_trip_distance(trip.pickup, trip.dropoff)
+        pickup_zone = self.city.get_zone_of_location(trip.pickup)
+        dropoff_zone = self.city.get_zone_of_location(trip.dropoff)
+        is_cross_zone = pickup_zone != dropoff_zone if pickup_zone and dropoff_zone else False
+        return self.dispatch.calculate_fare(distance, is_cross_zone)
+    
+    def _start_animation(self, trip_id: int):
+        """Start moving the assigned driver towards pickup; called with the trip lock held"""
+        animation = TripAnimation(self, trip_id)
+        self.trip_animations[trip_id] = animation
+        animation.start_animation()
     
     def get_trip_progress(self, trip_id: int) -> Dict:
         """Get detailed progress info for a trip"""
-        if trip_id not in self.trips:
+        trip = self.get_trip(trip_id)
+        if trip is None:
             return {}
         
-        trip = self.trips[trip_id]
         result = {
             'trip': trip.to_dict(),
             'stage': 'waiting',
@@ -470,56 +424,47 @@ class RideShareSystem:
             animation = self.trip_animations[trip_id]
             result['stage'] = animation.current_stage
             
-            if animation.is_animating and animation.path:
-                total_steps = len(animation.path)
-                current_step = animation.current_path_index
-                
-                if total_steps > 0:
-                    result['progress_percentage'] = min(100, int((current_step / total_steps) * 100))
-                    
-                    if current_step < len(animation.path):
-                        result['current_location'] = animation.path[max(0, current_step - 1)]
-                        result['next_location'] = animation.path[current_step]
-                        
-                        # Calculate ETA
-                        remaining_steps = total_steps - current_step
-                        result['eta'] = f"{remaining_steps / animation.animation_speed:.1f}s"
+            # Position, progress and ETA are derived from the driver's route on read
+            result.update(animation.get_progress())
         
         return result
     
     def cancel_trip(self, trip_id: int) -> bool:
         """Cancel a trip"""
-        if trip_id not in self.trips:
-            return False
-        
-        trip = self.trips[trip_id]
+        with self.trip_lock:
+            if trip_id not in self.trips:
+                return False
         
-        if not trip.is_active():
-            return False
+            trip = self.trips[trip_id]
         
-        # Stop animation if running
-        if trip_id in self.trip_animations:
-            self.trip_animations[trip_id].stop()
-            del self.trip_animations[trip_id]
+            if not trip.is_active():
+                return False
         
-        # Get previous state for rollback
-        previous_state = copy.deepcopy(trip.to_dict())
+            # Stop animation if running
+            if trip_id in self.trip_animations:
+                self.trip_animations[trip_id].stop()
+                del self.trip_animations[trip_id]
         
-        # Cancel trip
-        success = trip.cancel()
+            # Cancel trip; the transition is recorded for rollback by _record_transition
+            success = trip.cancel()
         
-        if success:
             # Free driver if assigned
-            if trip.driver_id and trip.driver_id in self.drivers:
+            if success and trip.driver_id and trip.driver_id in self.drivers:
                 self.drivers[trip.driver_id].cancel_trip()
             
-            self.rollback_manager.add_operation(
-                OperationType.CANCEL_TRIP,
-                {'trip_id': trip_id},
-                {'previous_state': previous_state}
-            )
-            
-        return success
+            return success
+    
+    def _halt_trip(self, trip_id: int):
+        """Stop a trip's animation before an undo changes it"""
+        animation = self.trip_animations.pop(trip_id, None)
+        if animation:
+            animation.stop()
+    
+    def _resume_trip(self, trip: Trip):
+        """Restart driver movement for a trip an undo put back in progress"""
+        self._halt_trip(trip.id)
+        if trip.status in (TripStatus.ASSIGNED, TripStatus.ONGOING):
+            self._start_animation(trip.id)
     
     def get_active_animations(self) -> List[Dict]:
         """Get all active trip animations"""
@@ -536,59 +481,14 @@ class RideShareSystem:
                 })
         return animations
     
-    def get_available_drivers(self) -> List[Driver]:
-        """Get list of available drivers"""
-        return [d for d in self.drivers.values() if d.is_available()]
-    
-    def get_active_trips(self) -> List[Trip]:
-        """Get list of active trips"""
-        return [t for t in self.trips.values() if t.is_active()]
-    
     def get_analytics(self) -> Dict:
         """Get system analytics"""
-        total_trips = len(self.trips)
-        completed = len([t for t in self.trips.values() if t.status == TripStatus.COMPLETED])
-        cancelled = len([t for t in self.trips.values() if t.status == TripStatus.CANCELLED])
-        active = len(self.get_active_trips())
-        
-        total_distance = sum(t.distance for t in self.trips.values())
-        total_fare = sum(t.fare for t in self.trips.values())
-        
-        avg_distance = total_distance / completed if completed > 0 else 0
-        avg_fare = total_fare / completed if completed > 0 else 0
-        
-        available_drivers = len(self.get_available_drivers())
-        total_drivers = len(self.drivers)
-        driver_utilization = (total_drivers - available_drivers) / total_drivers if total_drivers > 0 else 0
-        
-        return {
-            'total_trips': total_trips,
-            'completed_trips': completed,
-            'cancelled_trips': cancelled,
-            'active_trips': active,
-            'total_distance': round(total_distance, 2),
-            'total_fare': round(total_fare, 2),
-            'average_distance': round(avg_distance, 2),
-            'average_fare': round(avg_fare, 2),
-            'available_drivers': available_drivers,
-            'total_drivers': total_drivers,
-            'driver_utilization': round(driver_utilization, 2),
-            'total_riders': len(self.riders),
-            'active_animations': len([a for a in self.trip_animations.values() if a.is_animating])
-        }
+        analytics = super().get_analytics()
+        analytics['active_animations'] = len([a for a in self.trip_animations.values() if a.is_animating])
+        return analytics
     
     def get_state(self) -> Dict:
         """Get complete system state"""
-        return {
-            'city': self.city.to_dict(),
-            'drivers': [d.to_dict() for d in self.drivers.values()],
-            'riders': [r.to_dict() for r in self.riders.values()],
-            'trips': [t.to_dict() for t in self.trips.values()],
-            'analytics': self.get_analytics(),
-            'active_animations': self.get_active_animations()
-        }
-    
-    def rollback(self, k: int = 1) -> bool:
-        """Rollback last k operations"""
-        rolled_back = self.rollback_manager.rollback(k)
-        return len(rolled_back) > 0
\ No newline at end of file
+        state = super().get_state()
+        state['active_animations'] = self.get_active_animations()
+        return state
@@ -1,6 +1,7 @@
 from enum import Enum
 from datetime import datetime
-from typing import Optional
+from typing import Dict, Optional, Tuple
+import time
 
 class TripStatus(Enum):
     REQUESTED = "REQUESTED"
@@ -9,7 +10,28 @@ class TripStatus(Enum):
     COMPLETED = "COMPLETED"
     CANCELLED = "CANCELLED"
 
+# Statuses are stored as their index in this tuple
+TRIP_STATUSES = tuple(TripStatus)
+TRIP_STATUS_CODES = {status: code for code, status in enumerate(TRIP_STATUSES)}
+
+def timestamp_property(slot: str) -> property:
+    """datetime view of a float epoch seconds slot, None while unset"""
+    def fget(self) -> Optional[datetime]:
+        value = getattr(self, slot)
+        return None if value is None else datetime.fromtimestamp(value)
+
+    def fset(self, value: Optional[datetime]):
+        setattr(self, slot, None if value is None else value.timestamp())
+
+    return property(fget, fset)
+
 class Trip:
+    # No per-instance dict; timestamps are floats rather than datetime objects
+    __slots__ = (
+        'id', 'rider_id', 'pickup', 'dropoff', 'driver_id', 'status_code', 'distance', 'fare',
+        'created_ts', 'assigned_ts', 'started_ts', 'completed_ts', 'cancelled_ts', 'events'
+    )
+
     def __init__(self, id: int, rider_id: int, pickup: int, dropoff: int):
         self.id = id
         self.rider_id = rider_id
@@ -19,25 +41,56 @@ class Trip:
         self.status = TripStatus.REQUESTED
         self.distance: float = 0.0
         self.fare: float = 0.0
-        self.created_at = datetime.now()
-        self.assigned_at: Optional[datetime] = None
-        self.started_at: Optional[datetime] = None
-        self.completed_at: Optional[datetime] = None
-        self.cancelled_at: Optional[datetime] = None
+        self.created_ts = time.time()
+        self.assigned_ts: Optional[float] = None
+        self.started_ts: Optional[float] = None
+        self.completed_ts: Optional[float] = None
+        self.cancelled_ts: Optional[float] = None
+        self.events = None  # TripEventBus notified on every transition
+
+    @property
+    def status(self) -> TripStatus:
+        return TRIP_STATUSES[self.status_code]
+
+    @status.setter
+    def status(self, value: TripStatus):
+        self.status_code = TRIP_STATUS_CODES[value]
+
+    created_at = timestamp_property('created_ts')
+    assigned_at = timestamp_property('assigned_ts')
+    started_at = timestamp_property('started_ts')
+    completed_at = timestamp_property('completed_ts')
+    cancelled_at = timestamp_property('cancelled_ts')
+        
+    def _apply(self, status: TripStatus, **fields) -> Tuple:
+        """Move to status and set fields, returning (field, old, new) for each change"""
+        changes = [('status', self.status, status)]
+        for name, value in fields.items():
+            old = getattr(self, name)
+            if old != value:
+                changes.append((name, old, value))
+            setattr(self, name, value)
+        self.status = status
+        return tuple(changes)
+    
+    def _notify(self, previous: TripStatus, changes: Tuple = (), undo: bool = False):
+        """Publish a transition from previous to the current status"""
+        if self.events is not None:
+            self.events.publish(self, previous, changes, undo)
         
-    def assign_driver(self, driver_id: int):
+    def assign_driver(self, driver_id: int, fare: Optional[float] = None):
         """Assign a driver to this trip - DEBUG VERSION"""
         print(f"\n=== DEBUG: Trip.assign_driver({driver_id}) called ===")
         print(f"Current trip status: {self.status}")
         print(f"Driver ID to assign: {driver_id}")
     
         if self.status == TripStatus.REQUESTED:
-            self.driver_id = driver_id
-            self.status = TripStatus.ASSIGNED
-            self.assigned_at = datetime.now()
+            changes = self._apply(TripStatus.ASSIGNED, driver_id=driver_id, assigned_ts=time.time(),
+                                  fare=self.fare if fare is None else fare)
             print(f"✓ Driver assigned successfully!")
             print(f"New trip status: {self.status}")
             print(f"Driver ID set to: {self.driver_id}")
+            self._notify(TripStatus.REQUESTED, changes)
         
             return True
         
@@ -47,29 +100,39 @@ class Trip:
     def start(self):
         """Start the trip"""
         if self.status == TripStatus.ASSIGNED:
-            self.status = TripStatus.ONGOING
-            self.started_at = datetime.now()
+            changes = self._apply(TripStatus.ONGOING, started_ts=time.time())
+            self._notify(TripStatus.ASSIGNED, changes)
             return True
         return False
     
     def complete(self, distance: float, fare: float):
         """Complete the trip"""
         if self.status == TripStatus.ONGOING:
-            self.status = TripStatus.COMPLETED
-            self.distance = distance
-            self.fare = fare
-            self.completed_at = datetime.now()
+            changes = self._apply(TripStatus.COMPLETED, distance=distance, fare=fare, completed_ts=time.time())
+            self._notify(TripStatus.ONGOING, changes)
             return True
         return False
     
     def cancel(self):
         """Cancel the trip"""
         if self.status in [TripStatus.REQUESTED, TripStatus.ASSIGNED]:
-            self.status = TripStatus.CANCELLED
-            self.cancelled_at = datetime.now()
+            previous = self.status
+            changes = self._apply(TripStatus.CANCELLED, cancelled_ts=time.time())
+            self._notify(previous, changes)
             return True
         return False
     
+    def apply(self, status: TripStatus, fields: Dict, undo: bool = False):
+        """Set a status and fields decided elsewhere (an undo, a journal replay) and publish it"""
+        previous = self.status
+        self._notify(previous, self._apply(status, **fields), undo)
+    
+    def revert(self, changes: Tuple):
+        """Undo a transition by restoring the old values of its changes"""
+        old = {name: value for name, value, _ in changes}
+        status = old.pop('status')
+        self.apply(status, old, undo=True)
+    
     def is_active(self) -> bool:
         """Check if trip is active"""
         return self.status not in [TripStatus.COMPLETED, TripStatus.CANCELLED]
@@ -0,0 +1,70 @@
+from typing import Any, Optional
+import json
+
+try:
+    import msgpack
+except ImportError:  # optional; JSON is always available
+    msgpack = None
+
+JSON = 'json'
+MSGPACK = 'msgpack'
+
+MIMETYPES = {
+    JSON: 'application/json',
+    MSGPACK: 'application/msgpack'
+}
+
+def msgpack_available() -> bool:
+    return msgpack is not None
+
+def _quality(accept: str, *media_types: str) -> float:
+    """Highest q-value an Accept header gives any of media_types; 0 if none match"""
+    best = 0.0
+    for entry in accept.lower().split(','):
+        media, *params = [part.strip() for part in entry.split(';')]
+        if media not in media_types:
+            continue
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition('=')
+            if name.strip() == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        best = max(best, q)
+    return best
+
+def negotiate(accept: Optional[str] = None, requested: Optional[str] = None) -> str:
+    """Pick the wire format from an explicit request or an Accept header; JSON by default
+
+    MessagePack is chosen when the header accepts it (q > 0) at least as
+    strongly as JSON.
+    """
+    if requested:
+        requested = requested.lower()
+        if requested == MSGPACK and msgpack_available():
+            return MSGPACK
+        return JSON
+    if accept and msgpack_available():
+        q_msgpack = _quality(accept, 'application/msgpack', 'application/x-msgpack')
+        q_json = _quality(accept, 'application/json', 'application/*', '*/*')
+        if q_msgpack > 0 and q_msgpack >= q_json:
+            return MSGPACK
+    return JSON
+
+def encode(payload: Any, fmt: str = JSON) -> bytes:
+    """Serialize a state payload in the given format"""
+    if fmt == MSGPACK:
+        if not msgpack_available():
+            raise RuntimeError("MessagePack support requires the msgpack package")
+        return msgpack.packb(payload, use_bin_type=True)
+    return json.dumps(payload, separators=(',', ':')).encode('utf-8')
+
+def decode(data: bytes, fmt: str = JSON) -> Any:
+    """Inverse of encode"""
+    if fmt == MSGPACK:
+        if not msgpack_available():
+            raise RuntimeError("MessagePack support requires the msgpack package")
+        return msgpack.unpackb(data, raw=False)
+    return json.loads(data)
@@ -0,0 +1,226 @@
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+import heapq
+import itertools
+import threading
+import time
+
+class PoolOverloadedError(RuntimeError):
+    """Raised when the trip queue is full and new work is rejected"""
+
+class ScheduledTask:
+    """Handle for work scheduled to run later on the pool"""
+
+    def __init__(self, fn: Callable, args: tuple):
+        self.fn = fn
+        self.args = args
+        self.cancelled = False
+
+    def cancel(self):
+        """Prevent the task from running if it has not started yet"""
+        self.cancelled = True
+
+class _Slot:
+    """A queue slot claimed up front so setup can run before submitting"""
+
+    def __init__(self, pool: 'TripWorkerPool'):
+        self.pool = pool
+        self.used = False
+
+    def submit(self, fn: Callable, *args):
+        """Queue fn on the claimed slot"""
+        if self.used:
+            raise RuntimeError("Slot already used")
+        self.used = True
+        self.pool._enqueue(fn, args, reserved=True)
+
+class TripWorkerPool:
+    """Fixed number of worker threads fed by a bounded queue
+
+    New work beyond queue_limit is rejected with PoolOverloadedError. Delayed
+    continuations (driver arrivals, timeouts) share one scheduler thread,
+    which counts them against the same limit but waits for room instead of
+    rejecting them, since the work they belong to was already admitted.
+    Tasks run concurrently; they lock whatever state they change themselves.
+    """
+
+    def __init__(self, size: int = 4, queue_limit: int = 100, sample_size: int = 1000):
+        self.size = max(1, size)
+        self.queue_limit = max(1, queue_limit)
+
+        self._queue: Deque[Tuple[Callable, tuple, float]] = deque()
+        self._reserved = 0
+        self._lock = threading.Lock()
+        self._condition = threading.Condition(self._lock)  # work was queued
+        self._room = threading.Condition(self._lock)  # the queue has room
+        self._workers: List[threading.Thread] = []
+
+        self._timers: List[Tuple[float, int, ScheduledTask]] = []
+        self._timer_condition = threading.Condition()
+        self._timer_thread: Optional[threading.Thread] = None
+        self._sequence = itertools.count()
+
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.busy = 0
+        self._wait_times: Deque[float] = deque(maxlen=sample_size)
+        self._run_times: Deque[float] = deque(maxlen=sample_size)
+
+    def _start_workers(self):
+        """Start worker threads on first use"""
+        while len(self._workers) < self.size:
+            worker = threading.Thread(
+                target=self._work,
+                name=f"trip-worker-{len(self._workers) + 1}",
+                daemon=True
+            )
+            self._workers.append(worker)
+            worker.start()
+
+    def _is_full(self) -> bool:
+        return len(self._queue) + self._reserved >= self.queue_limit
+
+    def _enqueue(self, fn: Callable, args: tuple, reserved: bool = False):
+        with self._condition:
+            if reserved:
+                self._reserved -= 1
+            elif self._is_full():
+                self.rejected += 1
+                raise PoolOverloadedError(
+                    f"Trip queue is full ({self.queue_limit} pending), try again later"
+                )
+            self._append(fn, args)
+
+    def _append(self, fn: Callable, args: tuple):
+        """Queue a task; the caller holds the lock and has made room for it"""
+        self._start_workers()
+        self._queue.append((fn, args, time.time()))
+        self.submitted += 1
+        self._condition.notify()
+
+    def submit(self, fn: Callable, *args):
+        """Queue fn(*args) for a worker; raises PoolOverloadedError when full"""
+        self._enqueue(fn, args)
+
+    @contextmanager
+    def slot(self):
+        """Claim a queue slot, raising PoolOverloadedError when full
+
+        The slot is released if the block exits without submitting.
+        """
+        with self._condition:
+            if self._is_full():
+                self.rejected += 1
+                raise PoolOverloadedError(
+                    f"Trip queue is full ({self.queue_limit} pending), try again later"
+                )
+            self._reserved += 1
+
+        slot = _Slot(self)
+        try:
+            yield slot
+        finally:
+            if not slot.used:
+                with self._condition:
+                    self._reserved -= 1
+                    self._room.notify()
+
+    def schedule(self, delay: float, fn: Callable, *args) -> ScheduledTask:
+        """Run fn(*args) on a worker after delay seconds"""
+        task = ScheduledTask(fn, args)
+        with self._timer_condition:
+            heapq.heappush(self._timers, (time.time() + delay, next(self._sequence), task))
+            if self._timer_thread is None:
+                self._timer_thread = threading.Thread(
+                    target=self._run_timers, name="trip-scheduler", daemon=True
+                )
+                self._timer_thread.start()
+            self._timer_condition.notify()
+        return task
+
+    def _run_timers(self):
+        """Move due scheduled tasks onto the worker queue"""
+        while True:
+            with self._timer_condition:
+                while not self._timers:
+                    self._timer_condition.wait()
+                due_at, _, task = self._timers[0]
+                delay = due_at - time.time()
+                if delay > 0:
+                    self._timer_condition.wait(delay)
+                    continue
+                heapq.heappop(self._timers)
+
+            if not task.cancelled:
+                with self._room:
+                    self._room.wait_for(lambda: not self._is_full())
+                    self._append(self._run_scheduled, (task,))
+
+    def _run_scheduled(self, task: ScheduledTask):
+        if not task.cancelled:
+            task.fn(*task.args)
+
+    def _work(self):
+        while True:
+            with self._condition:
+                while not self._queue:
+                    self._condition.wait()
+                fn, args, enqueued_at = self._queue.popleft()
+                self.busy += 1
+                self._room.notify()
+
+            started_at = time.time()
+            try:
+                fn(*args)
+            except Exception as e:
+                print(f"✗ Error in trip worker: {e}")
+                with self._condition:
+                    self.failed += 1
+            finally:
+                finished_at = time.time()
+                with self._condition:
+                    self.busy -= 1
+                    self.completed += 1
+                    self._wait_times.append(started_at - enqueued_at)
+                    self._run_times.append(finished_at - started_at)
+
+    @staticmethod
+    def _summarize(samples: List[float]) -> Dict:
+        """Average, p95 and max of samples in milliseconds"""
+        if not samples:
+            return {'avg_ms': 0, 'p95_ms': 0, 'max_ms': 0}
+        ordered = sorted(samples)
+        p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+        return {
+            'avg_ms': round(sum(ordered) / len(ordered) * 1000, 2),
+            'p95_ms': round(p95 * 1000, 2),
+            'max_ms': round(ordered[-1] * 1000, 2)
+        }
+
+    def queue_depth(self) -> int:
+        """Number of tasks waiting for a worker"""
+        return len(self._queue)
+
+    def get_metrics(self) -> Dict:
+        """Queue depth, counters and wait/run time statistics"""
+        with self._condition:
+            wait_times = list(self._wait_times)
+            run_times = list(self._run_times)
+            metrics = {
+                'workers': self.size,
+                'busy_workers': self.busy,
+                'queue_depth': len(self._queue),
+                'queue_limit': self.queue_limit,
+                'submitted': self.submitted,
+                'completed': self.completed,
+                'failed': self.failed,
+                'rejected': self.rejected
+            }
+        with self._timer_condition:
+            metrics['scheduled'] = len(self._timers)
+        metrics['wait_time'] = self._summarize(wait_times)
+        metrics['run_time'] = self._summarize(run_times)
+        return metrics
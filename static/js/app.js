@@ -1,6 +1,8 @@
 class RideSharingApp {
     constructor() {
         this.systemState = null;
+        this.city = null;
+        this.cityVersion = null;
         this.activeAnimations = new Map();
         this.driverPaths = new Map();
         this.driverPositions = new Map();
@@ -37,11 +39,79 @@ class RideSharingApp {
     }
 
     handleSystemUpdate(data) {
-        this.systemState = data.data;
+        if (data.type === 'scoped') {
+            // Room updates only carry the entities of the subscribed zone/trip/driver
+            if (this.systemState) {
+                this.applyDelta(data.data);
+                this.updateDashboard();
+                this.renderCityMap();
+            }
+            return;
+        }
+        if (data.type === 'delta' && this.systemState) {
+            this.applyDelta(data.data);
+        } else {
+            this.systemState = data.data;
+        }
+        this.acknowledgeVersion(data.version);
+        this.syncCity(data.data.city_version);
         this.updateDashboard();
         this.renderCityMap();
     }
 
+    async syncCity(version) {
+        // The city is served separately and only refetched when its version changes
+        if (this.city && this.cityVersion === version) {
+            this.systemState.city = this.city;
+            return;
+        }
+        try {
+            // The browser revalidates with If-None-Match and reuses its cached copy on 304
+            const response = await fetch('/api/city');
+            const data = await response.json();
+            this.city = data.city;
+            this.cityVersion = data.version;
+            if (this.systemState) {
+                this.systemState.city = this.city;
+                this.renderCityMap();
+            }
+        } catch (error) {
+            console.error('Error loading city:', error);
+        }
+    }
+
+    applyDelta(delta) {
+        // Upsert changed entities by id and drop removed ones
+        ['drivers', 'riders', 'trips'].forEach(kind => {
+            const byId = new Map(this.systemState[kind].map(entity => [entity.id, entity]));
+            (delta[kind] || []).forEach(entity => byId.set(entity.id, entity));
+            ((delta.removed || {})[kind] || []).forEach(id => byId.delete(id));
+            this.systemState[kind] = Array.from(byId.values());
+        });
+        if (delta.analytics) this.systemState.analytics = delta.analytics;
+        if (delta.city_version !== undefined) this.systemState.city_version = delta.city_version;
+    }
+
+    subscribe(channel) {
+        // e.g. { zone: 'Zone 1' }, { trip_id: 5 } or { driver_id: 101 }
+        this.socket.emit('subscribe', channel);
+    }
+
+    unsubscribe(channel) {
+        this.socket.emit('unsubscribe', channel);
+    }
+
+    acknowledgeVersion(version) {
+        if (version === undefined || version === null) return;
+        this.systemState.version = version;
+        this.socket.emit('ack', { version: version });
+    }
+
+    requestUpdate() {
+        const since = this.systemState ? this.systemState.version : null;
+        this.socket.emit('request_update', { since: since });
+    }
+
     handleTripUpdate(data) {
         console.log(`Trip update: ${data.trip_id} - ${data.status} - ${data.stage}`);
 
@@ -61,8 +131,17 @@ class RideSharingApp {
             this.updateTripAnimation(data.trip_id, data.progress);
         }
 
-        // Refresh dashboard
-        setTimeout(() => this.loadSystemState(), 500);
+        // Patch the trip in place when the server sent it; otherwise it arrives with the next system_update
+        if (data.trip && this.systemState) {
+            const trips = this.systemState.trips;
+            const index = trips.findIndex(t => t.id === data.trip.id);
+            if (index >= 0) {
+                trips[index] = data.trip;
+            } else {
+                trips.push(data.trip);
+            }
+            this.updateDashboard();
+        }
     }
 
     updateTripAnimation(tripId, progress) {
@@ -83,7 +162,7 @@ class RideSharingApp {
 
     setupDriverAnimation(driverId, progress) {
         const trip = progress.trip;
-        if (!trip || !this.systemState) return;
+        if (!trip || !this.systemState || !this.systemState.city) return;
 
         const locations = this.systemState.city.locations;
         const startLocId = progress.stage === 'to_pickup' ? trip.driver_location : trip.pickup;
@@ -229,6 +308,8 @@ class RideSharingApp {
 
             if (data.success) {
                 this.systemState = data.system;
+                this.acknowledgeVersion(data.system.version);
+                this.syncCity(data.system.city_version);
                 this.updateDashboard();
                 this.renderCityMap();
             }
@@ -393,7 +474,7 @@ class RideSharingApp {
     }
 
     renderCityMap() {
-        if (!this.systemState) return;
+        if (!this.systemState || !this.systemState.city) return;
 
         const mapContainer = document.getElementById('city-map');
         mapContainer.innerHTML = '';
@@ -648,7 +729,7 @@ class RideSharingApp {
             if (data.success) {
                 this.showNotification('System initialized successfully!', 'success');
                 this.loadSystemState();
-                this.socket.emit('request_update');
+                this.requestUpdate();
             } else {
                 this.showNotification(data.error, 'error');
             }
@@ -743,7 +824,7 @@ class RideSharingApp {
             if (data.success) {
                 this.showNotification(`Trip #${tripId} cancelled`, 'success');
                 this.loadSystemState();
-                this.socket.emit('request_update');
+                this.requestUpdate();
             } else {
                 this.showNotification(data.error || `Failed to ${action} trip`, 'error');
             }
@@ -783,7 +864,7 @@ class RideSharingApp {
                 document.getElementById('driver-name').value = '';
                 document.getElementById('driver-license').value = '';
                 this.loadSystemState();
-                this.socket.emit('request_update');
+                this.requestUpdate();
             } else {
                 this.showNotification(data.error, 'error');
             }
@@ -819,7 +900,7 @@ class RideSharingApp {
                 document.getElementById('rider-name').value = '';
                 document.getElementById('rider-email').value = '';
                 this.loadSystemState();
-                this.socket.emit('request_update');
+                this.requestUpdate();
             } else {
                 this.showNotification(data.error, 'error');
             }
@@ -857,7 +938,7 @@ class RideSharingApp {
                 this.showNotification(`Rolled back ${k} operations`, 'success');
                 this.hideModal('rollback-modal');
                 this.loadSystemState();
-                this.socket.emit('request_update');
+                this.requestUpdate();
             } else {
                 this.showNotification(data.error, 'error');
             }
@@ -0,0 +1,83 @@
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.driver import DriverStatus
+from modules.trip import TripStatus
+from modules.working_system import WorkingRideShareSystem
+
+@pytest.fixture
+def system():
+    """The sample city with drivers 101-103 and riders 101-103"""
+    system = WorkingRideShareSystem(workers=2)
+    system.initialize_sample_data()
+    yield system
+    with system.trip_lock:
+        system._clear_timers()
+
+@pytest.fixture
+def take_offline(system):
+    """Take drivers off the road, refiling them in the driver index as the system would"""
+    def take(*driver_ids):
+        for driver_id in driver_ids:
+            driver = system.drivers[driver_id]
+            driver.status = DriverStatus.OFFLINE
+            system.driver_index.update(driver)
+    return take
+
+@pytest.fixture
+def assigned_trip(system, wait_until):
+    """Request a trip and wait for a driver to be assigned to it"""
+    def request(rider_id=101, pickup=0, dropoff=3):
+        trip = system.request_trip(rider_id, pickup, dropoff)
+        wait_until(lambda: trip.status == TripStatus.ASSIGNED)
+        return trip
+    return request
+
+@pytest.fixture
+def complete_now(system):
+    """Run a trip's remaining stages at once instead of waiting for its driver to travel"""
+    def complete(trip):
+        with system.trip_lock:
+            system._halt_trip(trip.id)
+            system._start_trip(trip.id)
+            system._halt_trip(trip.id)
+            system._complete_trip(trip.id)
+    return complete
+
+@pytest.fixture
+def wait_until():
+    """Poll a condition set by a worker thread, failing after timeout seconds"""
+    def wait(condition, timeout: float = 3):
+        deadline = time.time() + timeout
+        while not condition():
+            assert time.time() < deadline, "timed out waiting for the system"
+            time.sleep(0.01)
+    return wait
+
+@pytest.fixture
+def app_module():
+    """app.py once startup has finished, with the sample data reset"""
+    app = pytest.importorskip('app')
+    assert app.READY.wait(5)
+    app.system.initialize_sample_data()
+    return app
+
+@pytest.fixture
+def client(app_module):
+    return app_module.app.test_client()
+
+@pytest.fixture
+def emitted(app_module, monkeypatch):
+    """Socket messages the app sends, as (event, data, to), with one whole-system client connected"""
+    sent = []
+    monkeypatch.setattr(app_module.socketio, 'emit', lambda event, data, to=None, **kwargs: sent.append((event, data, to)))
+    with app_module.client_versions_lock:
+        app_module.client_versions['test-client'] = None
+    yield sent
+    with app_module.client_versions_lock:
+        app_module.client_versions.pop('test-client', None)
@@ -0,0 +1,65 @@
+import time
+
+from modules.admission import AdmissionController
+
+def slow_controller(**options):
+    """A controller whose recent p99 is over its 100 ms threshold"""
+    controller = AdmissionController(p99_threshold_ms=100, **options)
+    assert controller.try_admit() is None
+    controller.release(0.5)
+    return controller
+
+def test_requests_beyond_max_in_flight_are_shed_until_one_finishes():
+    controller = AdmissionController(max_in_flight=2)
+    assert controller.try_admit() is None
+    assert controller.try_admit() is None
+
+    assert controller.try_admit() >= 1
+
+    controller.release(0.01)
+    assert controller.try_admit() is None
+    assert controller.get_metrics()['shed'] == 1
+
+def test_requests_are_shed_while_p99_is_over_the_threshold():
+    controller = slow_controller(probe_interval=60)
+
+    assert controller.try_admit() is None  # the first probe
+    assert controller.try_admit() >= 1
+    assert controller.get_metrics()['p99_ms'] == 500
+
+def test_a_fast_probe_ends_shedding():
+    controller = slow_controller(probe_interval=0)
+    assert controller.try_admit() is None  # probe
+
+    assert controller.try_admit() is not None  # shed while the probe is in flight
+    controller.release(0.01)
+
+    assert controller.try_admit() is None
+    metrics = controller.get_metrics()
+    assert (metrics['probes'], metrics['samples']) == (1, 1)
+
+def test_a_slow_probe_keeps_shedding():
+    controller = slow_controller(probe_interval=60)
+    assert controller.try_admit() is None  # probe
+    controller.release(0.5)
+
+    assert controller.try_admit() is not None
+
+def test_slow_samples_expire_with_the_window():
+    controller = slow_controller(window_seconds=0.05, probe_interval=60)
+    time.sleep(0.1)
+
+    assert controller.try_admit() is None
+    assert controller.get_metrics()['probes'] == 0
+
+def test_shed_trip_requests_get_503_with_retry_after(app_module, client, monkeypatch):
+    controller = AdmissionController(max_in_flight=1)
+    controller.try_admit()
+    monkeypatch.setattr(app_module, 'admission', controller)
+
+    response = client.post('/api/trip/request', json={'rider_id': 101, 'pickup': 0, 'dropoff': 3})
+
+    assert response.status_code == 503
+    assert int(response.headers['Retry-After']) >= 1
+    assert response.get_json()['overloaded'] is True
+    assert len(app_module.system.trips) == 0
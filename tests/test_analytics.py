@@ -0,0 +1,90 @@
+import pytest
+
+from modules.analytics import RollingWindow
+from modules.trip import TripStatus
+
+def recount(system):
+    """Analytics figures computed the slow way, from every live trip"""
+    trips = list(system.trips.values())
+    completed = [t for t in trips if t.status == TripStatus.COMPLETED]
+    return {
+        'total_trips': len(trips),
+        'completed_trips': len(completed),
+        'cancelled_trips': sum(t.status == TripStatus.CANCELLED for t in trips),
+        'active_trips': sum(t.is_active() for t in trips),
+        'total_fare': round(sum(t.fare for t in completed), 2)
+    }
+
+def counters(system):
+    analytics = system.get_analytics()
+    return {key: analytics[key] for key in ('total_trips', 'completed_trips', 'cancelled_trips', 'active_trips', 'total_fare')}
+
+def test_counters_follow_every_transition(system, assigned_trip, complete_now):
+    completed = assigned_trip()
+    complete_now(completed)
+    cancelled = assigned_trip(rider_id=102)
+    system.cancel_trip(cancelled.id)
+    with system.trip_lock:
+        waiting = system.request_trip(103, 6, 7)
+        snapshot = counters(system)
+        assert snapshot == recount(system)
+        system.cancel_trip(waiting.id)
+
+    assert snapshot == {'total_trips': 3, 'completed_trips': 1, 'cancelled_trips': 1, 'active_trips': 1, 'total_fare': 15.0}
+    assert system.get_analytics()['average_fare'] == 15.0
+
+def test_undoing_a_completion_takes_its_fare_back_out(system, assigned_trip, complete_now):
+    trip = assigned_trip()
+    complete_now(trip)
+
+    assert system.rollback(1)
+
+    assert counters(system) == recount(system)
+    assert counters(system)['total_fare'] == 0
+
+def test_archived_trips_stay_counted(system, assigned_trip, complete_now):
+    system.retain_finished = 0
+    trip = assigned_trip()
+    complete_now(trip)
+
+    assert trip.id not in system.trips
+    assert counters(system) == {'total_trips': 1, 'completed_trips': 1, 'cancelled_trips': 0, 'active_trips': 0, 'total_fare': 15.0}
+
+def test_window_counts_per_minute_and_forgets_old_buckets():
+    window = RollingWindow(120, ('trips',), ())
+    for now in (1000, 1010, 1050):
+        window.add('trips', now)
+
+    assert window.snapshot(1060)['trips_per_minute'] == 1.5
+    assert window.snapshot(1135)['trips_per_minute'] == 0.5
+    assert window.snapshot(1200)['trips_per_minute'] == 0
+
+def test_late_samples_older_than_the_window_are_dropped():
+    window = RollingWindow(60, ('trips',), ())
+    window.add('trips', 1000)
+    window.add('trips', 900)
+
+    assert window.snapshot(1000)['trips_per_minute'] == 1
+
+def test_window_percentiles_come_from_the_histogram():
+    window = RollingWindow(60, (), ('rider_wait',))
+    for seconds in [1] * 9 + [30]:
+        window.observe('rider_wait', seconds, 1000)
+
+    wait = window.snapshot(1000)['rider_wait']
+
+    assert wait['count'] == 10
+    assert wait['p50_seconds'] == pytest.approx(1, rel=0.15)
+    assert wait['p95_seconds'] == pytest.approx(30, rel=0.15)
+    assert RollingWindow(60, (), ('rider_wait',)).snapshot(1000)['rider_wait']['p50_seconds'] is None
+
+def test_rolling_metrics_are_fed_by_trip_events_but_not_by_undo(system, assigned_trip, complete_now):
+    complete_now(assigned_trip())
+    before = system.rolling_metrics.snapshot()['1m']
+
+    assert system.rollback(1)
+    after = system.rolling_metrics.snapshot()['1m']
+
+    assert before['trips_per_minute'] == before['completed_per_minute'] == 1
+    assert before['rider_wait']['count'] == before['pickup_time']['count'] == 1
+    assert after == before
@@ -0,0 +1,108 @@
+import pytest
+
+from modules.archive import TripArchive
+from modules.trip import Trip, TripStatus
+
+def finished(trip_id, status=TripStatus.COMPLETED, rider_id=101, fare=10.0):
+    trip = Trip(trip_id, rider_id, 0, 3)
+    trip.driver_id = 101 if status == TripStatus.COMPLETED else None
+    trip.status = status
+    trip.distance = 2.0
+    trip.fare = fare
+    trip.completed_ts = trip.created_ts + 60 if status == TripStatus.COMPLETED else None
+    return trip
+
+def test_archived_trips_read_back_field_for_field():
+    archive = TripArchive()
+    trip = finished(3)
+    archive.append(trip)
+
+    copy = archive.get(3)
+
+    assert copy is not trip
+    assert [getattr(copy, slot) for slot in Trip.__slots__ if slot != 'events'] == \
+        [getattr(trip, slot) for slot in Trip.__slots__ if slot != 'events']
+    assert archive.get(2) is None and 2 not in archive
+
+def test_only_finished_trips_can_be_archived():
+    archive = TripArchive()
+
+    with pytest.raises(ValueError):
+        archive.append(Trip(1, 101, 0, 3))
+    assert len(archive) == 0
+
+def test_restore_unlinks_the_row_and_its_totals():
+    archive = TripArchive()
+    archive.append(finished(1, fare=10.0))
+    archive.append(finished(2, fare=20.0))
+    archive.append(finished(3, TripStatus.CANCELLED, rider_id=102))
+
+    restored = archive.restore(2)
+
+    assert restored.fare == 20.0
+    assert 2 not in archive and len(archive) == 2
+    assert [t.id for t in archive.iter_trips()] == [1, 3]
+    assert archive.rider_trip_ids(101) == [1]
+    assert archive.totals() == {
+        'by_status': {TripStatus.COMPLETED: 1, TripStatus.CANCELLED: 1},
+        'completed_distance': 2.0,
+        'completed_fare': 10.0
+    }
+    assert archive.restore(2) is None
+
+def test_dump_and_load_round_trip():
+    archive = TripArchive()
+    for trip_id in (1, 2, 5):
+        archive.append(finished(trip_id))
+    archive.restore(2)
+    dump = archive.dump()
+    archive.append(finished(6))
+
+    loaded = TripArchive()
+    loaded.load(dump)
+
+    assert [t.id for t in loaded.iter_trips()] == [1, 5]
+    assert loaded.totals() == {
+        'by_status': {TripStatus.COMPLETED: 2, TripStatus.CANCELLED: 0},
+        'completed_distance': 4.0,
+        'completed_fare': 20.0
+    }
+
+def test_finished_trips_beyond_the_retained_window_are_archived(system, assigned_trip, complete_now):
+    system.retain_finished = 1
+    first = assigned_trip()
+    complete_now(first)
+    second = assigned_trip(rider_id=102)
+    system.cancel_trip(second.id)
+
+    assert list(system.trips) == [second.id]
+    assert first.id in system.archive
+    assert system.get_trip(first.id).status == TripStatus.COMPLETED
+    assert system.get_state()['archived_trips'] == 1
+
+def test_undoing_a_cancellation_brings_the_trip_back_from_the_archive(system):
+    system.retain_finished = 0
+    with system.trip_lock:
+        trip = system.request_trip(101, 0, 3)
+        system.cancel_trip(trip.id)
+        assert trip.id in system.archive
+
+        assert system.rollback(1)
+
+        assert trip.id not in system.archive
+        assert system.trips[trip.id].status == TripStatus.REQUESTED
+        system.cancel_trip(trip.id)
+
+def test_archived_trips_stay_in_deltas(system):
+    system.retain_finished = 0
+    version = system.changelog.version
+    with system.trip_lock:
+        trip = system.request_trip(101, 0, 3)
+        system.cancel_trip(trip.id)
+
+    delta = system.get_delta(version)['data']
+
+    assert trip.id not in system.trips
+    assert [t['id'] for t in delta['trips']] == [trip.id]
+    assert delta['trips'][0]['status'] == 'CANCELLED'
+    assert delta['removed']['trips'] == []
@@ -0,0 +1,52 @@
+import pytest
+
+from modules.worker_pool import PoolOverloadedError
+
+@pytest.mark.parametrize('body', [[1, 2], {'requests': []}, {'requests': 'x'}])
+def test_batch_rejects_malformed_bodies(client, body):
+    response = client.post('/api/trip/request/batch', json=body)
+
+    assert response.status_code == 400
+    assert response.get_json()['success'] is False
+
+def test_batch_rejects_too_many_requests(app_module, client):
+    items = [{'rider_id': 101, 'pickup': 0, 'dropoff': 3}] * (app_module.MAX_BATCH_SIZE + 1)
+
+    response = client.post('/api/trip/request/batch', json={'requests': items})
+
+    assert response.status_code == 400
+
+def test_batch_reports_a_result_per_item(client):
+    response = client.post('/api/trip/request/batch', json={'requests': [
+        {'rider_id': 101, 'pickup': 0, 'dropoff': 3},
+        {'rider_id': 999, 'pickup': 0, 'dropoff': 3},
+        {'rider_id': 102}
+    ]})
+    body = response.get_json()
+
+    assert response.status_code == 200
+    assert (body['accepted'], body['rejected']) == (1, 2)
+    assert [result['success'] for result in body['results']] == [True, False, False]
+
+def test_batch_answers_503_when_overloaded(app_module, client, monkeypatch):
+    def overloaded(requests):
+        raise PoolOverloadedError("Trip queue is full")
+    monkeypatch.setattr(app_module.system, 'request_trips', overloaded)
+
+    response = client.post('/api/trip/request/batch', json={'requests': [{'rider_id': 101, 'pickup': 0, 'dropoff': 3}]})
+
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '1'
+    assert response.get_json()['overloaded'] is True
+
+def test_a_batch_is_dispatched_as_one_task(system, wait_until):
+    submitted = system.worker_pool.get_metrics()['submitted']
+
+    with system.trip_lock:  # keeps the dispatch from scheduling driver arrivals yet
+        results = system.request_trips([(101, 0, 3), (102, 4, 6), (103, 5, 5)])
+        assert system.worker_pool.get_metrics()['submitted'] == submitted + 1
+
+    trips = [trip for trip, _ in results if trip]
+    assert [error for _, error in results] == [None, None, "Pickup and dropoff cannot be the same"]
+    wait_until(lambda: all(trip.driver_id is not None for trip in trips))
+    assert len({trip.driver_id for trip in trips}) == 2
@@ -0,0 +1,77 @@
+import json
+
+import pytest
+
+from modules.bulk_import import BulkImporter
+
+def ndjson(*records):
+    return [json.dumps(record) if isinstance(record, dict) else record for record in records]
+
+def test_rows_are_inserted_in_chunks_with_bad_lines_reported(system):
+    lines = ndjson(
+        {'name': 'Sara', 'location': 2},
+        'not json',
+        {'name': 'Omar', 'location': 999},
+        '',
+        {'location': 3},
+        {'name': 'Lena', 'location': 5, 'vehicle': 'Van'}
+    )
+
+    progress = BulkImporter(system, chunk_size=1).run('drivers', lines)
+
+    assert (progress.lines, progress.imported, progress.failed, progress.chunks) == (6, 2, 3, 3)
+    assert [error['line'] for error in progress.errors] == [2, 3, 5]
+    assert [d.name for d in system.drivers.values()][-2:] == ['Sara', 'Lena']
+    assert system.drivers[105].vehicle == 'Van'
+
+def test_progress_is_reported_once_per_chunk(system):
+    lines = ndjson(*({'name': f'Rider {i}'} for i in range(5)))
+
+    reports = [p.imported for p in BulkImporter(system, chunk_size=2).iter_progress('riders', lines)]
+
+    assert reports == [2, 4, 5]
+
+def test_each_chunk_is_one_rollback_step(system):
+    history = len(system.rollback_manager.history)
+    lines = ndjson(*({'name': f'Rider {i}'} for i in range(5)))
+
+    BulkImporter(system, chunk_size=3).run('riders', lines)
+
+    assert len(system.rollback_manager.history) == history + 2
+    assert system.rollback(1)
+    assert sorted(system.riders) == [101, 102, 103, 104, 105, 106]
+
+def test_undoing_a_chunk_is_all_or_nothing(system, take_offline, wait_until):
+    take_offline(101, 102, 103)
+    BulkImporter(system).run('drivers', ndjson({'name': 'Sara', 'location': 0}, {'name': 'Omar', 'location': 14}))
+    trip = system.request_trip(101, 14, 13)
+    wait_until(lambda: trip.driver_id is not None)
+
+    chunk = next(op for op in system.rollback_manager.history if 'driver_ids' in op.data)
+    with system.trip_lock:
+        with pytest.raises(ValueError):
+            system.undo_engine.undo(chunk)
+
+    assert 104 in system.drivers and 105 in system.drivers
+
+def test_trips_are_imported_through_the_batch_path(system):
+    lines = ndjson({'rider_id': 101, 'pickup': 0, 'dropoff': 3}, {'rider_id': 999, 'pickup': 0, 'dropoff': 3})
+
+    with system.trip_lock:
+        progress = BulkImporter(system).run('trips', lines)
+
+        assert (progress.imported, progress.failed) == (1, 1)
+        assert list(system.trips) == [1]
+
+def test_import_endpoint_streams_progress_and_a_summary(app_module, client):
+    body = '\n'.join(ndjson(*({'name': f'Rider {i}'} for i in range(3))))
+
+    response = client.post('/api/import/riders?chunk_size=2', data=body, content_type='application/x-ndjson')
+    lines = [json.loads(line) for line in response.data.decode().splitlines()]
+
+    assert [line['imported'] for line in lines] == [2, 3, 3]
+    assert lines[-1]['done'] is True
+    assert len(app_module.system.riders) == 6
+
+def test_import_endpoint_rejects_unknown_kinds(client):
+    assert client.post('/api/import/cars', data='').status_code == 400
@@ -0,0 +1,50 @@
+from modules.changelog import ChangeLog
+
+def test_delta_holds_only_changed_entities(system):
+    version = system.changelog.version
+    driver = system.add_driver("Sara", 2)
+
+    update = system.get_delta(version)
+
+    assert update['type'] == 'delta'
+    assert [d['id'] for d in update['data']['drivers']] == [driver.id]
+    assert update['data']['riders'] == []
+    assert update['version'] == system.changelog.version
+
+def test_removed_entities_are_listed_as_removed(system):
+    version = system.changelog.version
+    driver = system.add_driver("Sara", 2)
+    system.rollback(1)
+
+    delta = system.get_delta(version)['data']
+
+    assert delta['drivers'] == []
+    assert delta['removed']['drivers'] == [driver.id]
+
+def test_clients_too_far_behind_get_a_full_update():
+    changelog = ChangeLog(max_entries=2)
+    for driver_id in range(3):
+        changelog.record('drivers', driver_id)
+
+    assert changelog.changes_since(0) is None
+    assert changelog.changes_since(2) == {'drivers': {2}, 'riders': set(), 'trips': set()}
+
+def test_unknown_version_falls_back_to_full_update(system):
+    update = system.get_delta(system.changelog.version + 10)
+
+    assert update['type'] == 'full_update'
+    assert len(update['data']['drivers']) == 3
+
+def test_broadcast_sends_each_client_what_changed_since_its_ack(app_module, emitted, wait_until):
+    with app_module.client_versions_lock:
+        app_module.client_versions['test-client'] = app_module.system.changelog.version
+    driver = app_module.system.add_driver("Sara", 2)
+    app_module.schedule_broadcast()
+
+    def deltas():
+        return [data for event, data, to in emitted if event == 'system_update' and to == ['test-client']]
+    wait_until(lambda: any(driver.id in [d['id'] for d in update['data']['drivers']] for update in deltas()))
+
+    update = deltas()[-1]
+    assert update['type'] == 'delta'
+    assert [d['id'] for d in update['data']['drivers']] == [driver.id]
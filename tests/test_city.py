@@ -0,0 +1,32 @@
+import json
+
+def test_payload_is_serialized_once_per_graph_version(system):
+    body, etag = system.city.get_payload()
+
+    assert system.city.get_payload()[0] is body
+    assert json.loads(body)['version'] == system.city.version
+
+    system.city.add_location(99, 0, 0, "Zone X")
+    new_body, new_etag = system.city.get_payload()
+
+    assert new_etag != etag
+    assert 99 in [location['id'] for location in json.loads(new_body)['city']['locations']]
+
+def test_city_is_revalidated_by_etag(app_module, client):
+    first = client.get('/api/city')
+    etag = first.headers['ETag']
+
+    again = client.get('/api/city', headers={'If-None-Match': etag})
+    assert again.status_code == 304
+    assert again.data == b''
+
+    app_module.system.city.add_location(99, 0, 0, "Zone X")
+    changed = client.get('/api/city', headers={'If-None-Match': etag})
+    assert changed.status_code == 200
+    assert changed.headers['ETag'] != etag
+
+def test_state_carries_only_the_city_version(app_module, client):
+    state = client.get('/api/system/state').get_json()['system']
+
+    assert 'city' not in state
+    assert state['city_version'] == app_module.system.city.version
@@ -0,0 +1,48 @@
+import time
+
+from modules.driver import Driver
+from modules.route import Route
+
+def moving_driver(seconds_ago: float, changes=None):
+    driver = Driver(101, "Ali", 0)
+    if changes is not None:
+        driver.listener = changes.append
+    driver.depart(Route([0, 1, 2, 3, 4], seconds_per_hop=1.0), departed_at=time.time() - seconds_ago)
+    return driver
+
+def test_location_is_derived_from_the_route_on_read():
+    driver = moving_driver(2.5)
+
+    assert driver.location == 2
+    assert driver.is_moving()
+    assert driver.to_dict()['location'] == 2
+
+def test_driver_stops_at_the_destination():
+    driver = moving_driver(10)
+
+    assert driver.location == 4
+    assert not driver.is_moving()
+
+def test_moving_does_not_notify_until_the_route_changes():
+    changes = []
+    driver = moving_driver(1.5, changes)
+    for _ in range(3):
+        driver.location
+
+    assert changes == [driver]
+
+    driver.arrive()
+
+    assert changes == [driver, driver]
+    assert driver.route is None
+    assert driver.location == 4
+
+def test_cancelling_keeps_the_location_reached():
+    driver = moving_driver(3.2)
+    driver.current_trip_id = 7
+
+    driver.cancel_trip()
+
+    assert driver.route is None
+    assert driver.location == 3
+    assert driver.is_available()
@@ -0,0 +1,50 @@
+from datetime import datetime
+
+import pytest
+
+from modules.city import Location
+from modules.driver import Driver, DriverStatus
+from modules.rider import RECENT_TRIPS, Rider
+from modules.trip import Trip, TripStatus
+
+@pytest.mark.parametrize('entity', [
+    Trip(1, 101, 0, 3),
+    Driver(101, "Ali", 0),
+    Rider(101, "Sara"),
+    Location(0, 50, 150, "Zone 0")
+])
+def test_entities_carry_no_instance_dict(entity):
+    assert not hasattr(entity, '__dict__')
+    with pytest.raises(AttributeError):
+        entity.nickname = "x"
+
+def test_status_is_stored_as_a_small_code():
+    trip = Trip(1, 101, 0, 3)
+    driver = Driver(101, "Ali", 0)
+
+    trip.status = TripStatus.ONGOING
+    driver.status = DriverStatus.OFFLINE
+
+    assert (trip.status_code, trip.status) == (2, TripStatus.ONGOING)
+    assert (driver.status_code, driver.status) == (2, DriverStatus.OFFLINE)
+
+def test_timestamps_are_epoch_seconds_with_datetime_views():
+    trip = Trip(1, 101, 0, 3)
+    assigned = datetime(2026, 1, 2, 3, 4, 5)
+
+    trip.assigned_at = assigned
+
+    assert trip.assigned_ts == assigned.timestamp()
+    assert trip.assigned_at == assigned
+    assert trip.completed_at is None
+    assert trip.to_dict()['created_at'] == datetime.fromtimestamp(trip.created_ts).isoformat()
+
+def test_riders_keep_only_recent_trip_ids_but_count_every_trip():
+    rider = Rider(101, "Sara")
+    for trip_id in range(RECENT_TRIPS + 5):
+        rider.add_trip(trip_id)
+
+    rider.remove_trip(RECENT_TRIPS + 4)
+
+    assert list(rider.trip_history) == list(range(5, RECENT_TRIPS + 4))
+    assert rider.to_dict()['trip_count'] == RECENT_TRIPS + 4
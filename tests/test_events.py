@@ -0,0 +1,50 @@
+from modules.trip import TripStatus
+
+def requested_then_cancelled(system):
+    """A trip cancelled before any worker could dispatch it"""
+    with system.trip_lock:
+        trip = system.request_trip(101, 0, 3)
+        system.cancel_trip(trip.id)
+    return trip
+
+def test_observers_are_told_of_each_transition(system):
+    events = []
+    system.events.subscribe(events.append)
+
+    trip = requested_then_cancelled(system)
+
+    assert [(e.trip.id, e.previous, e.status) for e in events] == [
+        (trip.id, None, TripStatus.REQUESTED),
+        (trip.id, TripStatus.REQUESTED, TripStatus.CANCELLED)
+    ]
+    assert events[1].changes[0] == ('status', TripStatus.REQUESTED, TripStatus.CANCELLED)
+
+def test_a_failing_observer_does_not_stop_the_others(system):
+    def broken(event):
+        raise RuntimeError("observer failed")
+    seen = []
+    system.events.subscribe(broken)
+    system.events.subscribe(seen.append)
+
+    requested_then_cancelled(system)
+
+    assert len(seen) == 2
+
+def test_unsubscribed_observers_are_not_called(system):
+    seen = []
+    system.events.subscribe(seen.append)
+    system.events.unsubscribe(seen.append)
+
+    requested_then_cancelled(system)
+
+    assert seen == []
+
+def test_transitions_are_pushed_to_clients_as_trip_updates(app_module, emitted, wait_until):
+    trip = requested_then_cancelled(app_module.system)
+
+    def notices():
+        return [data for event, data, _ in emitted if event == 'trip_update' and data['trip_id'] == trip.id]
+    wait_until(lambda: len(notices()) >= 2)
+
+    assert [(n['previous_status'], n['status']) for n in notices()[-2:]] == [(None, 'REQUESTED'), ('REQUESTED', 'CANCELLED')]
+    assert all(to == ['test-client'] for event, _, to in emitted if event == 'trip_update')
@@ -0,0 +1,99 @@
+import time
+
+import pytest
+
+from modules import history
+from modules.archive import TripArchive
+from modules.trip import Trip, TripStatus
+
+pytest.importorskip('numpy')
+
+def archived(*trips):
+    """An archive holding finished trips given as (pickup, dropoff, status, fare, wait)"""
+    archive = TripArchive()
+    for trip_id, (pickup, dropoff, status, fare, wait) in enumerate(trips, start=1):
+        trip = Trip(trip_id, 101, pickup, dropoff)
+        trip.status = status
+        trip.fare = fare
+        if wait is not None:
+            trip.driver_id = 100 + trip_id % 2
+            trip.assigned_ts = trip.created_ts + wait
+        archive.append(trip)
+    return archive
+
+def test_trips_are_grouped_by_zone_pair(system):
+    archive = archived(
+        (0, 3, TripStatus.COMPLETED, 10.0, 2.0),
+        (1, 4, TripStatus.COMPLETED, 30.0, 4.0),
+        (6, 0, TripStatus.CANCELLED, 0.0, None)
+    )
+
+    result = history.query(history.load_columns(archive), system.city, 'zone_pair')
+
+    assert (result['trips'], result['groups']) == (3, 2)
+    first, second = result['rows']
+    assert (first['pickup_zone'], first['dropoff_zone'], first['trips']) == ('Zone 0', 'Zone 1', 2)
+    assert first['fare'] == {'count': 2, 'sum': 40.0, 'mean': 20.0, 'p50': 10.0, 'p95': 30.0}
+    assert first['wait']['mean'] == 3.0
+    assert (second['pickup_zone'], second['dropoff_zone']) == ('Zone 2', 'Zone 0')
+    assert second['wait'] == {'count': 0, 'sum': 0.0, 'mean': None, 'p50': None, 'p95': None}
+
+def test_locations_the_city_no_longer_knows_have_no_zone(system):
+    archive = archived((0, 99, TripStatus.COMPLETED, 10.0, 1.0))
+
+    rows = history.query(history.load_columns(archive), system.city, 'zone_pair')['rows']
+
+    assert (rows[0]['pickup_zone'], rows[0]['dropoff_zone']) == ('Zone 0', None)
+
+def test_driver_groups_filtered_by_status_and_ordered_by_count(system):
+    archive = archived(
+        (0, 3, TripStatus.COMPLETED, 10.0, 1.0),
+        (0, 3, TripStatus.COMPLETED, 10.0, 1.0),
+        (0, 3, TripStatus.COMPLETED, 10.0, 1.0),
+        (0, 3, TripStatus.CANCELLED, 0.0, None)
+    )
+    columns = history.load_columns(archive)
+
+    rows = history.query(columns, system.city, 'driver', order='count')['rows']
+    completed = history.query(columns, system.city, 'driver', status=TripStatus.COMPLETED)['rows']
+
+    assert [(row['driver_id'], row['trips']) for row in rows] == [(101, 2), (None, 1), (100, 1)]
+    assert [(row['driver_id'], row['trips']) for row in completed] == [(100, 1), (101, 2)]
+
+def test_hours_are_local_and_time_bounds_filter_on_creation(system):
+    archive = archived((0, 3, TripStatus.COMPLETED, 10.0, 1.0))
+    columns = history.load_columns(archive)
+
+    rows = history.query(columns, system.city, 'hour')['rows']
+
+    assert rows == history.query(columns, system.city, 'hour', until=time.time())['rows']
+    assert [row['hour'] for row in rows] == [time.localtime().tm_hour]
+    assert history.query(columns, system.city, 'hour', since=time.time() + 60)['trips'] == 0
+
+def test_live_and_restored_trips_are_counted_once(system):
+    system.retain_finished = 1
+    with system.trip_lock:
+        trips = [system.request_trip(rider_id, 0, 3) for rider_id in (101, 102, 103)]
+        for trip in trips:
+            system.cancel_trip(trip.id)
+        assert system.rollback(2)
+
+        result = system.query_history('rider', metrics=['fare'])
+        system.cancel_trip(trips[1].id)
+        system.cancel_trip(trips[2].id)
+
+    assert [(row['rider_id'], row['trips']) for row in result['rows']] == [(101, 1)]
+
+@pytest.mark.parametrize('options', [
+    {'group_by': 'city'},
+    {'group_by': 'rider', 'metrics': ['speed']},
+    {'group_by': 'rider', 'status': TripStatus.ONGOING}
+])
+def test_bad_queries_are_rejected(system, options):
+    with pytest.raises(ValueError):
+        system.query_history(**options)
+
+def test_history_endpoint(client):
+    assert client.get('/api/analytics/history?group_by=hour').get_json()['history']['trips'] == 0
+    assert client.get('/api/analytics/history?group_by=zone').status_code == 400
+    assert client.get('/api/analytics/history?percentiles=120').status_code == 400
@@ -0,0 +1,93 @@
+from modules.driver import Driver, DriverStatus
+from modules.indexes import DriverIndex, TripIndex, page_by_id, project
+from modules.trip import Trip, TripStatus
+
+def indexed(system, *trips):
+    """A standalone trip index over trips given as (rider_id, pickup, dropoff, status, driver_id)"""
+    index = TripIndex(system.city)
+    by_id = {}
+    for trip_id, (rider_id, pickup, dropoff, status, driver_id) in enumerate(trips, start=1):
+        trip = Trip(trip_id, rider_id, pickup, dropoff)
+        trip.status = status
+        trip.driver_id = driver_id
+        trip.created_ts = 1000.0 + trip_id * 10
+        index.refile(trip)
+        by_id[trip_id] = trip
+    return index, by_id
+
+def ids(page):
+    return [trip.id for trip in page['items']]
+
+def test_trips_are_filed_by_status_zone_and_driver(system):
+    index, trips = indexed(
+        system,
+        (101, 0, 3, TripStatus.COMPLETED, 101),
+        (102, 6, 7, TripStatus.REQUESTED, None),
+        (101, 3, 4, TripStatus.ASSIGNED, 102),
+        (103, 9, 0, TripStatus.COMPLETED, 101)
+    )
+
+    assert index.ids_with_status(TripStatus.REQUESTED, TripStatus.ASSIGNED) == [2, 3]
+    assert index.ids_with_status(TripStatus.COMPLETED, zone='Zone 1') == [1]
+    assert ids(index.page(trips.get, driver_id=101)) == [4, 1]
+    assert ids(index.page(trips.get, rider_id=101, zone='Zone 1')) == [3, 1]
+    assert ids(index.page(trips.get, status=TripStatus.COMPLETED, zone='Zone 3')) == [4]
+
+def test_a_time_range_maps_to_an_id_range(system):
+    index, trips = indexed(system, *[(101, 0, 3, TripStatus.COMPLETED, 101)] * 5)
+
+    assert ids(index.page(trips.get, since=1025)) == [5, 4, 3]
+    assert ids(index.page(trips.get, until=1025)) == [2, 1]
+    assert ids(index.page(trips.get, since=1015, until=1035)) == [3, 2]
+    assert ids(index.page(trips.get, since=2000)) == []
+
+def test_pages_continue_from_the_cursor(system):
+    index, trips = indexed(system, *[(101, 0, 3, TripStatus.COMPLETED, 101)] * 5)
+
+    first = index.page(trips.get, limit=2)
+    second = index.page(trips.get, cursor=first['next_cursor'], limit=2)
+    last = index.page(trips.get, cursor=second['next_cursor'], limit=2)
+
+    assert [ids(first), ids(second), ids(last)] == [[5, 4], [3, 2], [1]]
+    assert last['next_cursor'] is None
+
+def test_transitions_and_removal_keep_the_index_in_step(system):
+    with system.trip_lock:
+        trip = system.request_trip(101, 0, 3)
+        system.cancel_trip(trip.id)
+        index = system.trip_index
+
+        assert index.ids_with_status(TripStatus.CANCELLED) == [trip.id]
+        assert index.ids_with_status(TripStatus.REQUESTED) == []
+
+        assert system.rollback(2)
+
+    assert trip.id not in system.trips
+    assert list(index.ids) == []
+    assert all(len(ids) == 0 for ids in index.by_status.values())
+    assert all(len(ids) == 0 for ids in index.by_zone.values())
+
+def test_driver_index_refiles_on_status_change():
+    index = DriverIndex()
+    drivers = {driver_id: Driver(driver_id, "Ali", location) for driver_id, location in ((103, 8), (101, 0), (102, 4))}
+    for driver in drivers.values():
+        index.update(driver)
+
+    drivers[102].status = DriverStatus.BUSY
+    index.update(drivers[102])
+
+    assert index.ids == [101, 102, 103]
+    assert index.ids_with_status(DriverStatus.AVAILABLE) == [101, 103]
+    assert index.count(DriverStatus.BUSY) == 1
+    zone_of = {0: 'Zone 0', 4: 'Zone 1', 8: 'Zone 2'}.get
+    assert [d.id for d in index.page(drivers, zone_of=zone_of, zone='Zone 1')['items']] == [102]
+
+    index.remove(102)
+    assert index.count() == 2 and index.count(DriverStatus.BUSY) == 0
+
+def test_entities_are_paged_by_id_and_projected(system):
+    page = page_by_id(system.riders, [101, 102, 103], cursor=101, limit=1)
+
+    assert [r.id for r in page['items']] == [102]
+    assert page['next_cursor'] == 102
+    assert project(page['items'][0].to_dict(), ['id', 'missing']) == {'id': 102}
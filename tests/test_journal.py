@@ -0,0 +1,95 @@
+import pytest
+
+from modules.journal import Journal, capture
+from modules.snapshot import LazyDict
+from modules.trip import TripStatus
+from modules.working_system import WorkingRideShareSystem
+
+def journaled_system(directory, **journal_options):
+    system = WorkingRideShareSystem(workers=2)
+    replayed = system.attach_journal(Journal(directory, **journal_options))
+    return system, replayed
+
+def close(system):
+    with system.trip_lock:
+        system._clear_timers()
+    system.journal.close()
+
+def test_changes_are_replayed_after_a_restart(tmp_path):
+    system, _ = journaled_system(tmp_path)
+    system.initialize_sample_data()
+    driver = system.add_driver("Sara", 2)
+    trip = system.request_trip(101, 0, 3)
+    system.cancel_trip(trip.id)
+    assert system.journal.wait_for()
+    close(system)
+
+    recovered, replayed = journaled_system(tmp_path)
+
+    assert replayed > 0
+    assert recovered.drivers[driver.id].name == "Sara"
+    assert len(recovered.riders) == 3
+    assert recovered.get_trip(trip.id).status == TripStatus.CANCELLED
+    assert recovered.next_trip_id == trip.id + 1
+    close(recovered)
+
+def test_undone_writes_stay_undone_after_a_restart(tmp_path):
+    system, _ = journaled_system(tmp_path)
+    system.initialize_sample_data()
+    driver = system.add_driver("Sara", 2)
+    system.rollback(1)
+    assert system.journal.wait_for()
+    close(system)
+
+    recovered, _ = journaled_system(tmp_path)
+
+    assert driver.id not in recovered.drivers
+    close(recovered)
+
+def test_batches_are_replayed_and_undone_as_one_record(tmp_path):
+    system, _ = journaled_system(tmp_path)
+    system.initialize_sample_data()
+    drivers = system.add_drivers([("Sara", 2, "Car", ""), ("Omar", 5, "Van", "")])
+    riders = system.add_riders([("Lena", ""), ("Noor", "")])
+    system.rollback(1)
+    assert system.journal.wait_for()
+    close(system)
+
+    recovered, _ = journaled_system(tmp_path)
+
+    assert [recovered.drivers[d.id].vehicle for d in drivers] == ["Car", "Van"]
+    assert not any(r.id in recovered.riders for r in riders)
+    close(recovered)
+
+def test_capture_records_the_journal_position_it_matches(tmp_path):
+    system, _ = journaled_system(tmp_path)
+    system.initialize_sample_data()
+
+    sections, meta = capture(system, system.journal)
+
+    assert meta['seq'] == system.journal.seq
+    assert list(sections['drivers.id']) == [101, 102, 103]
+    close(system)
+
+def test_snapshot_is_mapped_lazily_and_replaces_old_segments(tmp_path):
+    system, _ = journaled_system(tmp_path)
+    system.initialize_sample_data()
+    system.journal.snapshot()
+    driver = system.add_driver("Sara", 2)
+    assert system.journal.wait_for()
+    close(system)
+    assert len(system.journal._segments()) == 1
+
+    recovered, replayed = journaled_system(tmp_path)
+
+    assert replayed == 1
+    assert isinstance(recovered.drivers, LazyDict)
+    assert len(recovered.drivers) == 4
+    assert dict.__len__(recovered.drivers) == 1  # only the replayed driver is built
+    assert recovered.drivers[101].name == "Ali"
+    assert recovered.drivers[driver.id].name == "Sara"
+    close(recovered)
+
+def test_journal_refuses_a_system_that_already_has_state(tmp_path, system):
+    with pytest.raises(RuntimeError):
+        system.attach_journal(Journal(tmp_path))
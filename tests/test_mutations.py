@@ -0,0 +1,34 @@
+def test_trip_request_returns_only_what_it_changed(app_module, client):
+    since = app_module.system.changelog.version
+
+    body = client.post('/api/trip/request', json={'rider_id': 101, 'pickup': 0, 'dropoff': 3}).get_json()
+
+    assert body['success'] is True
+    assert 'system' not in body
+    assert body['version'] > since
+    assert body['trip']['id'] in [t['id'] for t in body['changes']['trips']]
+    assert [r['id'] for r in body['changes']['riders']] == [101]
+
+def test_full_state_is_returned_on_request(client):
+    body = client.post('/api/trip/request?response=full', json={'rider_id': 101, 'pickup': 0, 'dropoff': 3}).get_json()
+
+    assert len(body['system']['drivers']) == 3
+
+def test_cancel_returns_the_cancelled_trip(app_module, client):
+    system = app_module.system
+    with system.trip_lock:
+        trip = system.request_trip(101, 0, 3)
+
+        body = client.post(f'/api/trip/{trip.id}/cancel').get_json()
+
+    assert body['success'] is True
+    assert [(t['id'], t['status']) for t in body['changes']['trips']] == [(trip.id, 'CANCELLED')]
+    assert body['changes']['drivers'] == []
+
+def test_rollback_lists_removed_entities(app_module, client):
+    driver = app_module.system.add_driver("Sara", 2)
+
+    body = client.post('/api/rollback', json={'k': 1}).get_json()
+
+    assert body['success'] is True
+    assert body['changes']['removed']['drivers'] == [driver.id]
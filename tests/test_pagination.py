@@ -0,0 +1,53 @@
+import pytest
+
+def walk(client, url):
+    """Ids of every item across the pages of a list endpoint"""
+    pages = []
+    cursor = None
+    while True:
+        body = client.get(url + (f'&cursor={cursor}' if cursor else '')).get_json()
+        pages.append([item['id'] for item in body['items']])
+        cursor = body['next_cursor']
+        if cursor is None:
+            return pages
+
+def test_riders_are_paged_in_id_order(app_module, client):
+    for i in range(2):
+        app_module.system.add_rider(f"Rider {i}")
+
+    assert walk(client, '/api/riders?limit=2') == [[101, 102], [103, 104], [105]]
+
+def test_trips_are_paged_newest_first_and_filtered(app_module, client):
+    system = app_module.system
+    with system.trip_lock:
+        trips = [system.request_trip(rider_id, 0, 3) for rider_id in (101, 102, 103, 101)]
+        system.cancel_trip(trips[1].id)
+
+        assert walk(client, '/api/trips?limit=2') == [[4, 3], [2, 1]]
+        assert walk(client, '/api/trips?limit=2&status=requested') == [[4, 3], [1]]
+        assert walk(client, '/api/trips?rider_id=101') == [[4, 1]]
+        assert walk(client, '/api/trips?status=cancelled&zone=Zone 1') == [[2]]
+
+        for trip in trips:
+            system.cancel_trip(trip.id)
+
+def test_fields_project_each_item(client):
+    body = client.get('/api/drivers?fields=id,status&limit=1').get_json()
+
+    assert body['items'] == [{'id': 101, 'status': 'AVAILABLE'}]
+    assert body['next_cursor'] == 101
+
+def test_drivers_are_filtered_by_status_and_zone(client):
+    assert walk(client, '/api/drivers?status=available&zone=Zone 1') == [[102]]
+
+@pytest.mark.parametrize('url', [
+    '/api/trips?limit=0',
+    '/api/trips?status=lost',
+    '/api/drivers?cursor=x',
+    '/api/riders?limit=100000'
+])
+def test_bad_page_arguments_are_rejected(client, url):
+    response = client.get(url)
+
+    assert response.status_code == 400
+    assert response.get_json()['success'] is False
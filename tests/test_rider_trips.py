@@ -0,0 +1,47 @@
+from modules.rider import RECENT_TRIPS
+
+def cancelled_trips(system, rider_id, count):
+    ids = []
+    with system.trip_lock:
+        for _ in range(count):
+            trip = system.request_trip(rider_id, 0, 3)
+            system.cancel_trip(trip.id)
+            ids.append(trip.id)
+    return ids
+
+def rider_pages(system, rider_id, limit):
+    pages = []
+    cursor = None
+    while True:
+        page = system.list_trips(rider_id=rider_id, cursor=cursor, limit=limit, fields=['id'])
+        pages.append([item['id'] for item in page['items']])
+        cursor = page['next_cursor']
+        if cursor is None:
+            return pages
+
+def test_rider_pages_run_from_live_trips_into_the_archive(system):
+    system.retain_finished = 2
+    cancelled_trips(system, 102, 1)
+    mine = cancelled_trips(system, 101, 5)
+
+    assert rider_pages(system, 101, 2) == [[mine[4], mine[3]], [mine[2], mine[1]], [mine[0]]]
+    assert list(system.trip_index.by_rider[101]) == mine[-2:]
+
+def test_only_recent_trip_ids_are_kept_on_the_rider(system):
+    system.retain_finished = 0
+    mine = cancelled_trips(system, 101, RECENT_TRIPS + 5)
+    rider = system.riders[101]
+
+    assert list(rider.trip_history) == mine[5:]
+    assert rider.to_dict()['trip_count'] == RECENT_TRIPS + 5
+    assert sum(rider_pages(system, 101, 50), []) == mine[::-1]
+    assert len(system.trip_index.by_rider[101]) == 0
+
+def test_a_trip_brought_back_from_the_archive_is_listed_once(system):
+    system.retain_finished = 0
+    mine = cancelled_trips(system, 101, 3)
+
+    with system.trip_lock:
+        assert system.rollback(1)
+        assert rider_pages(system, 101, 50) == [mine[::-1]]
+        system.cancel_trip(mine[-1])
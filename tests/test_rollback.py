@@ -0,0 +1,73 @@
+import pytest
+
+from modules.rollback import OperationType
+from modules.trip import TripStatus
+
+def last_operation(system, op_type):
+    return next(op for op in reversed(system.rollback_manager.history) if op.type == op_type)
+
+def test_undoing_an_add_removes_the_entity(system):
+    driver = system.add_driver("Sara", 2)
+    rider = system.add_rider("Omar")
+
+    assert system.rollback(2)
+    assert driver.id not in system.drivers
+    assert rider.id not in system.riders
+
+def test_undoing_an_assignment_frees_the_driver_and_dispatches_again(system, assigned_trip, take_offline, wait_until):
+    trip = assigned_trip()
+    first_driver = system.drivers[trip.driver_id]
+
+    with system.trip_lock:
+        system.undo_engine.undo(last_operation(system, OperationType.ASSIGN_DRIVER))
+        assert trip.status == TripStatus.REQUESTED
+        assert first_driver.current_trip_id is None
+        take_offline(first_driver.id)  # so the redispatch picks another driver
+
+    wait_until(lambda: trip.status == TripStatus.ASSIGNED)
+    assert trip.driver_id != first_driver.id
+
+def test_undoing_a_completion_puts_the_trip_back_in_progress(system, assigned_trip, complete_now):
+    trip = assigned_trip()
+    complete_now(trip)
+    driver = system.drivers[trip.driver_id]
+    assert driver.is_available()
+
+    assert system.rollback(1)
+
+    assert trip.status == TripStatus.ONGOING
+    assert driver.current_trip_id == trip.id
+    assert system.get_analytics()['completed_trips'] == 0
+
+def test_undoing_a_completion_aborts_once_the_driver_has_moved_on(system, assigned_trip, complete_now, take_offline):
+    take_offline(102, 103)
+    trip = assigned_trip()
+    complete_now(trip)
+    completion = last_operation(system, OperationType.COMPLETE_TRIP)
+    next_trip = assigned_trip(rider_id=102)
+    assert next_trip.driver_id == trip.driver_id
+
+    with pytest.raises(ValueError):
+        system.undo_engine.undo(completion)
+
+    assert trip.status == TripStatus.COMPLETED
+    assert system.drivers[trip.driver_id].current_trip_id == next_trip.id
+
+def test_rollback_stops_at_an_operation_it_cannot_undo(system, assigned_trip, complete_now, take_offline):
+    take_offline(102, 103)
+    trip = assigned_trip()
+    complete_now(trip)
+    next_trip = assigned_trip(rider_id=102)
+    history = len(system.rollback_manager.history)
+
+    with system.trip_lock:
+        system.drivers[trip.driver_id].current_trip_id = None  # driver gone off on its own
+        take_offline(trip.driver_id)
+
+        # Undoing next_trip's assignment and creation works; the completion does not
+        rolled_back = system.rollback_manager.rollback(3, system.undo_engine.undo)
+
+    assert [op['type'] for op in rolled_back] == ['ASSIGN_DRIVER', 'CREATE_TRIP']
+    assert len(system.rollback_manager.history) == history - 2
+    assert next_trip.id not in system.trips
+    assert trip.status == TripStatus.COMPLETED
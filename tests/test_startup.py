@@ -0,0 +1,34 @@
+import pytest
+
+@pytest.fixture
+def not_ready(app_module):
+    app_module.READY.clear()
+    yield app_module
+    app_module.READY.set()
+
+def test_health_reports_ready_after_startup(client):
+    body = client.get('/health').get_json()
+
+    assert (body['status'], body['ready']) == ('healthy', True)
+    assert body['startup_ms'] is not None
+
+def test_health_is_503_until_ready(not_ready, client):
+    response = client.get('/health')
+
+    assert response.status_code == 503
+    assert (response.get_json()['status'], response.get_json()['ready']) == ('starting', False)
+
+def test_health_reports_a_failed_recovery(not_ready, client, monkeypatch):
+    monkeypatch.setattr(not_ready, 'RECOVERY_ERROR', 'journal is corrupt')
+
+    body = client.get('/health').get_json()
+
+    assert (body['status'], body['error']) == ('failed', 'journal is corrupt')
+
+def test_api_requests_are_turned_away_until_ready(not_ready, client):
+    response = client.get('/api/system/state')
+
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '1'
+    assert response.get_json()['starting'] is True
+    assert client.get('/').status_code == 200
@@ -0,0 +1,56 @@
+import pytest
+
+from modules.journal import Journal
+from modules.storage import SQLiteStore
+from modules.trip import TripStatus
+from modules.working_system import WorkingRideShareSystem
+
+def stored_system(path):
+    system = WorkingRideShareSystem(workers=2)
+    loaded = system.attach_store(SQLiteStore(str(path)))
+    return system, loaded
+
+def close(system):
+    with system.trip_lock:
+        system._clear_timers()
+    system.store.close()
+
+def test_state_is_loaded_back_from_the_store(tmp_path):
+    path = tmp_path / 'state.db'
+    system, loaded = stored_system(path)
+    assert loaded == 0
+    system.initialize_sample_data()
+    trip = system.request_trip(101, 0, 3)
+    system.cancel_trip(trip.id)
+    assert system.store.flush()
+    close(system)
+
+    recovered, loaded = stored_system(path)
+
+    assert loaded == 7  # 3 drivers, 3 riders and the trip
+    assert recovered.riders[101].trip_count == 1
+    assert recovered.get_trip(trip.id).status == TripStatus.CANCELLED
+    assert recovered.next_trip_id == trip.id + 1
+    close(recovered)
+
+def test_changes_are_batched_into_few_commits(tmp_path):
+    system, _ = stored_system(tmp_path / 'state.db')
+    system.initialize_sample_data()
+    for i in range(50):
+        system.add_rider(f"Rider {i}")
+    assert system.store.flush()
+
+    assert system.store.rows_written >= 56
+    assert system.store.flushes < 50
+    close(system)
+
+def test_store_and_journal_cannot_be_combined(tmp_path):
+    system, _ = stored_system(tmp_path / 'state.db')
+
+    with pytest.raises(RuntimeError):
+        system.attach_journal(Journal(tmp_path / 'journal'))
+    close(system)
+
+def test_store_refuses_a_system_that_already_has_state(tmp_path, system):
+    with pytest.raises(RuntimeError):
+        system.attach_store(SQLiteStore(str(tmp_path / 'state.db')))
@@ -0,0 +1,66 @@
+import pytest
+
+from modules.subscriptions import SubscriptionRegistry
+
+@pytest.mark.parametrize('channel, room', [
+    ({'zone': 'Zone 1'}, 'zone:Zone 1'),
+    ({'trip_id': '7'}, 'trip:7'),
+    ({'driver_id': 101}, 'driver:101'),
+    ({'trip_id': 'x'}, None),
+    ({}, None),
+    ('zone', None)
+])
+def test_room_for_a_subscription_request(channel, room):
+    assert SubscriptionRegistry.room_for(channel) == room
+
+def test_rooms_count_their_members():
+    registry = SubscriptionRegistry()
+    assert registry.add('a', 'zone:Zone 1')
+    assert not registry.add('a', 'zone:Zone 1')
+    registry.add('b', 'zone:Zone 1')
+
+    assert registry.remove('a', 'zone:Zone 1')
+    assert not registry.is_scoped('a')
+    assert registry.has_subscribers()
+
+    assert registry.drop('b') == {'zone:Zone 1'}
+    assert not registry.has_subscribers()
+
+def test_changes_are_routed_only_to_watched_rooms(system):
+    registry = SubscriptionRegistry()
+    registry.add('a', 'zone:Zone 1')
+    with system.trip_lock:
+        inside = system.request_trip(101, 3, 4)
+        outside = system.request_trip(102, 6, 7)
+        system.cancel_trip(inside.id)
+        system.cancel_trip(outside.id)
+
+    updates = registry.route({'trips': {inside.id, outside.id}, 'drivers': {101, 102}}, system)
+
+    assert list(updates) == ['zone:Zone 1']
+    assert [t['id'] for t in updates['zone:Zone 1']['trips']] == [inside.id]
+    assert [d['id'] for d in updates['zone:Zone 1']['drivers']] == [102]  # at location 4
+
+def test_zone_snapshot_holds_its_drivers_and_active_trips(system):
+    with system.trip_lock:
+        trip = system.request_trip(101, 3, 4)
+        snapshot = SubscriptionRegistry().snapshot('zone:Zone 1', system)
+        system.cancel_trip(trip.id)
+
+    assert [d['id'] for d in snapshot['drivers']] == [102]
+    assert [t['id'] for t in snapshot['trips']] == [trip.id]
+
+def test_trip_notices_also_go_to_rooms_watching_the_trip(app_module, emitted, wait_until):
+    app_module.subscriptions.add('scoped-client', 'zone:Zone 1')
+    try:
+        with app_module.system.trip_lock:
+            trip = app_module.system.request_trip(101, 3, 4)
+            app_module.system.cancel_trip(trip.id)
+
+        def targets():
+            return [to for event, data, to in emitted if event == 'trip_update' and data['trip_id'] == trip.id]
+        wait_until(lambda: len(targets()) >= 2)
+    finally:
+        app_module.subscriptions.drop('scoped-client')
+
+    assert all(to == ['test-client', 'zone:Zone 1'] for to in targets())
@@ -0,0 +1,44 @@
+from modules.events import TripEventBus
+from modules.rollback import OperationType
+from modules.trip import Trip, TripStatus
+
+def tracked_trip():
+    bus = TripEventBus()
+    events = []
+    bus.subscribe(events.append)
+    trip = Trip(1, 101, 0, 3)
+    bus.track(trip)
+    return trip, events
+
+def test_a_transition_reports_only_the_fields_it_changed():
+    trip, events = tracked_trip()
+
+    trip.assign_driver(101)
+
+    status, driver, assigned = events[-1].changes
+    assert status == ('status', TripStatus.REQUESTED, TripStatus.ASSIGNED)
+    assert driver == ('driver_id', None, 101)
+    assert assigned[:2] == ('assigned_ts', None)
+    assert not any(name == 'fare' for name, _, _ in events[-1].changes)  # unchanged estimate
+
+def test_revert_restores_the_old_values_as_an_undo():
+    trip, events = tracked_trip()
+    trip.assign_driver(101, fare=12.5)
+    trip.start()
+    trip.complete(2.0, 15.0)
+    completion = events[-1].changes
+
+    trip.revert(completion)
+
+    assert (trip.status, trip.distance, trip.fare, trip.completed_ts) == (TripStatus.ONGOING, 0.0, 12.5, None)
+    assert events[-1].undo and events[-1].previous == TripStatus.COMPLETED
+    assert {name for name, _, _ in events[-1].changes} == {name for name, _, _ in completion}
+
+def test_rollback_records_hold_the_transition_diff(system, assigned_trip):
+    trip = assigned_trip()
+
+    operation = next(op for op in reversed(system.rollback_manager.history) if op.type == OperationType.ASSIGN_DRIVER)
+
+    assert operation.reverse_data['trip_id'] == trip.id
+    assert dict((name, old) for name, old, _ in operation.reverse_data['changes']) == \
+        {'status': TripStatus.REQUESTED, 'driver_id': None, 'assigned_ts': None}
@@ -0,0 +1,40 @@
+import pytest
+
+from modules import wire
+
+needs_msgpack = pytest.mark.skipif(not wire.msgpack_available(), reason="msgpack is not installed")
+
+def test_json_is_the_default():
+    assert wire.negotiate() == wire.JSON
+    assert wire.negotiate('text/html, */*') == wire.JSON
+
+@needs_msgpack
+@pytest.mark.parametrize('accept, expected', [
+    ('application/msgpack', wire.MSGPACK),
+    ('application/json, application/msgpack', wire.MSGPACK),
+    ('application/msgpack;q=0.5, application/json', wire.JSON),
+    ('application/json;q=0.4, application/x-msgpack;q=0.8', wire.MSGPACK),
+    ('application/msgpack;q=0', wire.JSON),
+])
+def test_accept_q_values_pick_the_format(accept, expected):
+    assert wire.negotiate(accept) == expected
+
+@needs_msgpack
+def test_explicit_format_wins_over_accept():
+    assert wire.negotiate('application/json', requested='msgpack') == wire.MSGPACK
+    assert wire.negotiate('application/msgpack', requested='json') == wire.JSON
+
+@needs_msgpack
+@pytest.mark.parametrize('fmt', [wire.JSON, wire.MSGPACK])
+def test_encode_round_trips(fmt):
+    payload = {'version': 3, 'drivers': [{'id': 101, 'location': 4.5, 'name': 'Ali'}], 'removed': {}}
+
+    assert wire.decode(wire.encode(payload, fmt), fmt) == payload
+
+@needs_msgpack
+def test_state_is_served_as_msgpack_when_accepted(client):
+    response = client.get('/api/system/state', headers={'Accept': 'application/msgpack'})
+
+    assert response.mimetype == 'application/msgpack'
+    assert 'Accept' in response.headers['Vary']
+    assert len(wire.decode(response.data, wire.MSGPACK)['system']['drivers']) == 3
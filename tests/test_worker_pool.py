@@ -0,0 +1,88 @@
+import threading
+
+import pytest
+
+from modules.trip import TripStatus
+from modules.worker_pool import PoolOverloadedError, TripWorkerPool
+
+@pytest.fixture
+def blocked_pool(wait_until):
+    """A one-worker pool with room for two queued tasks, its worker held until released"""
+    pool = TripWorkerPool(size=1, queue_limit=2)
+    release = threading.Event()
+    pool.submit(release.wait)
+    wait_until(lambda: pool.busy == 1)
+    yield pool, release
+    release.set()
+
+def test_new_work_beyond_the_queue_limit_is_rejected(blocked_pool):
+    pool, release = blocked_pool
+    pool.submit(lambda: None)
+    pool.submit(lambda: None)
+
+    with pytest.raises(PoolOverloadedError):
+        pool.submit(lambda: None)
+
+    metrics = pool.get_metrics()
+    assert (metrics['queue_depth'], metrics['rejected']) == (2, 1)
+
+def test_a_claimed_slot_counts_against_the_limit_until_released(blocked_pool):
+    pool, release = blocked_pool
+    pool.submit(lambda: None)
+
+    with pool.slot():
+        with pytest.raises(PoolOverloadedError):
+            pool.submit(lambda: None)
+
+    pool.submit(lambda: None)  # the unused slot was given back
+    assert pool.queue_depth() == 2
+
+def test_scheduled_work_waits_for_room_instead_of_being_rejected(blocked_pool):
+    pool, release = blocked_pool
+    pool.submit(lambda: None)
+    pool.submit(lambda: None)
+    ran = threading.Event()
+
+    pool.schedule(0, ran.set)
+    assert not ran.wait(0.1)
+    release.set()
+
+    assert ran.wait(1)
+    assert pool.get_metrics()['rejected'] == 0
+
+def test_cancelled_scheduled_work_does_not_run(wait_until):
+    pool = TripWorkerPool(size=1)
+    ran = []
+    pool.schedule(0.05, ran.append, 'cancelled').cancel()
+    pool.schedule(0.05, ran.append, 'kept')
+
+    wait_until(lambda: ran)
+    assert ran == ['kept']
+
+def test_metrics_count_completed_and_failed_tasks(wait_until):
+    pool = TripWorkerPool(size=2)
+    pool.submit(lambda: None)
+    pool.submit(lambda: 1 / 0)
+
+    wait_until(lambda: pool.get_metrics()['completed'] == 2)
+    metrics = pool.get_metrics()
+
+    assert (metrics['submitted'], metrics['failed'], metrics['busy_workers']) == (2, 1, 0)
+    assert metrics['run_time']['max_ms'] >= 0
+
+def test_trip_requests_are_refused_before_any_state_changes_when_full(system):
+    system.worker_pool.queue_limit = 1
+    trips = len(system.trips)
+
+    with system.worker_pool.slot():
+        with pytest.raises(PoolOverloadedError):
+            system.request_trip(101, 0, 3)
+
+    assert len(system.trips) == trips
+
+def test_trips_dispatched_concurrently_get_different_drivers(system, wait_until):
+    trips = [system.request_trip(rider_id, 0, 3) for rider_id in (101, 102, 103)]
+
+    wait_until(lambda: all(trip.status != TripStatus.REQUESTED for trip in trips))
+
+    assert sorted(trip.driver_id for trip in trips) == [101, 102, 103]